@@ -35,7 +35,8 @@ def iniciar_programa():
     
     if tkinter_ok:
         print("Iniciando a interface gráfica...\n")
-        subprocess.call([sys.executable, "./rifa_app/rifa_gui.py"])
+        # Um arquivo .db ou o endereço de um servidor de rifas pode ser repassado
+        subprocess.call([sys.executable, "./rifa_app/rifa_gui.py"] + sys.argv[1:])
     else:
         print("\n⚠️ A interface gráfica requer Tkinter, que não está instalado.")
         print("\nPara instalar Tkinter:")
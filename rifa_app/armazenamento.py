@@ -0,0 +1,1017 @@
+import csv
+import http.client
+import io
+import json
+import os
+import shutil
+import base64
+import sqlite3
+import threading
+from urllib.parse import urlencode, urlsplit
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+from diario import LIMITE_DIARIO, Diario, caminho_diario, compactar_diario, ler_registros
+from indice_nomes import IndiceNomes, normalizar_nome
+from indice_ordenado import IndiceOrdenado
+from instantaneo import (IndiceRegistros, caminho_instantaneo, carregar_instantaneo,
+                         crc_do_trecho, gravar_instantaneo, segundos_da_data)
+from mapa_numeros import MapaNumeros
+from metricas import contar
+from registro import CAMPOS, MAIOR_NUMERO, Registro, normalizar_numero
+from trava import trava_do_arquivo
+
+# Acima desta quantidade de números novos, a lista ordenada é refeita do zero
+# em vez de receber inserções ordenadas uma a uma
+LIMITE_INSERCOES_ORDENADAS = 1000
+
+# Ordens aceitas por listar(): número da rifa, nome (sem diferenciar acentos)
+# e data da compra; empates seguem a ordem dos números
+ORDENS = ('numero', 'nome', 'data')
+
+def chave_da_ordem(ordem):
+    """Função registro -> valor que põe os registros na ordem de listar() (ver ORDENS)."""
+    if ordem == 'numero':
+        return lambda registro: registro.numero
+    if ordem == 'nome':
+        return lambda registro: (normalizar_nome(registro.nome), registro.numero)
+    if ordem == 'data':
+        return lambda registro: (segundos_da_data(registro.data), registro.numero)
+    raise ValueError(f"Ordem desconhecida: {ordem}")
+
+# Quantidade de bytes guardados do fim da última leitura, usados para detectar
+# se o arquivo foi reescrito (e não apenas acrescido) por outro programa
+TAMANHO_CAUDA = 64
+
+# O instantâneo binário só é gravado para arquivos com pelo menos esta
+# quantidade de registros, e regravado quando a quantidade de registros fora
+# dele passa disso (ou de 10% do total, o que for maior)
+MINIMO_REGISTROS_INSTANTANEO = 10000
+
+EXTENSOES_SQLITE = ('.db', '.sqlite', '.sqlite3')
+
+# data_compra ("dd/mm/aaaa hh:mm") reescrita como "aaaammddhh:mm", que ordena
+# como a data; datas noutro formato viram '' e vêm primeiro, como as vazias.
+# O índice idx_rifas_data é montado sobre esta expressão
+DATA_ORDENAVEL_SQL = (
+    "CASE WHEN data_compra GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9] [0-9][0-9]:[0-9][0-9]' "
+    "THEN substr(data_compra, 7, 4) || substr(data_compra, 4, 2) || substr(data_compra, 1, 2) "
+    "|| substr(data_compra, 12) ELSE '' END")
+
+# Colunas do ORDER BY de cada ordem de listagem no SQLite
+ORDENS_SQL = {
+    'numero': ('numero',),
+    'nome': ('nome_normalizado', 'numero'),
+    'data': (DATA_ORDENAVEL_SQL, 'numero'),
+}
+
+def _sqlite_tem_trigramas(conexao):
+    """Verifica se o SQLite tem o FTS5 com o tokenizador trigram (SQLite 3.34 ou mais novo)."""
+    try:
+        conexao.execute("CREATE VIRTUAL TABLE temp.sondagem_trigramas USING fts5(texto, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        return False
+    conexao.execute("DROP TABLE temp.sondagem_trigramas")
+    return True
+
+def _assinatura_arquivo(caminho):
+    """Identifica o estado do arquivo: (inode, tamanho, data de modificação) ou None."""
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return (estado.st_ino, estado.st_size, estado.st_mtime_ns)
+
+def _pagina(sequencia, offset, limite, decrescente):
+    """Trecho da sequência com a página pedida, ainda na ordem crescente."""
+    total = len(sequencia)
+    if decrescente:
+        fim = max(total - offset, 0)
+        inicio = 0 if limite is None else max(fim - limite, 0)
+    else:
+        inicio = min(offset, total)
+        fim = total if limite is None else min(inicio + limite, total)
+    if inicio == 0 and fim == total:
+        return sequencia
+    return sequencia[inicio:fim]
+
+def _para_registros(registros):
+    """Converte os registros recebidos em JSON (campo -> texto) em Registro."""
+    return [Registro.de_dicionario(campos) for campos in registros]
+
+def _registros_das_linhas(linhas, cabecalho, invalidas=None):
+    """Converte as linhas do CSV em registros.
+    
+    As linhas de número inválido ficam de fora; se invalidas for uma lista,
+    elas são guardadas nela (campo -> texto).
+    """
+    # Colunas padrão: criar os registros direto das linhas, sem dicionários
+    padrao = cabecalho == CAMPOS
+    for linha in linhas:
+        if not linha:
+            continue
+        if padrao and len(linha) == 4:
+            registro = Registro.de_textos(*linha)
+        else:
+            registro = Registro.de_dicionario(dict(zip(cabecalho, linha)))
+        if registro is not None:
+            yield registro
+        elif invalidas is not None:
+            invalidas.append(dict(zip(cabecalho, linha)))
+
+def _em_lotes(registros, tamanho_lote):
+    """Agrupa os registros em listas de até tamanho_lote."""
+    registros = iter(registros)
+    while True:
+        lote = list(islice(registros, tamanho_lote))
+        if not lote:
+            return
+        yield lote
+
+class ErroServidor(Exception):
+    """Erro informado pelo servidor de rifas ou falha ao se comunicar com ele."""
+
+def criar_armazenamento(caminho):
+    """Escolhe o armazenamento de acordo com a extensão do arquivo ou o endereço."""
+    if caminho.lower().startswith('http://'):
+        return ArmazenamentoRemoto(caminho)
+    if caminho.lower().endswith(EXTENSOES_SQLITE):
+        return ArmazenamentoSQLite(caminho)
+    return ArmazenamentoCSV(caminho)
+
+class ArmazenamentoCSV:
+    """Armazena as rifas num arquivo CSV, com um índice de números em memória.
+    
+    Os cadastros são gravados primeiro num diário ao lado do CSV, com um
+    fsync por lote; quando o diário cresce, ele é incorporado ao CSV, que é
+    substituído de forma atômica. Ao abrir, o CSV é carregado e os registros
+    do diário são aplicados em seguida.
+    
+    Arquivos grandes ganham um instantâneo binário (rifas.csv.instantaneo,
+    ver instantaneo.py), aberto com mmap no lugar da leitura do CSV inteiro.
+    
+    Vários processos podem usar o mesmo CSV: verificação e gravação de
+    números acontecem sob uma trava de arquivo (rifas.csv.trava).
+    """
+    
+    def __init__(self, arquivo_csv):
+        self.arquivo_csv = arquivo_csv
+        self._trava = trava_do_arquivo(arquivo_csv)
+        with self._trava:
+            self.verificar_arquivo()
+            self._diario = Diario(caminho_diario(arquivo_csv))
+        
+        # Índices em memória: número (int) -> registro do comprador, e
+        # trigramas dos nomes -> números
+        self._indice = IndiceRegistros()
+        self._indice_nomes = IndiceNomes()
+        self._ordenadas = None
+        self._ordenacoes = {}
+        self._invalidas = []
+        self._mapa = None
+        self._cabecalho = None
+        self._assinatura = None
+        self._offset = 0
+        self._cauda = b''
+        self._assinatura_diario = None
+        self._offset_diario = 0
+        self._atualizar_indice()
+    
+    def verificar_arquivo(self):
+        """Verifica se o arquivo CSV existe, se não, cria com cabeçalhos."""
+        if not os.path.exists(self.arquivo_csv):
+            with open(self.arquivo_csv, 'w', newline='', encoding='utf-8') as arquivo:
+                writer = csv.writer(arquivo)
+                writer.writerow(CAMPOS)
+    
+    def _atualizar_indice(self):
+        """Mantém o índice de números sincronizado com o arquivo CSV e o diário.
+        
+        O arquivo só é lido quando o tamanho ou a data de modificação mudam.
+        Se ele apenas cresceu, somente as linhas novas são lidas; qualquer outra
+        alteração feita fora do programa reconstrói o índice por completo.
+        """
+        alterados = (_assinatura_arquivo(self.arquivo_csv) != self._assinatura
+                     or _assinatura_arquivo(self._diario.caminho) != self._assinatura_diario)
+        if not alterados:
+            contar('cache_indice_acertos')
+            return
+        
+        contar('cache_indice_falhas')
+        # Ler sob a trava para não pegar uma compactação ou importação pela metade
+        with self._trava:
+            recarregado = self._atualizar_indice_csv()
+            self._atualizar_indice_diario(recarregado)
+    
+    def _atualizar_indice_csv(self):
+        """Lê as alterações do CSV. Retorna True se o índice foi refeito do zero."""
+        if not os.path.exists(self.arquivo_csv):
+            self.verificar_arquivo()
+        
+        estado = os.stat(self.arquivo_csv)
+        assinatura = (estado.st_ino, estado.st_size, estado.st_mtime_ns)
+        if assinatura == self._assinatura:
+            return False
+        
+        recarregado = False
+        with open(self.arquivo_csv, 'rb') as arquivo:
+            if not self._arquivo_apenas_cresceu(arquivo, estado):
+                self._indice = IndiceRegistros()
+                self._indice_nomes.limpar()
+                self._ordenadas = None
+                self._ordenacoes = {}
+                self._invalidas = []
+                self._mapa = None
+                self._cabecalho = None
+                self._offset = 0
+                self._cauda = b''
+                self._carregar_instantaneo(arquivo, estado)
+                recarregado = True
+            
+            arquivo.seek(self._offset)
+            dados = arquivo.read()
+        
+        # Numa leitura incremental, ignorar uma última linha ainda incompleta
+        if self._offset > 0:
+            dados = dados[:dados.rfind(b'\n') + 1]
+        contar('bytes_lidos', len(dados))
+        
+        self._indexar_linhas(dados.decode('utf-8-sig' if self._offset == 0 else 'utf-8'))
+        
+        self._offset += len(dados)
+        self._cauda = (self._cauda + dados)[-TAMANHO_CAUDA:]
+        self._assinatura = assinatura
+        
+        # Antes de aplicar o diário, o índice tem exatamente o conteúdo do CSV
+        if recarregado:
+            self._atualizar_instantaneo()
+        return recarregado
+    
+    def _carregar_instantaneo(self, arquivo, estado):
+        """Usa o instantâneo como índice, se ele ainda corresponder ao início do CSV.
+        
+        As linhas do CSV que vierem depois do trecho coberto pelo instantâneo
+        são lidas em seguida, como numa leitura incremental.
+        """
+        instantaneo = carregar_instantaneo(caminho_instantaneo(self.arquivo_csv))
+        if instantaneo is None or instantaneo.offset_csv > estado.st_size:
+            return
+        arquivo.seek(instantaneo.offset_csv - len(instantaneo.cauda))
+        if arquivo.read(len(instantaneo.cauda)) != instantaneo.cauda:
+            return
+        if crc_do_trecho(arquivo, instantaneo.offset_csv) != instantaneo.crc_csv:
+            return
+        
+        contar('instantaneo_carregado')
+        self._indice = IndiceRegistros(instantaneo)
+        self._indice_nomes.limpar(instantaneo)
+        self._invalidas = list(instantaneo.invalidas)
+        self._cabecalho = instantaneo.cabecalho
+        self._offset = instantaneo.offset_csv
+        self._cauda = instantaneo.cauda
+    
+    def _atualizar_instantaneo(self):
+        """Grava de novo o instantâneo quando muitos registros do CSV ficaram fora dele.
+        
+        Só deve ser chamado com o índice igual ao conteúdo do CSV, até _offset.
+        """
+        total = len(self._indice)
+        fora = total - self._indice.tamanho_base
+        if fora < max(MINIMO_REGISTROS_INSTANTANEO, total // 10):
+            return
+        
+        caminho = caminho_instantaneo(self.arquivo_csv)
+        chaves = self._chaves_em_ordem()
+        try:
+            with open(self.arquivo_csv, 'rb') as arquivo:
+                crc = crc_do_trecho(arquivo, self._offset)
+            gravado = gravar_instantaneo(caminho, chaves, self._indice.em_ordem(chaves),
+                                         self._cabecalho, self._offset, self._cauda, crc,
+                                         self._invalidas)
+        except OSError:
+            # O instantâneo só acelera a abertura; sem ele, o CSV continua sendo lido
+            return
+        
+        instantaneo = carregar_instantaneo(caminho) if gravado else None
+        if instantaneo is not None:
+            contar('instantaneo_gravado')
+            self._indice = IndiceRegistros(instantaneo)
+            self._indice_nomes.limpar(instantaneo)
+            self._ordenadas = None
+    
+    def _atualizar_indice_diario(self, recarregado):
+        """Aplica ao índice os registros do diário ainda não lidos."""
+        try:
+            estado = os.stat(self._diario.caminho)
+        except FileNotFoundError:
+            self._assinatura_diario = None
+            self._offset_diario = 0
+            return
+        
+        assinatura = (estado.st_ino, estado.st_size, estado.st_mtime_ns)
+        if assinatura == self._assinatura_diario and not recarregado:
+            return
+        
+        # Com o CSV relido, ou o diário compactado, reaplicar o diário desde o
+        # início; registros já presentes no CSV são ignorados pelo índice
+        if recarregado or estado.st_size < self._offset_diario:
+            self._offset_diario = 0
+        
+        with open(self._diario.caminho, 'rb') as arquivo:
+            arquivo.seek(self._offset_diario)
+            registros, lido = ler_registros(arquivo.read())
+        contar('bytes_lidos', lido)
+        contar('linhas_lidas', len(registros))
+        
+        self._adicionar_ao_indice(map(Registro.de_dicionario, registros))
+        self._offset_diario += lido
+        self._assinatura_diario = assinatura
+    
+    def _arquivo_apenas_cresceu(self, arquivo, estado):
+        """Verifica se o arquivo indexado apenas recebeu novas linhas no final."""
+        if self._assinatura is None:
+            return False
+        if estado.st_ino != self._assinatura[0] or estado.st_size < self._offset:
+            return False
+        
+        arquivo.seek(self._offset - len(self._cauda))
+        return arquivo.read(len(self._cauda)) == self._cauda
+    
+    def _indexar_linhas(self, texto):
+        """Adiciona ao índice as linhas CSV do texto (a primeira ocorrência prevalece)."""
+        reader = csv.reader(io.StringIO(texto, newline=''))
+        
+        if self._cabecalho is None:
+            self._cabecalho = next(reader, None) or CAMPOS
+        
+        # As linhas de número inválido ficam de quarentena em self._invalidas
+        self._adicionar_ao_indice(_registros_das_linhas(reader, self._cabecalho, self._invalidas))
+        contar('linhas_lidas', reader.line_num)
+    
+    def _adicionar_ao_indice(self, registros):
+        """Indexa os registros cujo número ainda não está no índice (None é ignorado)."""
+        novas = []
+        indice = self._indice
+        for registro in registros:
+            if registro is None:
+                continue
+            chave = registro.numero
+            if chave not in indice:
+                indice[chave] = registro
+                self._indice_nomes.adicionar(registro.nome, chave)
+                novas.append(chave)
+        
+        # Manter as listas ordenadas e o mapa de números, se já tiverem sido montados
+        if self._mapa is not None:
+            self._mapa.marcar_varios(novas)
+        if self._ordenadas is not None:
+            # A coluna de números do instantâneo não aceita inserções
+            if len(novas) > LIMITE_INSERCOES_ORDENADAS or isinstance(self._ordenadas, memoryview):
+                self._ordenadas = None
+            else:
+                for chave in novas:
+                    insort(self._ordenadas, chave)
+        if len(novas) > LIMITE_INSERCOES_ORDENADAS:
+            self._ordenacoes = {}
+        else:
+            for ordenacao in self._ordenacoes.values():
+                for chave in novas:
+                    ordenacao.adicionar(chave)
+    
+    def _chaves_ordenadas(self):
+        """Retorna a lista ordenada dos números cadastrados."""
+        self._atualizar_indice()
+        return self._chaves_em_ordem()
+    
+    def _chaves_em_ordem(self):
+        if self._ordenadas is None:
+            contar('cache_ordenadas_falhas')
+            self._ordenadas = self._indice.chaves_ordenadas()
+        else:
+            contar('cache_ordenadas_acertos')
+        return self._ordenadas
+    
+    def _chaves_na_ordem(self, ordem):
+        """Números na ordem pedida (ver ORDENS), mantidos entre as listagens."""
+        chaves = self._chaves_ordenadas()
+        if ordem == 'numero':
+            return chaves
+        
+        ordenacao = self._ordenacoes.get(ordem)
+        if ordenacao is None:
+            contar('cache_ordenacao_falhas')
+            # As funções consultam o índice atual, que é trocado ao regravar o instantâneo
+            if ordem == 'nome':
+                ordenacao = IndiceOrdenado(chaves, self._indice_nomes.nomes_em_ordem(chaves),
+                                           self._indice_nomes.nome_do_numero)
+            elif ordem == 'data':
+                ordenacao = IndiceOrdenado(chaves, self._indice.datas_em_ordem(chaves),
+                                           lambda chave: self._indice.segundos_da_compra(chave))
+            else:
+                raise ValueError(f"Ordem desconhecida: {ordem}")
+            self._ordenacoes[ordem] = ordenacao
+        else:
+            contar('cache_ordenacao_acertos')
+        return ordenacao.numeros
+    
+    def obter(self, chave):
+        """Retorna o registro do número (já normalizado) ou None."""
+        self._atualizar_indice()
+        return self._indice.get(chave)
+    
+    def mapa_numeros(self, inicio, fim):
+        """Retorna o mapa de números vendidos da faixa, mantido a cada gravação."""
+        ordenadas = self._chaves_ordenadas()
+        if self._mapa is None or (self._mapa.inicio, self._mapa.fim) != (inicio, fim):
+            contar('cache_mapa_falhas')
+            mapa = MapaNumeros(inicio, fim)
+            mapa.marcar_varios(ordenadas[bisect_left(ordenadas, inicio):bisect_right(ordenadas, fim)])
+            self._mapa = mapa
+        return self._mapa
+    
+    def inserir(self, linhas):
+        """Grava as linhas cujo número ainda está livre numa única escrita.
+        
+        A verificação e a gravação acontecem sob a trava do arquivo, então dois
+        processos nunca gravam o mesmo número.
+        
+        Returns:
+            list: True para cada linha gravada, False se o número já existia
+        """
+        with self._trava:
+            return self._inserir(linhas)
+    
+    def _inserir(self, linhas):
+        self._atualizar_indice()
+        
+        aceitas = []
+        gravadas = []
+        chaves_do_lote = set()
+        for linha in linhas:
+            chave = linha[0]
+            livre = chave not in self._indice and chave not in chaves_do_lote
+            if livre:
+                chaves_do_lote.add(chave)
+                aceitas.append(linha)
+            gravadas.append(livre)
+        
+        if aceitas:
+            contar('registros_gravados', len(aceitas))
+            self._diario.acrescentar([dict(zip(CAMPOS, map(str, linha))) for linha in aceitas])
+            self._atualizar_indice()
+            
+            if self._diario.tamanho() > LIMITE_DIARIO:
+                self.compactar()
+        
+        return gravadas
+    
+    def compactar(self):
+        """Incorpora o diário ao CSV, que é substituído de forma atômica.
+        
+        Returns:
+            int: Quantidade de registros incorporados ao CSV
+        """
+        with self._trava:
+            return self._compactar()
+    
+    def _compactar(self):
+        self._atualizar_indice()
+        indexado = (self._assinatura, self._assinatura_diario) == (
+            _assinatura_arquivo(self.arquivo_csv), _assinatura_arquivo(self._diario.caminho))
+        
+        incorporados = compactar_diario(self.arquivo_csv)
+        
+        # O novo CSV tem exatamente o conteúdo já indexado; evitar relê-lo
+        # inteiro, a menos que outro programa tenha mexido nos arquivos antes
+        if incorporados and indexado:
+            estado = os.stat(self.arquivo_csv)
+            with open(self.arquivo_csv, 'rb') as arquivo:
+                arquivo.seek(max(0, estado.st_size - TAMANHO_CAUDA))
+                self._cauda = arquivo.read()
+            self._assinatura = (estado.st_ino, estado.st_size, estado.st_mtime_ns)
+            self._offset = estado.st_size
+            self._assinatura_diario = None
+            self._offset_diario = 0
+            self._atualizar_instantaneo()
+        return incorporados
+    
+    def reservar_proximo(self, inicio, nome, telefone, data_compra):
+        """Grava o primeiro número livre a partir de inicio, de forma atômica.
+        
+        Returns:
+            int: O número reservado
+        """
+        with self._trava:
+            self._atualizar_indice()
+            chave = self._indice.proximo_livre(inicio)
+            self._inserir([[chave, nome, telefone, data_compra]])
+            return chave
+    
+    def listar(self, offset=0, limite=None, ordem='numero', decrescente=False):
+        """Lista uma página dos registros na ordem pedida (ver ORDENS).
+        
+        As ordens por nome e por data vêm de índices secundários montados na
+        primeira listagem e atualizados a cada gravação, como a lista dos números.
+        """
+        chaves = _pagina(self._chaves_na_ordem(ordem), offset, limite, decrescente)
+        if ordem == 'numero':
+            registros = self._indice.registros_em_ordem(chaves)
+        else:
+            indice = self._indice
+            registros = [indice[chave] for chave in chaves]
+        if decrescente:
+            registros.reverse()
+        return registros
+    
+    def linhas_invalidas(self):
+        """Linhas do CSV (campo -> texto) deixadas de fora por terem número inválido."""
+        self._atualizar_indice()
+        return list(self._invalidas)
+    
+    def contar_intervalo(self, inicio, fim):
+        """Conta os números cadastrados entre inicio e fim (inclusive)."""
+        ordenadas = self._chaves_ordenadas()
+        return bisect_right(ordenadas, fim) - bisect_left(ordenadas, inicio)
+    
+    def listar_intervalo(self, inicio, fim, offset=0, limite=None):
+        """Lista, em ordem, os registros com número entre inicio e fim (inclusive)."""
+        ordenadas = self._chaves_ordenadas()
+        primeiro = bisect_left(ordenadas, inicio) + offset
+        ultimo = bisect_right(ordenadas, fim)
+        if limite is not None:
+            ultimo = min(ultimo, primeiro + limite)
+        return self._indice.registros_em_ordem(ordenadas[primeiro:ultimo])
+    
+    def buscar_nome(self, nome):
+        """Busca registros cujo nome contém o texto (sem diferenciar acentos)."""
+        total, registros = self.pesquisar_nome(nome)
+        return registros
+    
+    def pesquisar_nome(self, nome, offset=0, limite=None, maximo=None):
+        """Busca uma página dos registros cujo nome contém o texto.
+        
+        Returns:
+            tuple: (total de registros encontrados, até maximo; registros da página)
+        """
+        total, numeros = self._indice_nomes.pesquisar(
+            nome, self._chaves_ordenadas(), offset, limite, maximo)
+        return total, self._indice.registros_em_ordem(numeros)
+    
+    def exportar_csv(self, arquivo_destino):
+        """Copia o arquivo CSV, já com os registros do diário, para o destino."""
+        self.compactar()
+        shutil.copy(self.arquivo_csv, arquivo_destino)
+        contar('bytes_gravados', os.path.getsize(arquivo_destino))
+    
+    def lotes_do_arquivo(self, tamanho_lote):
+        """Percorre em lotes os registros na ordem do arquivo, já com o diário.
+        
+        O CSV é lido aos poucos, sem passar pelo índice. Números repetidos
+        aparecem como estão no arquivo; linhas de número inválido ficam de fora.
+        """
+        self.compactar()
+        with open(self.arquivo_csv, 'r', newline='', encoding='utf-8-sig') as arquivo:
+            reader = csv.reader(arquivo)
+            cabecalho = next(reader, None) or CAMPOS
+            yield from _em_lotes(_registros_das_linhas(reader, cabecalho), tamanho_lote)
+            contar('linhas_lidas', reader.line_num)
+    
+    def fechar(self):
+        """Incorpora o diário ao CSV, deixando o CSV completo para outros programas."""
+        self.compactar()
+
+class ArmazenamentoSQLite:
+    """Armazena as rifas num banco SQLite indexado pelo número da rifa.
+    
+    O CSV continua sendo o formato de importação e exportação.
+    """
+    
+    def __init__(self, arquivo_db):
+        self.arquivo_db = arquivo_db
+        # A conexão pode ser usada pela thread de trabalho da interface; o acesso
+        # continua serializado porque só uma thread executa as operações
+        self.conexao = sqlite3.connect(arquivo_db, check_same_thread=False)
+        self.conexao.row_factory = sqlite3.Row
+        self._mapa = None
+        self._versao_dados = None
+        # Busca de nomes pela tabela FTS5 de trigramas (rifas_nomes), se o SQLite tiver
+        self._busca_trigramas = False
+        self.verificar_arquivo()
+    
+    def verificar_arquivo(self):
+        """Cria as tabelas e índices do banco, se ainda não existirem."""
+        with self.conexao:
+            self.conexao.execute("PRAGMA journal_mode=WAL")
+            self.conexao.execute("PRAGMA synchronous=NORMAL")
+            self.conexao.execute("""
+                CREATE TABLE IF NOT EXISTS rifas (
+                    numero INTEGER PRIMARY KEY,
+                    nome TEXT NOT NULL,
+                    nome_normalizado TEXT NOT NULL,
+                    telefone TEXT NOT NULL,
+                    data_compra TEXT NOT NULL
+                )
+            """)
+            self.conexao.execute(
+                "CREATE INDEX IF NOT EXISTS idx_rifas_nome ON rifas (nome_normalizado, numero)")
+            self.conexao.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_rifas_data ON rifas ({DATA_ORDENAVEL_SQL}, numero)")
+            
+            # Versão 1: nomes normalizados também sem acentos
+            versao = self.conexao.execute("PRAGMA user_version").fetchone()[0]
+            if versao < 1:
+                self.conexao.create_function("normalizar_nome", 1, normalizar_nome)
+                self.conexao.execute("UPDATE rifas SET nome_normalizado = normalizar_nome(nome)")
+                self.conexao.execute("PRAGMA user_version = 1")
+                versao = 1
+            
+            # Versão 2: tabela FTS5 de trigramas dos nomes, mantida pelos gatilhos
+            self._busca_trigramas = _sqlite_tem_trigramas(self.conexao)
+            if self._busca_trigramas and versao < 2:
+                self._criar_tabela_de_trigramas()
+                self.conexao.execute("PRAGMA user_version = 2")
+            elif not self._busca_trigramas and versao >= 2:
+                # Sem o FTS5 aqui, os gatilhos impediriam qualquer gravação: eles
+                # saem e a versão volta a 1, para a tabela ser refeita (com os
+                # cadastros feitos sem ela) no próximo SQLite que tiver o FTS5
+                for gatilho in ('rifas_nomes_inserir', 'rifas_nomes_apagar', 'rifas_nomes_alterar'):
+                    self.conexao.execute(f"DROP TRIGGER IF EXISTS {gatilho}")
+                self.conexao.execute("PRAGMA user_version = 1")
+    
+    def _criar_tabela_de_trigramas(self):
+        """Cria (ou refaz) a tabela FTS5 dos nomes normalizados e os gatilhos que a atualizam."""
+        self.conexao.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS rifas_nomes USING fts5(
+                nome_normalizado, content='rifas', content_rowid='numero', tokenize='trigram')
+        """)
+        self.conexao.execute("""
+            CREATE TRIGGER IF NOT EXISTS rifas_nomes_inserir AFTER INSERT ON rifas BEGIN
+                INSERT INTO rifas_nomes (rowid, nome_normalizado) VALUES (new.numero, new.nome_normalizado);
+            END
+        """)
+        self.conexao.execute("""
+            CREATE TRIGGER IF NOT EXISTS rifas_nomes_apagar AFTER DELETE ON rifas BEGIN
+                INSERT INTO rifas_nomes (rifas_nomes, rowid, nome_normalizado)
+                VALUES ('delete', old.numero, old.nome_normalizado);
+            END
+        """)
+        self.conexao.execute("""
+            CREATE TRIGGER IF NOT EXISTS rifas_nomes_alterar AFTER UPDATE ON rifas BEGIN
+                INSERT INTO rifas_nomes (rifas_nomes, rowid, nome_normalizado)
+                VALUES ('delete', old.numero, old.nome_normalizado);
+                INSERT INTO rifas_nomes (rowid, nome_normalizado) VALUES (new.numero, new.nome_normalizado);
+            END
+        """)
+        self.conexao.execute("INSERT INTO rifas_nomes (rifas_nomes) VALUES ('rebuild')")
+    
+    @staticmethod
+    def _para_registro(linha):
+        """Converte uma linha do banco no registro usado também pelo CSV."""
+        return Registro.de_linha(linha['numero'], linha['nome'], linha['telefone'],
+                                 linha['data_compra'])
+    
+    def obter(self, chave):
+        """Retorna o registro do número (já normalizado) ou None."""
+        linha = self.conexao.execute(
+            "SELECT * FROM rifas WHERE numero = ?", (chave,)).fetchone()
+        return self._para_registro(linha) if linha else None
+    
+    def inserir(self, linhas):
+        """Grava as linhas cujo número ainda está livre numa única transação.
+        
+        Returns:
+            list: True para cada linha gravada, False se o número já existia
+        """
+        gravadas = []
+        with self.conexao:
+            for numero, nome, telefone, data_compra in linhas:
+                cursor = self.conexao.execute(
+                    "INSERT OR IGNORE INTO rifas VALUES (?, ?, ?, ?, ?)",
+                    (numero, nome, normalizar_nome(nome), telefone, data_compra))
+                gravadas.append(cursor.rowcount > 0)
+        
+        if self._mapa is not None:
+            self._mapa.marcar_varios(linha[0] for linha, gravada in zip(linhas, gravadas) if gravada)
+        contar('registros_gravados', sum(gravadas))
+        return gravadas
+    
+    def mapa_numeros(self, inicio, fim):
+        """Retorna o mapa de números vendidos da faixa.
+        
+        As gravações desta conexão atualizam o mapa; se outro processo gravar
+        no banco (PRAGMA data_version muda), o mapa é montado de novo.
+        """
+        versao = self.conexao.execute("PRAGMA data_version").fetchone()[0]
+        mapa = self._mapa
+        if mapa is None or (mapa.inicio, mapa.fim) != (inicio, fim) or versao != self._versao_dados:
+            contar('cache_mapa_falhas')
+            mapa = MapaNumeros(inicio, fim)
+            cursor = self.conexao.execute(
+                "SELECT numero FROM rifas WHERE numero BETWEEN ? AND ?", (inicio, fim))
+            mapa.marcar_varios(numero for (numero,) in cursor)
+            self._mapa = mapa
+            self._versao_dados = versao
+        return mapa
+    
+    def listar(self, offset=0, limite=None, ordem='numero', decrescente=False):
+        """Lista uma página dos registros na ordem pedida (ver ORDENS).
+        
+        Cada ordem percorre um índice do banco: a chave primária, o índice
+        de nomes normalizados ou o de datas.
+        """
+        if ordem not in ORDENS_SQL:
+            raise ValueError(f"Ordem desconhecida: {ordem}")
+        direcao = ' DESC' if decrescente else ''
+        colunas = ', '.join(coluna + direcao for coluna in ORDENS_SQL[ordem])
+        cursor = self.conexao.execute(
+            f"SELECT * FROM rifas ORDER BY {colunas} LIMIT ? OFFSET ?",
+            (-1 if limite is None else limite, offset))
+        registros = [self._para_registro(linha) for linha in cursor]
+        contar('linhas_lidas', len(registros))
+        return registros
+    
+    def linhas_invalidas(self):
+        """O banco só guarda números válidos: não há linhas de quarentena."""
+        return []
+    
+    def contar_intervalo(self, inicio, fim):
+        """Conta os números cadastrados entre inicio e fim (inclusive)."""
+        return self.conexao.execute(
+            "SELECT COUNT(*) FROM rifas WHERE numero BETWEEN ? AND ?", (inicio, fim)).fetchone()[0]
+    
+    def listar_intervalo(self, inicio, fim, offset=0, limite=None):
+        """Lista, em ordem, os registros com número entre inicio e fim (inclusive)."""
+        cursor = self.conexao.execute(
+            "SELECT * FROM rifas WHERE numero BETWEEN ? AND ? ORDER BY numero LIMIT ? OFFSET ?",
+            (inicio, fim, -1 if limite is None else limite, offset))
+        return [self._para_registro(linha) for linha in cursor]
+    
+    def buscar_nome(self, nome):
+        """Busca registros cujo nome contém o texto (sem diferenciar acentos)."""
+        total, registros = self.pesquisar_nome(nome)
+        return registros
+    
+    def pesquisar_nome(self, nome, offset=0, limite=None, maximo=None):
+        """Busca uma página dos registros cujo nome contém o texto.
+        
+        Termos de 3 letras ou mais são procurados na tabela FTS5 de trigramas
+        (rifas_nomes), que devolve os números em ordem. Termos mais curtos, ou
+        um SQLite sem o FTS5, percorrem a tabela na ordem da chave primária;
+        as consultas param ao completar a página e a contagem (limitada a
+        maximo), o que é rápido para termos comuns, mas termos raros percorrem
+        a tabela inteira.
+        
+        Returns:
+            tuple: (total de registros encontrados, até maximo; registros da página)
+        """
+        termo = normalizar_nome(nome)
+        if self._busca_trigramas and len(termo) >= 3:
+            # Uma frase entre aspas casa com o trecho exato (sequência de trigramas)
+            frase = '"' + termo.replace('"', '""') + '"'
+            total = self.conexao.execute("""
+                SELECT COUNT(*) FROM (SELECT 1 FROM rifas_nomes WHERE rifas_nomes MATCH ? LIMIT ?)
+            """, (frase, -1 if maximo is None else maximo)).fetchone()[0]
+            cursor = self.conexao.execute("""
+                SELECT rifas.* FROM rifas_nomes JOIN rifas ON rifas.numero = rifas_nomes.rowid
+                WHERE rifas_nomes MATCH ? ORDER BY rifas_nomes.rowid LIMIT ? OFFSET ?
+            """, (frase, -1 if limite is None else limite, offset))
+            return total, [self._para_registro(linha) for linha in cursor]
+        
+        total = self.conexao.execute("""
+            SELECT COUNT(*) FROM (SELECT 1 FROM rifas WHERE instr(nome_normalizado, ?) > 0 LIMIT ?)
+        """, (termo, -1 if maximo is None else maximo)).fetchone()[0]
+        cursor = self.conexao.execute("""
+            SELECT * FROM rifas WHERE instr(nome_normalizado, ?) > 0
+            ORDER BY numero LIMIT ? OFFSET ?
+        """, (termo, -1 if limite is None else limite, offset))
+        return total, [self._para_registro(linha) for linha in cursor]
+    
+    def exportar_csv(self, arquivo_destino):
+        """Exporta os registros do banco para um arquivo CSV."""
+        cursor = self.conexao.execute(
+            "SELECT numero, nome, telefone, data_compra FROM rifas ORDER BY numero")
+        with open(arquivo_destino, 'w', newline='', encoding='utf-8') as arquivo:
+            writer = csv.writer(arquivo)
+            writer.writerow(CAMPOS)
+            writer.writerows(cursor)
+        contar('bytes_gravados', os.path.getsize(arquivo_destino))
+    
+    def lotes_do_arquivo(self, tamanho_lote):
+        """Percorre em lotes os registros na ordem da tabela (a dos números)."""
+        cursor = self.conexao.execute("SELECT * FROM rifas ORDER BY numero")
+        while True:
+            linhas = cursor.fetchmany(tamanho_lote)
+            if not linhas:
+                return
+            contar('linhas_lidas', len(linhas))
+            yield [self._para_registro(linha) for linha in linhas]
+    
+    def importar_csv(self, arquivo_origem):
+        """Importa um CSV de rifas para o banco (a primeira ocorrência prevalece).
+        
+        Returns:
+            list: True para cada linha gravada, False se o número já existia
+        """
+        linhas = []
+        with open(arquivo_origem, 'r', newline='', encoding='utf-8-sig') as arquivo:
+            for row in csv.DictReader(arquivo):
+                chave = normalizar_numero(row.get('numero') or '')
+                if chave is not None:
+                    linhas.append([chave, row.get('nome') or '', row.get('telefone') or '',
+                                   row.get('data_compra') or ''])
+        return self.inserir(linhas)
+    
+    def compactar(self):
+        """Transfere o WAL do SQLite para o banco e esvazia o arquivo -wal.
+        
+        Returns:
+            int: Quantidade de páginas transferidas
+        """
+        ocupado, paginas, transferidas = self.conexao.execute(
+            "PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return transferidas
+    
+    def reservar_proximo(self, inicio, nome, telefone, data_compra):
+        """Grava o primeiro número livre a partir de inicio, de forma atômica.
+        
+        BEGIN IMMEDIATE bloqueia outras gravações no banco, de qualquer
+        processo, entre a escolha do número e a gravação.
+        
+        Returns:
+            int: O número reservado
+        """
+        self.conexao.execute("BEGIN IMMEDIATE")
+        try:
+            chave = self.conexao.execute("""
+                SELECT MIN(livre) FROM (
+                    SELECT ? AS livre WHERE NOT EXISTS (SELECT 1 FROM rifas WHERE numero = ?)
+                    UNION ALL
+                    SELECT numero + 1 FROM rifas AS r
+                    WHERE numero >= ? AND NOT EXISTS (SELECT 1 FROM rifas WHERE numero = r.numero + 1)
+                )
+            """, (inicio, inicio, inicio)).fetchone()[0]
+            self.conexao.execute(
+                "INSERT INTO rifas (numero, nome, nome_normalizado, telefone, data_compra) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (chave, nome, normalizar_nome(nome), telefone, data_compra))
+            self.conexao.commit()
+        except Exception:
+            self.conexao.rollback()
+            raise
+        
+        if self._mapa is not None:
+            self._mapa.marcar(chave)
+        return chave
+    
+    def fechar(self):
+        """Fecha a conexão com o banco."""
+        self.conexao.close()
+
+class ArmazenamentoRemoto:
+    """Usa um servidor de rifas (servidor.py) na rede local como armazenamento.
+    
+    Cada operação vira um pedido HTTP/JSON numa conexão mantida aberta; a
+    verificação e gravação dos números acontecem no servidor, então vários
+    pontos de venda podem cadastrar ao mesmo tempo.
+    """
+    
+    def __init__(self, url, timeout=30):
+        partes = urlsplit(url)
+        self.url = url
+        self.host = partes.hostname
+        self.porta = partes.port or 80
+        self.timeout = timeout
+        self._conexao = None
+        self._lock = threading.Lock()
+        self.verificar_arquivo()
+    
+    def _pedir(self, metodo, caminho, parametros=None, dados=None):
+        if parametros:
+            caminho += '?' + urlencode({nome: valor for nome, valor in parametros.items()
+                                        if valor is not None})
+        corpo = json.dumps(dados).encode('utf-8') if dados is not None else None
+        cabecalhos = {'Content-Type': 'application/json'} if corpo is not None else {}
+        
+        with self._lock:
+            # Consultas podem ser repetidas numa conexão nova se a antiga caiu;
+            # gravações não, para não gravar duas vezes
+            tentativas = 2 if metodo == 'GET' else 1
+            for tentativa in range(tentativas):
+                if self._conexao is None:
+                    self._conexao = http.client.HTTPConnection(self.host, self.porta,
+                                                               timeout=self.timeout)
+                try:
+                    self._conexao.request(metodo, caminho, body=corpo, headers=cabecalhos)
+                    resposta = self._conexao.getresponse()
+                    conteudo = resposta.read()
+                    break
+                except (OSError, http.client.HTTPException) as erro:
+                    self._conexao.close()
+                    self._conexao = None
+                    if tentativa == tentativas - 1:
+                        raise ErroServidor(f"Falha ao falar com o servidor {self.url}: {erro}")
+        
+        contar('bytes_enviados', len(corpo or b''))
+        contar('bytes_recebidos', len(conteudo))
+        resultado = json.loads(conteudo.decode('utf-8'))
+        if resposta.status != 200:
+            raise ErroServidor(resultado.get('erro', f"Erro {resposta.status} do servidor"))
+        return resultado
+    
+    def verificar_arquivo(self):
+        """Verifica se o servidor está respondendo."""
+        self._pedir('GET', '/status')
+    
+    def obter(self, chave):
+        """Retorna o registro do número (já normalizado) ou None."""
+        registro = self._pedir('GET', f'/rifas/{chave}')['registro']
+        return Registro.de_dicionario(registro) if registro else None
+    
+    def inserir(self, linhas):
+        """Grava as linhas cujo número ainda está livre no servidor.
+        
+        Returns:
+            list: True para cada linha gravada, False se o número já existia
+        """
+        if not linhas:
+            return []
+        return self._pedir('POST', '/rifas', dados={'linhas': [list(linha) for linha in linhas]})['gravadas']
+    
+    def reservar_proximo(self, inicio, nome, telefone, data_compra):
+        """Grava o primeiro número livre a partir de inicio, de forma atômica.
+        
+        Returns:
+            int: O número reservado
+        """
+        return self._pedir('POST', '/reservar', dados={
+            'inicio': inicio, 'nome': nome, 'telefone': telefone, 'data_compra': data_compra})['numero']
+    
+    def mapa_numeros(self, inicio, fim):
+        """Busca no servidor o mapa de números vendidos da faixa."""
+        resultado = self._pedir('GET', '/mapa', {'inicio': inicio, 'fim': fim})
+        return MapaNumeros(inicio, fim, base64.b64decode(resultado['bits']))
+    
+    def listar(self, offset=0, limite=None, ordem='numero', decrescente=False):
+        """Lista uma página dos registros na ordem pedida (ver ORDENS)."""
+        return _para_registros(self._pedir('GET', '/rifas', {
+            'offset': offset, 'limite': limite, 'ordem': ordem,
+            'decrescente': int(decrescente)})['registros'])
+    
+    def linhas_invalidas(self):
+        """Linhas do arquivo do servidor deixadas de fora por terem número inválido."""
+        return self._pedir('GET', '/invalidas')['linhas']
+    
+    def contar_intervalo(self, inicio, fim):
+        """Conta os números cadastrados entre inicio e fim (inclusive)."""
+        return self._pedir('GET', '/intervalo/contagem', {'inicio': inicio, 'fim': fim})['total']
+    
+    def listar_intervalo(self, inicio, fim, offset=0, limite=None):
+        """Lista, em ordem, os registros com número entre inicio e fim (inclusive)."""
+        return _para_registros(self._pedir('GET', '/intervalo', {
+            'inicio': inicio, 'fim': fim, 'offset': offset, 'limite': limite})['registros'])
+    
+    def buscar_nome(self, nome):
+        """Busca registros cujo nome contém o texto (sem diferenciar acentos)."""
+        total, registros = self.pesquisar_nome(nome)
+        return registros
+    
+    def pesquisar_nome(self, nome, offset=0, limite=None, maximo=None):
+        """Busca uma página dos registros cujo nome contém o texto.
+        
+        Returns:
+            tuple: (total de registros encontrados, até maximo; registros da página)
+        """
+        resultado = self._pedir('GET', '/busca', {
+            'nome': nome, 'offset': offset, 'limite': limite, 'maximo': maximo})
+        return resultado['total'], _para_registros(resultado['registros'])
+    
+    def exportar_csv(self, arquivo_destino):
+        """Exporta os registros do servidor para um arquivo CSV local."""
+        with open(arquivo_destino, 'w', newline='', encoding='utf-8') as arquivo:
+            writer = csv.DictWriter(arquivo, fieldnames=CAMPOS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(self.listar())
+    
+    def lotes_do_arquivo(self, tamanho_lote):
+        """Percorre em lotes os registros do servidor, em ordem de número.
+        
+        Cada página começa depois do último número da anterior, então
+        cadastros feitos nesse meio tempo não deslocam as páginas.
+        """
+        inicio = 0
+        while True:
+            lote = self.listar_intervalo(inicio, MAIOR_NUMERO, 0, tamanho_lote)
+            if not lote:
+                return
+            yield lote
+            inicio = lote[-1].numero + 1
+    
+    def compactar(self):
+        """Pede ao servidor que consolide os cadastros recentes no arquivo dele."""
+        return self._pedir('POST', '/compactar')['incorporados']
+    
+    def fechar(self):
+        """Fecha a conexão com o servidor."""
+        with self._lock:
+            if self._conexao is not None:
+                self._conexao.close()
+                self._conexao = None
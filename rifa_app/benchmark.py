@@ -0,0 +1,272 @@
+"""Medição de desempenho do RifaManager e do csv_merger com arquivos grandes.
+
+Uso: python benchmark.py [tamanhos...] [--saida resultado.json] [--comparar anterior.json]
+                         [--formato csv|db]
+
+Para cada tamanho (padrão: 1000 100000 1000000 registros) é gerado um arquivo
+de rifas com nomes e telefones brasileiros sintéticos, e as operações
+principais são cronometradas: vazão (operações/s), latência p50/p99 e o pico
+de memória do processo. Cada tamanho roda num processo separado, para que o
+pico de memória de um não se misture com o dos outros.
+
+O resultado é salvo em JSON. Com --comparar, as operações que ficaram mais
+lentas que o arquivo anterior (além de LIMITE_REGRESSAO) são listadas e o
+programa termina com código 1.
+"""
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from csv_merger import merge_csv_files
+from rifa_manager import RifaManager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+TAMANHOS_PADRAO = [1000, 100000, 1000000]
+
+# Piora relativa (vazão ou p99) a partir da qual uma operação é apontada como regressão
+LIMITE_REGRESSAO = 0.20
+
+# Latências p99 abaixo disso (ms) são ruído de medição e não são comparadas
+MINIMO_P99_COMPARADO_MS = 1.0
+
+# Repetições de cada operação; as de leitura completa do arquivo repetem menos
+REPETICOES = {
+    'carregar': 3,
+    'cadastrar_comprador': 200,
+    'cadastrar_multiplos_numeros': 20,
+    'buscar_por_numero': 2000,
+    'buscar_por_nome': 100,
+    'listar_compradores': 5,
+    'exportar_para_csv': 3,
+    'exportar': 3,
+    'merge_csv_files': 3,
+}
+
+# Quantidade de números em cada chamada de cadastrar_multiplos_numeros
+NUMEROS_POR_CADASTRO_MULTIPLO = 50
+
+PRENOMES = [
+    "Ana", "Maria", "José", "João", "Antônio", "Francisco", "Carlos", "Paulo", "Pedro",
+    "Lucas", "Luiz", "Marcos", "Luís", "Gabriel", "Rafael", "Daniel", "Marcelo", "Bruno",
+    "Eduardo", "Felipe", "Raimundo", "Rodrigo", "Francisca", "Antônia", "Adriana",
+    "Juliana", "Márcia", "Fernanda", "Patrícia", "Aline", "Sandra", "Camila", "Amanda",
+    "Bruna", "Jéssica", "Letícia", "Júlia", "Luciana", "Vanessa", "Mariana", "Gabriela",
+    "Beatriz", "Larissa", "Sebastião", "Conceição", "Rita", "Tereza", "Vitória", "Cecília",
+]
+SOBRENOMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira",
+    "Lima", "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes",
+    "Soares", "Fernandes", "Vieira", "Barbosa", "Rocha", "Dias", "Nascimento", "Andrade",
+    "Moreira", "Nunes", "Marques", "Machado", "Mendes", "Freitas", "Cardoso", "Ramos",
+    "Gonçalves", "Santana", "Teixeira", "Araújo", "Conceição", "Monteiro", "Moura",
+]
+DDDS = [11, 21, 31, 41, 47, 48, 51, 61, 62, 71, 81, 85, 91, 92]
+
+def gerar_registros(quantidade, sorteio, inicio=1):
+    """Gera linhas [numero, nome, telefone, data_compra] com números consecutivos."""
+    data_base = datetime(2024, 1, 1)
+    for numero in range(inicio, inicio + quantidade):
+        nome = (f"{sorteio.choice(PRENOMES)} {sorteio.choice(SOBRENOMES)} "
+                f"{sorteio.choice(SOBRENOMES)}")
+        telefone = (f"({sorteio.choice(DDDS)}) 9{sorteio.randrange(10000):04d}-"
+                    f"{sorteio.randrange(10000):04d}")
+        data = data_base + timedelta(minutes=sorteio.randrange(525600))
+        yield [numero, nome, telefone, data.strftime("%d/%m/%Y %H:%M")]
+
+def gerar_arquivo(caminho, quantidade, sorteio, inicio=1):
+    with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+        writer = csv.writer(arquivo)
+        writer.writerow(['numero', 'nome', 'telefone', 'data_compra'])
+        writer.writerows(gerar_registros(quantidade, sorteio, inicio))
+
+def pico_memoria_mb():
+    """Pico de memória residente (RSS) do processo em MB, ou None se indisponível."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * fracao))]
+
+def cronometrar(funcao, repeticoes, preparar=None):
+    """Executa funcao(i) repeticoes vezes e resume os tempos.
+    
+    preparar(i), se informado, roda antes de cada execução, fora da medição.
+    """
+    tempos = []
+    for i in range(repeticoes):
+        if preparar is not None:
+            preparar(i)
+        inicio = time.perf_counter()
+        funcao(i)
+        tempos.append(time.perf_counter() - inicio)
+    
+    return {
+        'repeticoes': repeticoes,
+        'operacoes_por_segundo': round(repeticoes / sum(tempos), 2) if sum(tempos) else None,
+        'p50_ms': round(percentil(tempos, 0.50) * 1000, 3),
+        'p99_ms': round(percentil(tempos, 0.99) * 1000, 3),
+    }
+
+def medir_tamanho(tamanho, formato='csv', semente=0):
+    """Mede todas as operações com um arquivo de tamanho registros. Roda num processo próprio."""
+    sorteio = random.Random(semente)
+    pasta = tempfile.mkdtemp(prefix='benchmark_rifas_')
+    try:
+        original = os.path.join(pasta, 'original.csv')
+        gerar_arquivo(original, tamanho, sorteio)
+        
+        # Origem da importação: metade dos números já existe no destino
+        quantidade_origem = max(1, tamanho // 10)
+        origem = os.path.join(pasta, 'origem.csv')
+        gerar_arquivo(origem, quantidade_origem, sorteio, tamanho - quantidade_origem // 2 + 1)
+        
+        arquivo = os.path.join(pasta, f'rifas.{formato}')
+        if formato == 'db':
+            RifaManager(arquivo).armazenamento.importar_csv(original)
+        else:
+            shutil.copyfile(original, arquivo)
+        
+        resultados = {}
+        
+        def carregar(i):
+            rifa = RifaManager(arquivo)
+            rifa.buscar_por_numero(1)
+            rifa.fechar()
+        resultados['carregar'] = cronometrar(carregar, REPETICOES['carregar'])
+        
+        rifa = RifaManager(arquivo)
+        rifa.buscar_por_numero(1)
+        proximo = tamanho + 1
+        
+        def cadastrar(i):
+            rifa.cadastrar_comprador(str(proximo + i), "Comprador Benchmark", "(11) 90000-0000")
+        resultados['cadastrar_comprador'] = cronometrar(
+            cadastrar, REPETICOES['cadastrar_comprador'])
+        proximo += REPETICOES['cadastrar_comprador']
+        
+        def cadastrar_multiplos(i):
+            primeiro = proximo + i * NUMEROS_POR_CADASTRO_MULTIPLO
+            numeros = [str(n) for n in range(primeiro, primeiro + NUMEROS_POR_CADASTRO_MULTIPLO)]
+            rifa.cadastrar_multiplos_numeros(numeros, "Comprador Benchmark", "(11) 90000-0000")
+        resultados['cadastrar_multiplos_numeros'] = cronometrar(
+            cadastrar_multiplos, REPETICOES['cadastrar_multiplos_numeros'])
+        
+        numeros = [str(sorteio.randint(1, tamanho)) for _ in range(REPETICOES['buscar_por_numero'])]
+        resultados['buscar_por_numero'] = cronometrar(
+            lambda i: rifa.buscar_por_numero(numeros[i]), len(numeros))
+        
+        nomes = [sorteio.choice([sorteio.choice(PRENOMES), sorteio.choice(SOBRENOMES),
+                                 f"{sorteio.choice(PRENOMES)} {sorteio.choice(SOBRENOMES)}"])
+                 for _ in range(REPETICOES['buscar_por_nome'])]
+        resultados['buscar_por_nome'] = cronometrar(
+            lambda i: rifa.buscar_por_nome(nomes[i]), len(nomes))
+        
+        resultados['listar_compradores'] = cronometrar(
+            lambda i: rifa.listar_compradores(), REPETICOES['listar_compradores'])
+        
+        exportado = os.path.join(pasta, 'exportado.csv')
+        resultados['exportar_para_csv'] = cronometrar(
+            lambda i: rifa.exportar_para_csv(exportado), REPETICOES['exportar_para_csv'])
+        # Exportação em lotes, em ordem de número, com filtro de nome
+        exportado_jsonl = os.path.join(pasta, 'exportado.jsonl')
+        resultados['exportar'] = cronometrar(
+            lambda i: rifa.exportar(exportado_jsonl, nome="Silva"), REPETICOES['exportar'])
+        rifa.fechar()
+        
+        # A importação sempre parte de uma cópia nova do arquivo original (cópia fora da medição)
+        destino = os.path.join(pasta, 'destino.csv')
+        resultados['merge_csv_files'] = cronometrar(
+            lambda i: merge_csv_files(destino, origem),
+            REPETICOES['merge_csv_files'],
+            preparar=lambda i: shutil.copyfile(original, destino))
+        
+        return {'operacoes': resultados, 'pico_memoria_mb': pico_memoria_mb()}
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+def comparar(atual, anterior):
+    """Lista as operações que pioraram além de LIMITE_REGRESSAO em relação ao resultado anterior."""
+    regressoes = []
+    for tamanho, medicao in atual['resultados'].items():
+        antes = anterior.get('resultados', {}).get(tamanho)
+        if antes is None:
+            continue
+        for operacao, valores in medicao['operacoes'].items():
+            valores_antes = antes['operacoes'].get(operacao)
+            if valores_antes is None:
+                continue
+            
+            vazao, vazao_antes = valores['operacoes_por_segundo'], valores_antes['operacoes_por_segundo']
+            if vazao and vazao_antes and vazao < vazao_antes * (1 - LIMITE_REGRESSAO):
+                regressoes.append(f"{tamanho} registros, {operacao}: "
+                                  f"{vazao_antes:.1f} -> {vazao:.1f} operações/s")
+            if (valores['p99_ms'] >= MINIMO_P99_COMPARADO_MS
+                    and valores['p99_ms'] > valores_antes['p99_ms'] * (1 + LIMITE_REGRESSAO)):
+                regressoes.append(f"{tamanho} registros, {operacao}: "
+                                  f"p99 {valores_antes['p99_ms']:.2f} -> {valores['p99_ms']:.2f} ms")
+    return regressoes
+
+def main():
+    argumentos = sys.argv[1:]
+    opcoes = {'--saida': None, '--comparar': None, '--formato': 'csv'}
+    tamanhos = []
+    while argumentos:
+        argumento = argumentos.pop(0)
+        if argumento in opcoes and argumentos:
+            opcoes[argumento] = argumentos.pop(0)
+        else:
+            tamanhos.append(int(argumento))
+    tamanhos = tamanhos or TAMANHOS_PADRAO
+    saida = opcoes['--saida'] or f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    
+    resultado = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'formato': opcoes['--formato'],
+        'resultados': {},
+    }
+    for tamanho in tamanhos:
+        print(f"\n=== {tamanho} registros ({opcoes['--formato']}) ===")
+        # Um processo novo por tamanho: o pico de memória é medido por processo
+        with multiprocessing.Pool(1) as pool:
+            medicao = pool.apply(medir_tamanho, (tamanho, opcoes['--formato']))
+        resultado['resultados'][str(tamanho)] = medicao
+        
+        print(f"{'Operação':<30} {'op/s':>12} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+        for operacao, valores in medicao['operacoes'].items():
+            print(f"{operacao:<30} {valores['operacoes_por_segundo'] or 0:>12.1f} "
+                  f"{valores['p50_ms']:>10.3f} {valores['p99_ms']:>10.3f}")
+        if medicao['pico_memoria_mb'] is not None:
+            print(f"Pico de memória: {medicao['pico_memoria_mb']} MB")
+    
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"\nResultado salvo em {saida}")
+    
+    if opcoes['--comparar']:
+        with open(opcoes['--comparar'], 'r', encoding='utf-8') as arquivo:
+            regressoes = comparar(resultado, json.load(arquivo))
+        for regressao in regressoes:
+            print(f"REGRESSÃO: {regressao}")
+        if regressoes:
+            sys.exit(1)
+        print(f"Nenhuma regressão em relação a {opcoes['--comparar']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Conflitos da importação: o mesmo número com compradores diferentes.
+
+Os registros comparados são tuplas
+
+    (origem, posição, número digitado, nome, telefone, data da compra)
+
+em que origem é o índice do arquivo de origem (DESTINO para o registro que
+já estava no arquivo de destino) e posição é a ordem da linha entre todas as
+origens. Registros do mesmo comprador (mesmo nome, sem diferenciar acentos e
+maiúsculas, e mesmos algarismos no telefone) são só repetições, não conflitos.
+
+Modos de resolução (quem fica com o número):
+
+    manter_existente  o primeiro registro: o do destino, senão o da primeira origem
+    mais_recente      o de data da compra mais recente (sem data conta como o mais
+                      antigo; no empate, o primeiro)
+    separar           o do destino, se houver; senão nenhum: o número disputado
+                      não é importado e os registros vão para o relatório
+"""
+import csv
+import re
+from datetime import datetime
+from indice_nomes import normalizar_nome
+from registro import interpretar_data
+
+MODOS = ('manter_existente', 'mais_recente', 'separar')
+
+# Origem e posição dos registros que já estavam no destino
+DESTINO = -1
+
+# Colunas do relatório: um par de registros por linha; "a" é o que ficou com
+# o número (ou o primeiro, se nenhum ficou) e "b" o que disputava com ele
+CAMPOS_RELATORIO = ['numero', 'resolucao',
+                    'origem_a', 'nome_a', 'telefone_a', 'data_compra_a',
+                    'origem_b', 'nome_b', 'telefone_b', 'data_compra_b']
+
+NAO_ALGARISMOS = re.compile(r'\D+')
+
+def _mesmo_comprador(registro, outro):
+    # Textos iguais dispensam a normalização; telefones diferentes, a do nome
+    if registro[3:5] == outro[3:5]:
+        return True
+    if NAO_ALGARISMOS.sub('', registro[4]) != NAO_ALGARISMOS.sub('', outro[4]):
+        return False
+    return normalizar_nome(registro[3]) == normalizar_nome(outro[3])
+
+def _data(registro):
+    data = interpretar_data(registro[5]) if registro[5] else None
+    return datetime.min if data is None else data
+
+def resolver(grupo, modo):
+    """Decide qual registro do grupo (mesmo número, na ordem das linhas) fica com o número.
+    
+    Returns:
+        tuple: (escolhido ou None, referência, registros de outros compradores
+        que a referência); a referência é o escolhido, ou o primeiro se nenhum foi
+    """
+    primeiro = grupo[0]
+    if modo == 'mais_recente':
+        # max devolve o primeiro entre os de mesma data
+        escolhido = max(grupo, key=_data)
+        if escolhido is not primeiro and _mesmo_comprador(escolhido, primeiro):
+            escolhido = primeiro
+    else:
+        escolhido = primeiro
+    
+    referencia = escolhido
+    outros = [registro for registro in grupo
+              if registro is not referencia and not _mesmo_comprador(registro, referencia)]
+    if modo == 'separar' and outros and primeiro[0] != DESTINO:
+        # Disputado só entre as origens: nenhum fica com o número
+        escolhido = None
+    return escolhido, referencia, outros
+
+def descrever(numero, escolhido, referencia, outro, nome_da_origem):
+    """Linha do relatório (campo de CAMPOS_RELATORIO -> texto) para um par em conflito.
+    
+    Args:
+        nome_da_origem: função origem -> nome do arquivo
+    """
+    linha = {'numero': str(numero), 'resolucao': 'mantido_a' if escolhido is not None else 'nenhum'}
+    for sufixo, registro in (('_a', referencia), ('_b', outro)):
+        linha['origem' + sufixo] = nome_da_origem(registro[0])
+        linha['nome' + sufixo] = registro[3]
+        linha['telefone' + sufixo] = registro[4]
+        linha['data_compra' + sufixo] = registro[5]
+    return linha
+
+def gravar_relatorio(caminho, linhas):
+    """Grava as linhas de descrever num CSV (o Excel abre com os acentos certos)."""
+    with open(caminho, 'w', newline='', encoding='utf-8-sig') as arquivo:
+        writer = csv.DictWriter(arquivo, fieldnames=CAMPOS_RELATORIO)
+        writer.writeheader()
+        writer.writerows(linhas)
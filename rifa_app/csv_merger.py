@@ -1,129 +1,1208 @@
 import csv
+import glob
+import io
 import os
+import re
+import shutil
 import sys
+from bisect import bisect_right
+from itertools import chain, repeat
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime 
+from armazenamento import CAMPOS, normalizar_numero
+from conflitos import DESTINO, MODOS as MODOS_CONFLITO, descrever, gravar_relatorio, resolver
+from diario import compactar_diario, sincronizar_diretorio
+from formato_origem import ERROS_DECODIFICACAO, detectar_formato
+from metricas import contar, medido
+from registro import interpretar_data
+from retomada import PontosDeControle, assinatura_do_arquivo
+from trava import trava_do_arquivo
 
-def merge_csv_files(arquivo_destino='rifas.csv', arquivo_origem=None):
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+# Motores de leitura das origens: 'pandas' lê e deduplica em colunas, em
+# blocos; 'csv' é o caminho linha a linha da biblioteca padrão
+MOTORES = ('pandas', 'csv')
+
+# Linhas lidas de cada vez pelo motor pandas
+LINHAS_POR_BLOCO = 200000
+
+# Colunas das tabelas produzidas pelo motor pandas
+COLUNAS_ANALISE = ['chave', 'numero', 'nome', 'telefone', 'data_compra']
+
+# Origens menores que isso (somadas) são lidas pelo motor 'csv' quando o
+# motor não é informado
+MINIMO_BYTES_PANDAS = 1 << 20
+
+# Números com até esta quantidade de algarismos cabem num inteiro de 64 bits;
+# arquivos com números maiores são lidos pelo caminho linha a linha
+DIGITOS_INT64 = 18
+
+# Intervalo (em linhas) entre os avisos de progresso e verificações de cancelamento
+INTERVALO_PROGRESSO = 10000
+
+# Linhas da origem gravadas no destino de cada vez na importação retomável;
+# depois de cada parte o ponto de controle é atualizado
+LINHAS_POR_PARTE = 50000
+
+# Linhas enviadas de cada vez a armazenamento.inserir ao importar para um
+# armazenamento que não é um CSV local (banco SQLite ou servidor de rifas)
+LINHAS_POR_ENVIO = 5000
+
+# Destinos das linhas das origens, na ordem das listas de _classificar_linhas e
+# das chaves 'numeros_<classificação>' e 'total_<classificação>' das estatísticas:
+#   adicionados   gravados no destino
+#   substituidos  tomaram o lugar do registro do destino ('mais_recente')
+#   preteridos    em conflito, perderam para uma compra mais recente ('mais_recente')
+#   separados     em conflito, foram só para o relatório ('separar')
+#   ignorados     o número já era do mesmo comprador ou, em 'manter_existente', de outro
+#   invalidos     número inválido
+CLASSIFICACOES = ('adicionados', 'substituidos', 'preteridos', 'separados', 'ignorados', 'invalidos')
+
+# Tamanho dos blocos lidos ao procurar números no arquivo de destino
+TAMANHO_BLOCO = 1 << 22
+
+# Acima de um candidato a cada tantos bytes do destino, os números encontrados
+# no destino são convertidos em int em vez de os candidatos em bytes
+BYTES_POR_CANDIDATO = 256
+
+# Número na primeira coluna de uma linha CSV (com ou sem aspas e zeros à esquerda)
+PADRAO_NUMERO = re.compile(rb'\n"?0*(\d+)"?,')
+
+# A linha inteira e o número, para guardar os registros do destino
+PADRAO_LINHA = re.compile(rb'\n("?0*(\d+)"?,[^\r\n]*)')
+
+# Trecho entre aspas dentro de uma linha. Sem eles, sobra uma aspa só nas
+# linhas com um número ímpar de aspas: um campo entre aspas que continua em
+# outra linha, e as linhas seguintes não começam com um número
+PADRAO_ENTRE_ASPAS = re.compile(rb'"[^"\n]*"')
+
+class ImportacaoCancelada(Exception):
+    """Indica que a importação foi cancelada antes de gravar o destino."""
+
+class OrigemForaDoMotorPandas(Exception):
+    """Origem que o motor pandas não trata e que é lida pelo caminho linha a linha."""
+
+def _verificar_cancelamento(cancelar):
+    if cancelar is not None and cancelar.is_set():
+        raise ImportacaoCancelada()
+
+def numeros_existentes_no_destino(arquivo_destino, candidatos, registros=False):
+    """Retorna quais dos números candidatos já existem no arquivo de destino.
+    
+    O destino é percorrido em blocos e só os números candidatos são guardados,
+    então o uso de memória não depende do tamanho do destino.
+    
+    Com registros=True, retorna um dicionário número -> registro do destino
+    (como em conflitos.py, com origem DESTINO), da primeira linha do número.
     """
-    Mescla um arquivo CSV externo com o arquivo de rifas local.
-    Trata números repetidos, mantendo apenas a primeira ocorrência.
+    existentes = {} if registros else set()
+    tamanho = os.path.getsize(arquivo_destino)
+    contar('bytes_lidos', tamanho)
     
-    Args:
-        arquivo_destino: Arquivo CSV destino (padrão: rifas.csv)
-        arquivo_origem: Arquivo CSV de origem a ser mesclado
+    with open(arquivo_destino, 'rb') as arquivo:
+        headers = next(csv.reader([arquivo.readline().decode('utf-8-sig')]), None) or CAMPOS
+        idx_numero = headers.index('numero') if 'numero' in headers else 0
+        indices = [headers.index(campo) if campo in headers else None for campo in CAMPOS]
         
-    Returns:
-        tuple: (sucesso, mensagem, estatísticas)
-    """
-    if not arquivo_origem or not os.path.exists(arquivo_origem):
-        return False, "Arquivo de origem não encontrado.", {}
+        def registro_do_destino(campos):
+            textos = [campos[i].strip() if i is not None and i < len(campos) else ''
+                      for i in indices]
+            return (DESTINO, DESTINO, textos[0], textos[1], textos[2], textos[3])
         
-    # Verificar se o arquivo de destino existe
-    if not os.path.exists(arquivo_destino):
-        with open(arquivo_destino, 'w', newline='', encoding='utf-8') as arquivo:
-            writer = csv.writer(arquivo)
-            writer.writerow(['numero', 'nome', 'telefone', 'data_compra'])
+        def procurar_com_csv(linhas):
+            reader = csv.reader(linha.decode('utf-8') for linha in linhas)
+            for campos in reader:
+                if idx_numero < len(campos):
+                    numero = normalizar_numero(campos[idx_numero])
+                    if numero in candidatos:
+                        if not registros:
+                            existentes.add(numero)
+                        elif numero not in existentes:
+                            existentes[numero] = registro_do_destino(campos)
+            contar('linhas_lidas', reader.line_num)
+        
+        if idx_numero != 0:
+            # Caminho lento: a coluna de números não é a primeira
+            procurar_com_csv(arquivo)
+            return existentes
+        
+        # Caminho rápido: os números são extraídos como bytes, sem decodificar
+        # nem interpretar as linhas do CSV. Com muitos candidatos para o tamanho
+        # do destino, é mais barato converter os números encontrados em int do
+        # que os candidatos em bytes. Vale enquanto cada linha do arquivo é um
+        # registro; a partir do primeiro campo entre aspas com quebra de linha
+        # (um nome em duas linhas, por exemplo), o resto é lido pelo csv.reader
+        converter_encontrados = len(candidatos) * BYTES_POR_CANDIDATO > tamanho
+        if not converter_encontrados:
+            candidatos_bytes = {str(numero).encode() for numero in candidatos}
+        resto = b''
+        while True:
+            lido = arquivo.read(TAMANHO_BLOCO)
+            if lido:
+                # Processar só linhas completas; o restante vai para o próximo bloco
+                bloco = resto + lido
+                fim = bloco.rfind(b'\n') + 1
+                bloco, resto = bloco[:fim], bloco[fim:]
+            else:
+                bloco, resto = resto, b''
+            
+            if b'"' in bloco and b'"' in PADRAO_ENTRE_ASPAS.sub(b'', bloco):
+                # Completar a linha interrompida no fim do bloco antes de passar ao csv.reader
+                procurar_com_csv(chain(io.BytesIO(bloco + resto + arquivo.readline()), arquivo))
+                break
+            
+            encontrados = PADRAO_NUMERO.findall(b'\n' + bloco)
+            contar('linhas_lidas', len(encontrados))
+            if converter_encontrados:
+                achados = candidatos.intersection(map(int, encontrados))
+            else:
+                achados = {int(numero) for numero in candidatos_bytes.intersection(encontrados)}
+            
+            if not registros:
+                existentes.update(achados)
+            elif achados.difference(existentes):
+                # Só os blocos com números novos são lidos de novo, agora com as linhas
+                for linha, numero in PADRAO_LINHA.findall(b'\n' + bloco):
+                    numero = int(numero)
+                    if numero in achados and numero not in existentes:
+                        campos = next(csv.reader([linha.decode('utf-8')]))
+                        existentes[numero] = registro_do_destino(campos)
+            if not lido:
+                break
+    
+    return existentes
+
+def _ler_cabecalho(caminho):
+    """Lê a linha de cabeçalho de um arquivo CSV."""
+    with open(caminho, 'r', newline='', encoding='utf-8-sig') as arquivo:
+        return next(csv.reader(arquivo), None) or CAMPOS
+
+def _indices_das_colunas(headers):
+    """Posições de numero, nome, telefone e data_compra (-1 se não houver) no cabeçalho da origem."""
+    # Verificar se os cabeçalhos existem e contêm pelo menos 'numero' e 'nome'
+    if not (headers and 'numero' in headers and 'nome' in headers):
+        raise ValueError("Formato de arquivo inválido. Cabeçalhos necessários: numero, nome")
+    
+    return (headers.index('numero'), headers.index('nome'),
+            headers.index('telefone') if 'telefone' in headers else -1,
+            headers.index('data_compra') if 'data_compra' in headers else -1)
+
+def _ler_origem(arquivo_origem):
+    """Gera as linhas do arquivo de origem como dicionários no formato de rifas.
     
-    # Ler números existentes no arquivo de destino
-    numeros_existentes = set()
-    dados_destino = []
+    A codificação, o delimitador e os nomes das colunas vêm de detectar_formato.
+    """
+    formato = detectar_formato(arquivo_origem)
+    idx_numero, idx_nome, idx_telefone, idx_data = _indices_das_colunas(formato.colunas)
     
-    with open(arquivo_destino, 'r', encoding='utf-8') as arquivo:
-        reader = csv.DictReader(arquivo)
+    with open(arquivo_origem, 'r', newline='', encoding=formato.encoding,
+              errors=ERROS_DECODIFICACAO) as arquivo:
+        reader = csv.reader(arquivo, delimiter=formato.delimitador)
+        next(reader, None)
+        
         for row in reader:
-            numeros_existentes.add(row['numero'])
-            dados_destino.append(row)
+            if len(row) > idx_numero and len(row) > idx_nome:
+                yield {
+                    'numero': row[idx_numero].strip(),
+                    'nome': row[idx_nome].strip(),
+                    'telefone': row[idx_telefone] if 0 <= idx_telefone < len(row) else "",
+                    'data_compra': row[idx_data].strip() if 0 <= idx_data < len(row) else ""
+                }
+
+def _ler_origem_a_partir(arquivo_origem, inicio=0):
+    """Como _ler_origem, a partir do byte inicio, gerando (linha, posição logo após ela).
+    
+    O cabeçalho é sempre lido do começo do arquivo; inicio deve ser uma
+    posição gerada numa leitura anterior do mesmo arquivo.
+    """
+    formato = detectar_formato(arquivo_origem)
+    idx_numero, idx_nome, idx_telefone, idx_data = _indices_das_colunas(formato.colunas)
+    encoding = formato.encoding_linhas
+    
+    with open(arquivo_origem, 'rb') as arquivo:
+        arquivo.readline()
+        posicao = max(inicio, arquivo.tell())
+        arquivo.seek(posicao)
+        
+        # O leitor CSV só pede a próxima linha física quando precisa dela, então
+        # a posição ao receber uma linha é o fim dela (mesmo com quebras entre aspas)
+        def linhas_do_arquivo():
+            nonlocal posicao
+            for linha in arquivo:
+                posicao += len(linha)
+                yield linha.decode(encoding, ERROS_DECODIFICACAO)
+        
+        for row in csv.reader(linhas_do_arquivo(), delimiter=formato.delimitador):
+            if len(row) > idx_numero and len(row) > idx_nome:
+                yield {
+                    'numero': row[idx_numero].strip(),
+                    'nome': row[idx_nome].strip(),
+                    'telefone': row[idx_telefone] if 0 <= idx_telefone < len(row) else "",
+                    'data_compra': row[idx_data].strip() if 0 <= idx_data < len(row) else ""
+                }, posicao
+
+def _termina_com_quebra_de_linha(caminho):
+    """Verifica se o arquivo está vazio ou termina com uma quebra de linha."""
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(0, os.SEEK_END)
+        if arquivo.tell() == 0:
+            return True
+        arquivo.seek(-1, os.SEEK_END)
+        return arquivo.read(1) == b'\n'
+
+def _acrescentar_ao_destino(arquivo_destino, headers, novas_linhas):
+    """Acrescenta as novas linhas (na ordem de CAMPOS) ao final do destino numa única troca.
     
-    # Ler dados do arquivo de origem
-    dados_origem = []
-    cabecalhos_validos = False
-    numeros_adicionados = []
-    numeros_ignorados = []
+    O destino é copiado como bytes para um arquivo temporário, as linhas são
+    acrescentadas à cópia e só então ela substitui o destino com os.replace,
+    então uma falha no meio deixa o destino como estava, nunca meio mesclado.
+    """
+    if not novas_linhas:
+        return
+    temporario = arquivo_destino + '.tmp'
+    precisa_quebra = not _termina_com_quebra_de_linha(arquivo_destino)
     
     try:
-        with open(arquivo_origem, 'r', encoding='utf-8') as arquivo:
-            reader = csv.reader(arquivo)
-            headers = next(reader, None)
+        shutil.copyfile(arquivo_destino, temporario)
+        with open(temporario, 'a', newline='', encoding='utf-8') as destino:
+            writer = csv.writer(destino)
+            if precisa_quebra:
+                destino.write('\r\n')
             
-            # Verificar se os cabeçalhos existem e contêm pelo menos 'numero' e 'nome'
-            cabecalhos_validos = headers and 'numero' in headers and 'nome' in headers
+            # Colocar os valores na ordem das colunas do destino, se ela for outra
+            if headers == CAMPOS:
+                writer.writerows(novas_linhas)
+            else:
+                indices = [CAMPOS.index(campo) if campo in CAMPOS else None for campo in headers]
+                writer.writerows([row[i] if i is not None else '' for i in indices]
+                                 for row in novas_linhas)
+            destino.flush()
+            os.fsync(destino.fileno())
+        contar('bytes_gravados', os.path.getsize(temporario))
+    except Exception:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    
+    os.replace(temporario, arquivo_destino)
+    sincronizar_diretorio(arquivo_destino)
+
+def _substituir_linhas(linhas, substituicoes):
+    """Troca a primeira linha de cada número de substituicoes (número -> linha nova)."""
+    pendentes = dict(substituicoes)
+    for row in linhas:
+        if pendentes and row:
+            nova = pendentes.pop(normalizar_numero(row[0]), None)
+            if nova is not None:
+                yield nova
+                continue
+        yield row
+
+def _reescrever_destino(arquivo_destino, headers, novas_linhas, substituicoes=None):
+    """Reescreve o destino inteiro (linhas existentes + novas) via arquivo temporário.
+    
+    substituicoes: número -> linha (na ordem de CAMPOS) que toma o lugar da
+    linha do número no destino
+    """
+    temporario = arquivo_destino + '.tmp'
+    
+    try:
+        with open(arquivo_destino, 'r', newline='', encoding='utf-8-sig') as origem, \
+                open(temporario, 'w', newline='', encoding='utf-8') as destino:
+            reader = csv.reader(origem)
+            next(reader, None)
+            writer = csv.writer(destino)
+            writer.writerow(CAMPOS)
             
-            if not cabecalhos_validos:
-                return False, "Formato de arquivo inválido. Cabeçalhos necessários: numero, nome", {}
+            # Escrever dados originais, reordenando as colunas se necessário
+            linhas = reader
+            if headers != CAMPOS:
+                indices = [headers.index(campo) if campo in headers else None for campo in CAMPOS]
+                linhas = ([row[i] if i is not None and i < len(row) else '' for i in indices]
+                          for row in reader)
+            if substituicoes:
+                linhas = _substituir_linhas(linhas, substituicoes)
+            writer.writerows(linhas)
             
-            # Mapear índices dos cabeçalhos
-            idx_numero = headers.index('numero')
-            idx_nome = headers.index('nome')
-            idx_telefone = headers.index('telefone') if 'telefone' in headers else -1
-            idx_data = headers.index('data_compra') if 'data_compra' in headers else -1
+            # Escrever novos dados
+            writer.writerows(novas_linhas)
+            destino.flush()
+            os.fsync(destino.fileno())
+        contar('bytes_gravados', os.path.getsize(temporario))
+    except Exception:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    
+    os.replace(temporario, arquivo_destino)
+    sincronizar_diretorio(arquivo_destino)
+
+def expandir_origens(arquivo_origem):
+    """Expande a origem (arquivo, diretório, padrão glob ou lista deles) em arquivos CSV.
+    
+    A ordem é determinística: a ordem informada, com diretórios e padrões
+    expandidos em ordem alfabética.
+    """
+    if not arquivo_origem:
+        return []
+    if isinstance(arquivo_origem, (list, tuple)):
+        return [arquivo for origem in arquivo_origem for arquivo in expandir_origens(origem)]
+    
+    if os.path.isdir(arquivo_origem):
+        return sorted(glob.glob(os.path.join(arquivo_origem, '*.csv')))
+    if glob.has_magic(arquivo_origem):
+        return sorted(glob.glob(arquivo_origem))
+    return [arquivo_origem] if os.path.exists(arquivo_origem) else []
+
+def analisar_origem(arquivo_origem, progresso=None, cancelar=None):
+    """Lê e valida um arquivo de origem (executado nos processos auxiliares).
+    
+    Returns:
+        tuple: (linhas como (número normalizado, número digitado, nome, telefone,
+        data da compra), erro)
+    """
+    linhas = []
+    try:
+        for row in _ler_origem(arquivo_origem):
+            linhas.append((normalizar_numero(row['numero']), row['numero'], row['nome'],
+                           row['telefone'], row['data_compra']))
             
-            # Processar dados
-            for row in reader:
-                if len(row) > idx_numero and len(row) > idx_nome:
-                    numero = row[idx_numero].strip()
-                    nome = row[idx_nome].strip()
-                    telefone = row[idx_telefone] if idx_telefone >= 0 and idx_telefone < len(row) else ""
-                    
-                    # Verificar se o número já existe
-                    if numero in numeros_existentes:
-                        numeros_ignorados.append(numero)
-                        continue
-                    
-                    # Adicionar nova entrada
-                    data_compra = datetime.now().strftime("%d/%m/%Y %H:%M")
-                    numeros_existentes.add(numero)
-                    numeros_adicionados.append(numero)
+            if len(linhas) % INTERVALO_PROGRESSO == 0:
+                _verificar_cancelamento(cancelar)
+                if progresso:
+                    progresso(len(linhas), 0)
+    except ImportacaoCancelada:
+        raise
+    except ValueError as e:
+        return [], str(e)
+    except Exception as e:
+        return [], f"Erro ao ler o arquivo: {str(e)}"
+    return linhas, None
+
+def partes_da_origem(arquivo_origem, inicio=0, cancelar=None):
+    """Lê a origem a partir do byte inicio, gerando uma parte de LINHAS_POR_PARTE linhas por vez.
+    
+    A parte seguinte só é lida quando a anterior já foi tratada, então só uma
+    parte fica na memória. Se a leitura falhar no meio (ex: um trecho com
+    outra codificação), a última parte traz as linhas lidas até ali e o erro.
+    
+    Yields:
+        tuple: (linhas como em analisar_origem, posição em bytes após a
+        última delas, erro ou None)
+    
+    Raises:
+        ImportacaoCancelada: se cancelar for ativado durante a leitura de uma parte
+    """
+    linhas = []
+    posicao = inicio
+    erro = None
+    try:
+        for row, posicao in _ler_origem_a_partir(arquivo_origem, inicio):
+            linhas.append((normalizar_numero(row['numero']), row['numero'], row['nome'],
+                           row['telefone'], row['data_compra']))
+            
+            if len(linhas) % INTERVALO_PROGRESSO == 0:
+                _verificar_cancelamento(cancelar)
+            if len(linhas) == LINHAS_POR_PARTE:
+                yield linhas, posicao, None
+                linhas = []
+    except ImportacaoCancelada:
+        raise
+    except ValueError as e:
+        erro = str(e)
+    except Exception as e:
+        erro = f"Erro ao ler o arquivo: {str(e)}"
+    
+    if linhas or erro:
+        yield linhas, posicao, erro
+
+def _tabela_de_linhas(linhas):
+    """Converte as linhas de analisar_origem numa tabela do motor pandas."""
+    tabela = pd.DataFrame(linhas, columns=COLUNAS_ANALISE, dtype=object)
+    # Manter os números como inteiros do Python (o pandas os converteria em float)
+    tabela['chave'] = pd.Series([linha[0] for linha in linhas], dtype=object)
+    return tabela
+
+def analisar_origem_pandas(arquivo_origem, progresso=None, cancelar=None):
+    """Lê e valida um arquivo de origem com o pandas, em blocos de LINHAS_POR_BLOCO.
+    
+    Cada bloco é tratado em colunas: os textos são aparados e os números
+    normalizados de uma vez. Arquivos que o leitor do pandas recusa (linhas
+    malformadas, por exemplo) são lidos por analisar_origem, e o motivo fica
+    em tabela.attrs['motivo_linha_a_linha']. Outros erros não são desviados
+    para o caminho lento: são falhas do próprio motor.
+    
+    Returns:
+        tuple: (tabela com as colunas de COLUNAS_ANALISE, erro); a chave é o
+        número normalizado, ou nulo se o número for inválido
+    """
+    tabelas = []
+    lidas = 0
+    try:
+        # Cabeçalho com os nomes de CAMPOS no lugar dos apelidos
+        formato = detectar_formato(arquivo_origem)
+        if not formato.colunas:
+            raise OrigemForaDoMotorPandas("arquivo sem cabeçalho")
+        if len(set(formato.colunas)) != len(formato.colunas):
+            raise OrigemForaDoMotorPandas("nomes de coluna repetidos no cabeçalho")
+        leitor = pd.read_csv(arquivo_origem, dtype=str, na_filter=False, sep=formato.delimitador,
+                             encoding=formato.encoding, encoding_errors=ERROS_DECODIFICACAO,
+                             header=0, names=formato.colunas,
+                             index_col=False, chunksize=LINHAS_POR_BLOCO,
+                             usecols=[coluna for coluna in formato.colunas
+                                      if coluna in COLUNAS_ANALISE])
+        with leitor:
+            for bloco in leitor:
+                _verificar_cancelamento(cancelar)
+                if 'numero' not in bloco or 'nome' not in bloco:
+                    raise OrigemForaDoMotorPandas("cabeçalhos numero e nome ausentes")
+                
+                # Mesma regra de normalizar_numero: só dígitos ASCII
+                numero = bloco['numero'].str.strip()
+                algarismos = numero.str.lstrip('0').where(numero.str.fullmatch('[0-9]+'))
+                if (algarismos.str.len() > DIGITOS_INT64).any():
+                    raise OrigemForaDoMotorPandas("número grande demais para uma coluna de inteiros")
+                chave = algarismos.mask(algarismos == '', '0').astype('Int64')
+                tabelas.append(pd.DataFrame({
+                    'chave': chave,
+                    'numero': numero,
+                    'nome': bloco['nome'].str.strip(),
+                    'telefone': bloco['telefone'] if 'telefone' in bloco else '',
+                    'data_compra': bloco['data_compra'].str.strip() if 'data_compra' in bloco else '',
+                }))
+                
+                lidas += len(bloco)
+                if progresso:
+                    progresso(lidas, 0)
+    except ImportacaoCancelada:
+        raise
+    except (OrigemForaDoMotorPandas, pd.errors.ParserError, pd.errors.EmptyDataError,
+            UnicodeDecodeError, ImportError, OSError) as e:
+        # O caminho linha a linha aceita o que o pandas recusa, ou dá a mesma
+        # mensagem de erro da importação sem o pandas
+        linhas, erro = analisar_origem(arquivo_origem, progresso, cancelar)
+        tabela = _tabela_de_linhas(linhas)
+        tabela.attrs['motivo_linha_a_linha'] = str(e) or type(e).__name__
+        return tabela, erro
+    
+    if not tabelas:
+        return _tabela_de_linhas([]), None
+    return pd.concat(tabelas, ignore_index=True), None
+
+def _analisar_origens(arquivos, analisar, processos=None, progresso=None, cancelar=None):
+    """Analisa os arquivos de origem com a função analisar, em paralelo quando há mais de um."""
+    if len(arquivos) == 1:
+        return [analisar(arquivos[0], progresso, cancelar)]
+    
+    processos = min(processos or os.cpu_count() or 1, len(arquivos))
+    analises = [None] * len(arquivos)
+    executor = ProcessPoolExecutor(max_workers=processos)
+    try:
+        futuros = {executor.submit(analisar, arquivo): i for i, arquivo in enumerate(arquivos)}
+        for concluidos, futuro in enumerate(as_completed(futuros), 1):
+            # Os resultados são guardados na posição do arquivo, mantendo a
+            # deduplicação determinística
+            analises[futuros[futuro]] = futuro.result()
+            _verificar_cancelamento(cancelar)
+            if progresso:
+                progresso(concluidos, len(arquivos))
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return analises
+
+@medido
+def merge_csv_files(arquivo_destino='rifas.csv', arquivo_origem=None, reescrever=False,
+                    processos=None, progresso=None, cancelar=None, motor=None, retomar=False,
+                    modo_conflito='manter_existente', arquivo_conflitos=None):
+    """
+    Mescla um ou mais arquivos CSV externos com o arquivo de rifas local.
+    Trata números repetidos conforme modo_conflito; por padrão mantém apenas
+    a primeira ocorrência.
+    
+    A leitura e validação dos arquivos de origem é feita em paralelo; depois
+    uma única etapa resolve os repetidos, na ordem dos arquivos e das linhas,
+    e o resultado é gravado no destino de uma só vez. Na mesma etapa são
+    apontados os conflitos: o mesmo número com compradores diferentes, com os
+    dois registros (ver conflitos.py).
+    
+    Por padrão as linhas novas são apenas acrescentadas ao final do destino,
+    que é percorrido só para saber quais números da origem já existem. O uso
+    de memória não depende do tamanho do destino. A gravação é sempre feita
+    numa cópia (destino + '.tmp') que substitui o destino com os.replace:
+    uma falha no meio deixa o destino como estava, nunca meio mesclado.
+    
+    Com o pandas instalado, origens grandes são lidas em blocos e a eliminação
+    dos repetidos é feita em colunas (motor 'pandas'); sem ele, linha a linha.
+    
+    Com retomar=True, cada origem é gravada em partes de LINHAS_POR_PARTE
+    linhas, cada uma trocada de uma vez no destino e seguida de um ponto de
+    controle (ver retomada.py): se a importação for interrompida, a próxima
+    com os mesmos arquivos continua da última parte gravada, e origens já
+    importadas por completo são puladas.
+    
+    Args:
+        arquivo_destino: Arquivo CSV destino (padrão: rifas.csv)
+        arquivo_origem: Arquivo CSV de origem, diretório, padrão glob ou lista deles
+        reescrever: Se True, reescreve o arquivo de destino por completo
+        processos: Número máximo de processos de leitura (padrão: núcleos da CPU)
+        progresso: Função chamada como progresso(feito, total); total 0 se desconhecido
+        cancelar: threading.Event que, quando ativado, cancela a importação antes
+            da gravação do destino
+        motor: Um de MOTORES; por padrão 'pandas' se estiver instalado e as
+            origens somarem pelo menos MINIMO_BYTES_PANDAS, senão 'csv'
+        retomar: Se True, importa em partes com pontos de controle; as origens
+            são lidas uma a uma, linha a linha, e o cancelamento mantém as
+            partes já gravadas (não combina com reescrever nem com outros
+            modos de conflito além de 'manter_existente')
+        modo_conflito: Um de conflitos.MODOS: 'manter_existente' (padrão),
+            'mais_recente' (fica a compra de data mais recente, com a data da
+            origem; pode reescrever o destino) ou 'separar' (números disputados
+            só entre as origens não são importados)
+        arquivo_conflitos: CSV onde gravar o relatório de conflitos; no modo
+            'separar', por padrão <destino>_conflitos.csv
+    
+    Returns:
+        tuple: (sucesso, mensagem, estatísticas)
+    """
+    arquivos = expandir_origens(arquivo_origem)
+    if not arquivos:
+        return False, "Arquivo de origem não encontrado.", {}
+    
+    if motor is None:
+        # Em arquivos pequenos, o custo fixo do pandas supera o ganho
+        grandes = sum(os.path.getsize(arquivo) for arquivo in arquivos) >= MINIMO_BYTES_PANDAS
+        motor = 'pandas' if pd is not None and grandes else 'csv'
+    if motor not in MOTORES:
+        return False, f"Motor de importação desconhecido: {motor}", {}
+    if motor == 'pandas' and pd is None:
+        return False, "O motor pandas precisa do pandas instalado (pip install pandas).", {}
+    if modo_conflito not in MODOS_CONFLITO:
+        return False, f"Modo de conflito desconhecido: {modo_conflito}", {}
+    if retomar and reescrever:
+        return False, "A importação retomável só acrescenta ao destino; não use com reescrever.", {}
+    if retomar and modo_conflito != 'manter_existente':
+        return False, "A importação retomável só aceita o modo de conflito 'manter_existente'.", {}
+    if modo_conflito == 'separar' and not arquivo_conflitos:
+        arquivo_conflitos = os.path.splitext(arquivo_destino)[0] + '_conflitos.csv'
+    
+    # Verificar se o arquivo de destino existe
+    with trava_do_arquivo(arquivo_destino):
+        if not os.path.exists(arquivo_destino):
+            with open(arquivo_destino, 'w', newline='', encoding='utf-8') as arquivo:
+                writer = csv.writer(arquivo)
+                writer.writerow(CAMPOS)
+    
+    if retomar:
+        return _importar_retomando(arquivo_destino, arquivos, progresso, cancelar, arquivo_conflitos)
+    
+    try:
+        analisar = analisar_origem_pandas if motor == 'pandas' else analisar_origem
+        analises = _analisar_origens(arquivos, analisar, processos, progresso, cancelar)
+    except ImportacaoCancelada:
+        return False, "Importação cancelada pelo usuário.", {}
+    
+    contar('linhas_lidas', sum(len(linhas) for linhas, erro in analises))
+    contar('bytes_lidos', sum(os.path.getsize(arquivo) for arquivo, (linhas, erro)
+                              in zip(arquivos, analises) if not erro))
+    
+    if all(erro for linhas, erro in analises):
+        return False, analises[0][1] if len(arquivos) == 1 else "Nenhum arquivo pôde ser lido.", {}
+    
+    # Da leitura do destino até a gravação, nenhum outro processo pode gravar nele
+    with trava_do_arquivo(arquivo_destino):
+        return _mesclar_no_destino(arquivo_destino, arquivos, analises, reescrever, cancelar,
+                                   modo_conflito, arquivo_conflitos)
+
+def _candidatos(analises):
+    """Números válidos das origens analisadas (listas ou tabelas do motor pandas)."""
+    candidatos = set()
+    for linhas, erro in analises:
+        if pd is not None and isinstance(linhas, pd.DataFrame):
+            candidatos.update(linhas['chave'].dropna().drop_duplicates().tolist())
+        else:
+            candidatos.update(linha[0] for linha in linhas)
+    candidatos.discard(None)
+    return candidatos
+
+def _resolver_repetidos(grupos, modo_conflito):
+    """Resolve cada grupo (número -> registros na ordem das linhas) com conflitos.resolver.
+    
+    Returns:
+        tuple: (número -> posição do registro escolhido, ou None se nenhum foi;
+        conflitos como (número, escolhido, referência, outro registro))
+    """
+    escolhidas = {}
+    lista_conflitos = []
+    for numero, grupo in grupos.items():
+        escolhido, referencia, outros = resolver(grupo, modo_conflito)
+        escolhidas[numero] = None if escolhido is None else escolhido[1]
+        lista_conflitos.extend((numero, escolhido, referencia, outro) for outro in outros)
+    
+    # Mesma ordem nos dois motores: a da linha do registro em disputa
+    lista_conflitos.sort(key=lambda conflito: (conflito[3][1], conflito[0]))
+    return escolhidas, lista_conflitos
+
+def _classificar_linhas(existentes, analises, data_compra, modo_conflito):
+    """Decide, linha a linha, quais registros das origens vão para o destino.
+    
+    Cada número fica com um só registro, escolhido entre o do destino e os das
+    origens conforme o modo (ver conflitos.py). Só os números repetidos passam
+    pela resolução; os demais são apenas acrescentados.
+    
+    Args:
+        existentes: número -> registro do destino, para os números das origens
+            que já estão nele (ver numeros_existentes_no_destino)
+        data_compra: data das linhas gravadas; no modo 'mais_recente', só das
+            que não trazem uma data válida
+    
+    Returns:
+        tuple: (linhas novas na ordem de CAMPOS, número -> linha que substitui
+        a do destino, [listas de números de cada classificação (ver
+        CLASSIFICACOES) de cada origem], conflitos); os números como foram digitados
+    """
+    inicios = []
+    total = 0
+    for linhas, erro in analises:
+        inicios.append(total)
+        total += len(linhas)
+    
+    def registro(numero, posicao):
+        if posicao == DESTINO:
+            return existentes[numero]
+        origem = bisect_right(inicios, posicao) - 1
+        return (origem, posicao) + analises[origem][0][posicao - inicios[origem]][1:]
+    
+    # Posição da primeira linha de cada número e, dos repetidos, de todas
+    primeiras = dict.fromkeys(existentes, DESTINO)
+    repetidos = {}
+    posicao = 0
+    for linhas, erro in analises:
+        for linha in linhas:
+            numero = linha[0]
+            if numero is not None:
+                primeira = primeiras.setdefault(numero, posicao)
+                if primeira != posicao:
+                    posicoes = repetidos.get(numero)
+                    if posicoes is None:
+                        repetidos[numero] = [primeira, posicao]
+                    else:
+                        posicoes.append(posicao)
+            posicao += 1
+    
+    escolhidas, lista_conflitos = _resolver_repetidos(
+        {numero: [registro(numero, p) for p in posicoes] for numero, posicoes in repetidos.items()},
+        modo_conflito)
+    del repetidos
+    
+    # Daqui em diante, primeiras guarda a posição do registro que fica com o número
+    primeiras.update(escolhidas)
+    desviadas = _posicoes_desviadas(lista_conflitos, modo_conflito)
+    manter_datas = modo_conflito == 'mais_recente'
+    novas_linhas = []
+    substituicoes = {}
+    por_origem = []
+    posicao = 0
+    for linhas, erro in analises:
+        adicionados, substituidos, preteridos, separados, ignorados, invalidos = classificados = (
+            [], [], [], [], [], [])
+        desviados = preteridos if manter_datas else separados
+        
+        for numero, numero_digitado, nome, telefone, data in linhas:
+            if numero is None:
+                invalidos.append(numero_digitado)
+            elif primeiras[numero] != posicao:
+                # Outro registro (do destino ou de uma linha anterior) ficou com o
+                # número, ou nenhum ficou ('separar')
+                if primeiras[numero] is None or posicao in desviadas:
+                    desviados.append(numero_digitado)
+                else:
+                    ignorados.append(numero_digitado)
+            else:
+                if not (manter_datas and data and interpretar_data(data)):
+                    data = data_compra
+                linha = (str(numero), nome, telefone, data)
+                if numero in existentes:
+                    substituicoes[numero] = linha
+                    substituidos.append(numero_digitado)
+                else:
+                    novas_linhas.append(linha)
+                    adicionados.append(numero_digitado)
+            posicao += 1
+        
+        por_origem.append(classificados)
+    return novas_linhas, substituicoes, por_origem, lista_conflitos
+
+def _posicoes_desviadas(lista_conflitos, modo_conflito):
+    """Posições das linhas que perderam o número num conflito e não contam como ignoradas.
+    
+    Em 'manter_existente' os conflitos perdidos são ignorados como números já
+    existentes; nos demais modos eles são preteridos ou separados.
+    """
+    if modo_conflito == 'manter_existente':
+        return set()
+    return {outro[1] for numero, escolhido, referencia, outro in lista_conflitos}
+
+def _classificar_colunas(existentes, analises, data_compra, modo_conflito):
+    """Como _classificar_linhas, com as tabelas do motor pandas e operações em colunas.
+    
+    Só as linhas dos números repetidos (ou já existentes no destino) passam,
+    uma a uma, pela resolução de conflitos.
+    """
+    todas = pd.concat([tabela.assign(origem=i) for i, (tabela, erro) in enumerate(analises)],
+                      ignore_index=True)
+    chave = todas['chave']
+    invalido = chave.isna()
+    no_destino = ~invalido & chave.isin(list(existentes))
+    repetido = no_destino | (~invalido & chave.duplicated(keep=False))
+    
+    # Registros de cada número repetido: o do destino e os das origens, na
+    # ordem das linhas (o índice da tabela é a posição da linha)
+    grupos = {}
+    repetidas = todas[repetido]
+    registros = zip(repetidas['origem'].tolist(), repetidas.index.tolist(),
+                    *(repetidas[coluna].tolist() for coluna in COLUNAS_ANALISE[1:]))
+    for numero, registro in zip(repetidas['chave'].tolist(), registros):
+        grupo = grupos.get(numero)
+        if grupo is None:
+            grupo = grupos[numero] = [existentes[numero]] if numero in existentes else []
+        grupo.append(registro)
+    escolhidas, lista_conflitos = _resolver_repetidos(grupos, modo_conflito)
+    del grupos, repetidas
+    
+    escolhido = ~invalido & ~repetido
+    escolhido.iloc[[posicao for posicao in escolhidas.values()
+                    if posicao is not None and posicao != DESTINO]] = True
+    substituido = escolhido & no_destino
+    adicionado = escolhido & ~no_destino
+    sem_dono = [numero for numero, posicao in escolhidas.items() if posicao is None]
+    desviado = ~invalido & ~escolhido & (
+        chave.isin(sem_dono) | todas.index.isin(list(_posicoes_desviadas(lista_conflitos, modo_conflito))))
+    nenhum = pd.Series(False, index=todas.index)
+    preterido, separado = (desviado, nenhum) if modo_conflito == 'mais_recente' else (nenhum, desviado)
+    ignorado = ~invalido & ~escolhido & ~desviado
+    
+    def linhas_gravadas(mascara):
+        linhas = todas[mascara]
+        if modo_conflito == 'mais_recente':
+            datas = linhas['data_compra']
+            valida = datas.map(lambda texto: bool(texto) and interpretar_data(texto) is not None)
+            datas = datas.where(valida.astype(bool), data_compra).tolist()
+        else:
+            datas = repeat(data_compra)
+        return zip(linhas['chave'].tolist(), linhas['nome'].tolist(),
+                   linhas['telefone'].tolist(), datas)
+    
+    novas_linhas = list(linhas_gravadas(adicionado))
+    substituicoes = {linha[0]: linha for linha in linhas_gravadas(substituido)}
+    
+    por_origem = []
+    origem = todas['origem']
+    for i in range(len(analises)):
+        da_origem = origem == i
+        por_origem.append(tuple(todas.loc[da_origem & mascara, 'numero'].tolist()
+                                for mascara in (adicionado, substituido, preterido, separado,
+                                                ignorado, invalido)))
+    return novas_linhas, substituicoes, por_origem, lista_conflitos
+
+def _relatorio_de_conflitos(lista_conflitos, nome_da_origem):
+    """Linhas do relatório (ver conflitos.descrever) dos conflitos classificados."""
+    return [descrever(numero, escolhido, referencia, outro, nome_da_origem)
+            for numero, escolhido, referencia, outro in lista_conflitos]
+
+def _mesclar_no_destino(arquivo_destino, arquivos, analises, reescrever, cancelar,
+                        modo_conflito, arquivo_conflitos):
+    """Resolve os números repetidos das origens analisadas e grava o destino."""
+    # Cadastros ainda só no diário precisam estar no destino antes da comparação
+    compactar_diario(arquivo_destino)
+    headers_destino = _ler_cabecalho(arquivo_destino)
+    
+    # Buscar no destino apenas os registros dos números que aparecem nas origens
+    existentes = numeros_existentes_no_destino(arquivo_destino, _candidatos(analises), registros=True)
+    
+    # As datas de compra das origens só são importadas no modo 'mais_recente';
+    # nos demais vale a data da importação
+    data_compra = datetime.now().strftime("%d/%m/%Y %H:%M")
+    if pd is not None and any(isinstance(linhas, pd.DataFrame) for linhas, erro in analises):
+        classificar = _classificar_colunas
+    else:
+        classificar = _classificar_linhas
+    novas_linhas, substituicoes, por_origem, lista_conflitos = classificar(
+        existentes, analises, data_compra, modo_conflito)
+    del existentes
+    
+    if cancelar is not None and cancelar.is_set():
+        return False, "Importação cancelada pelo usuário.", {}
+    
+    por_arquivo = {}
+    for arquivo, (linhas, erro), classificados in zip(arquivos, analises, por_origem):
+        por_arquivo[arquivo] = estatisticas_arquivo = {'erro': erro}
+        for chave, numeros in zip(CLASSIFICACOES, classificados):
+            estatisticas_arquivo['numeros_' + chave] = numeros
+    
+    relatorio = _relatorio_de_conflitos(
+        lista_conflitos, lambda origem: arquivo_destino if origem == DESTINO else arquivos[origem])
+    del lista_conflitos
+    
+    # O relatório é gravado antes do destino: se falhar, nada foi importado
+    if arquivo_conflitos and relatorio:
+        try:
+            gravar_relatorio(arquivo_conflitos, relatorio)
+        except Exception as e:
+            return False, f"Erro ao gravar o relatório de conflitos: {str(e)}", {}
+    
+    # Substituir linhas do destino exige reescrevê-lo: na leitura, a primeira
+    # linha de cada número é a que vale
+    reescrever = reescrever or bool(substituicoes)
+    try:
+        if reescrever:
+            _reescrever_destino(arquivo_destino, headers_destino, novas_linhas, substituicoes)
+        else:
+            _acrescentar_ao_destino(arquivo_destino, headers_destino, novas_linhas)
+    except Exception as e:
+        return False, f"Erro ao gravar o arquivo de destino: {str(e)}", {}
+    
+    estatisticas = _estatisticas(por_arquivo, relatorio, arquivo_conflitos)
+    mensagem = "Importação concluída. " + _resumo(estatisticas)
+    arquivos_com_erro = [arquivo for arquivo, (linhas, erro) in zip(arquivos, analises) if erro]
+    if arquivos_com_erro:
+        mensagem += f" {len(arquivos_com_erro)} de {len(arquivos)} arquivos não puderam ser lidos."
+    
+    # Arquivos que o motor pandas recusou e que foram lidos linha a linha
+    for arquivo, (linhas, erro) in zip(arquivos, analises):
+        estatisticas['arquivos'][arquivo]['motivo_linha_a_linha'] = (
+            linhas.attrs.get('motivo_linha_a_linha') if pd is not None
+            and isinstance(linhas, pd.DataFrame) else None)
+    linha_a_linha = [arquivo for arquivo, estatisticas_arquivo in estatisticas['arquivos'].items()
+                     if estatisticas_arquivo['motivo_linha_a_linha']]
+    if linha_a_linha:
+        contar('origens_recusadas_pandas', len(linha_a_linha))
+        motivo = estatisticas['arquivos'][linha_a_linha[0]]['motivo_linha_a_linha']
+        mensagem += (f" {len(linha_a_linha)} de {len(arquivos)} arquivos foram lidos linha a linha "
+                     f"porque o pandas os recusou ({os.path.basename(linha_a_linha[0])}: {motivo}).")
+    
+    return True, mensagem, estatisticas
+
+def _estatisticas(por_arquivo, relatorio, arquivo_conflitos):
+    """Completa as estatísticas de cada arquivo (com as listas 'numeros_<classificação>') e as soma."""
+    for estatisticas_arquivo in por_arquivo.values():
+        for chave in CLASSIFICACOES:
+            estatisticas_arquivo['total_' + chave] = len(estatisticas_arquivo['numeros_' + chave])
+    
+    estatisticas = {'arquivos': por_arquivo}
+    for chave in CLASSIFICACOES:
+        numeros = [numero for estatisticas_arquivo in por_arquivo.values()
+                   for numero in estatisticas_arquivo['numeros_' + chave]]
+        estatisticas['total_' + chave] = len(numeros)
+        estatisticas['numeros_' + chave] = numeros
+    estatisticas['total_conflitos'] = len(relatorio)
+    estatisticas['conflitos'] = relatorio
+    estatisticas['arquivo_conflitos'] = arquivo_conflitos if relatorio else None
+    return estatisticas
+
+def _resumo(estatisticas):
+    """Quantidades de cada classificação e dos conflitos, para a mensagem da importação."""
+    mensagem = f"{estatisticas['total_adicionados']} números adicionados."
+    if estatisticas['total_substituidos']:
+        mensagem += f" {estatisticas['total_substituidos']} números passaram para a compra mais recente."
+    if estatisticas['total_preteridos']:
+        mensagem += (f" {estatisticas['total_preteridos']} registros em conflito ficaram de fora "
+                     "por uma compra mais recente do mesmo número.")
+    if estatisticas['total_separados']:
+        mensagem += (f" {estatisticas['total_separados']} registros em conflito foram separados "
+                     "em vez de importados.")
+    if estatisticas['total_ignorados']:
+        mensagem += f" {estatisticas['total_ignorados']} números ignorados por já existirem."
+    if estatisticas['total_invalidos']:
+        mensagem += f" {estatisticas['total_invalidos']} números inválidos ignorados."
+    if estatisticas['total_conflitos']:
+        mensagem += f" {estatisticas['total_conflitos']} conflitos (mesmo número, outro comprador)"
+        if estatisticas['arquivo_conflitos']:
+            mensagem += f"; veja {os.path.basename(estatisticas['arquivo_conflitos'])}"
+        mensagem += "."
+    return mensagem
+
+def _importar_retomando(arquivo_destino, arquivos, progresso, cancelar, arquivo_conflitos):
+    """merge_csv_files com retomar=True: grava cada origem em partes, com pontos de controle."""
+    pontos = PontosDeControle(arquivo_destino)
+    data_compra = datetime.now().strftime("%d/%m/%Y %H:%M")
+    por_arquivo = {}
+    relatorio = []
+    interrompida = False
+    
+    for arquivo in arquivos:
+        assinatura = assinatura_do_arquivo(arquivo)
+        ponto = pontos.obter(arquivo, assinatura) or {'posicao': 0, 'linhas': 0, 'concluida': False}
+        numeros_por_classificacao = tuple([] for chave in CLASSIFICACOES)
+        por_arquivo[arquivo] = estatisticas_arquivo = {
+            'erro': None,
+            'ja_importado': ponto['concluida'],
+            'linhas_retomadas': ponto['linhas']
+        }
+        for chave, numeros in zip(CLASSIFICACOES, numeros_por_classificacao):
+            estatisticas_arquivo['numeros_' + chave] = numeros
+        # Origem sem mudanças desde a última importação completa
+        if ponto['concluida']:
+            continue
+        
+        # Nos conflitos, origem 0 é esta origem; as linhas de partes anteriores
+        # já estão no destino
+        def nome_da_origem(origem):
+            return arquivo_destino if origem == DESTINO else arquivo
+        
+        tamanho = os.path.getsize(arquivo)
+        posicao_gravada = ponto['posicao']
+        linhas_gravadas = ponto['linhas']
+        erro = None
+        try:
+            for linhas, posicao, erro in partes_da_origem(arquivo, ponto['posicao'], cancelar):
+                contar('linhas_lidas', len(linhas))
+                if not linhas:
+                    continue
+                
+                # Da leitura do destino até a gravação da parte, nenhum outro
+                # processo pode gravar nele; entre as partes, a trava é liberada
+                with trava_do_arquivo(arquivo_destino):
+                    compactar_diario(arquivo_destino)
+                    headers_destino = _ler_cabecalho(arquivo_destino)
+                    analise = [(linhas, None)]
+                    existentes = numeros_existentes_no_destino(arquivo_destino, _candidatos(analise),
+                                                               registros=True)
+                    novas_linhas, substituicoes, (classificados,), lista_conflitos = _classificar_linhas(
+                        existentes, analise, data_compra, 'manter_existente')
+                    try:
+                        _acrescentar_ao_destino(arquivo_destino, headers_destino, novas_linhas)
+                    except Exception as e:
+                        return False, f"Erro ao gravar o arquivo de destino: {str(e)}", {}
                     
-                    dados_origem.append({
-                        'numero': numero,
-                        'nome': nome,
-                        'telefone': telefone,
-                        'data_compra': data_compra
-                    })
+                    # O ponto de controle só avança com a parte já gravada; se o
+                    # programa parar entre as duas gravações, a parte é lida de
+                    # novo e seus números são ignorados como repetidos
+                    linhas_gravadas += len(linhas)
+                    posicao_gravada = posicao
+                    pontos.registrar(arquivo, assinatura, posicao_gravada, linhas_gravadas)
+                
+                for numeros, classificacao in zip(numeros_por_classificacao, classificados):
+                    numeros.extend(classificacao)
+                relatorio.extend(_relatorio_de_conflitos(lista_conflitos, nome_da_origem))
+                if progresso:
+                    progresso(posicao, tamanho)
+                _verificar_cancelamento(cancelar)
+        except ImportacaoCancelada:
+            interrompida = True
+            break
+        estatisticas_arquivo['erro'] = erro
+        contar('bytes_lidos', tamanho - ponto['posicao'])
+        if erro is None:
+            pontos.registrar(arquivo, assinatura, posicao_gravada, linhas_gravadas, concluida=True)
+    
+    estatisticas = _estatisticas(por_arquivo, relatorio, arquivo_conflitos)
+    
+    # Aqui o destino já foi gravado, então uma falha no relatório só é avisada
+    aviso_relatorio = ""
+    if arquivo_conflitos and relatorio:
+        try:
+            gravar_relatorio(arquivo_conflitos, relatorio)
+        except Exception as e:
+            estatisticas['arquivo_conflitos'] = None
+            aviso_relatorio = f" Erro ao gravar o relatório de conflitos: {str(e)}"
+    
+    if interrompida:
+        return False, (f"Importação interrompida com {estatisticas['total_adicionados']} números "
+                       "adicionados. Importe os mesmos arquivos de novo para continuar de onde "
+                       "parou." + aviso_relatorio), estatisticas
+    
+    arquivos_com_erro = [arquivo for arquivo, estatisticas_arquivo in por_arquivo.items()
+                         if estatisticas_arquivo['erro']]
+    if len(arquivos_com_erro) == len(arquivos) and not estatisticas['total_adicionados']:
+        erro = por_arquivo[arquivos[0]]['erro']
+        return False, erro if len(arquivos) == 1 else "Nenhum arquivo pôde ser lido.", {}
+    
+    mensagem = "Importação concluída. " + _resumo(estatisticas)
+    ja_importados = sum(1 for estatisticas_arquivo in por_arquivo.values()
+                        if estatisticas_arquivo['ja_importado'])
+    if ja_importados:
+        mensagem += f" {ja_importados} de {len(arquivos)} arquivos já tinham sido importados."
+    retomadas = sum(estatisticas_arquivo['linhas_retomadas'] for estatisticas_arquivo in por_arquivo.values()
+                    if not estatisticas_arquivo['ja_importado'])
+    if retomadas:
+        mensagem += f" Retomada após {retomadas} linhas gravadas antes."
+    if arquivos_com_erro:
+        mensagem += f" {len(arquivos_com_erro)} de {len(arquivos)} arquivos não puderam ser lidos por completo."
+    
+    return True, mensagem + aviso_relatorio, estatisticas
+
+def _lotes_para_enviar(arquivo_origem, data_compra, estatisticas_arquivo):
+    """Gera as linhas válidas da origem em lotes de LINHAS_POR_ENVIO para armazenamento.inserir.
+    
+    Cada lote é (linhas como (número, nome, telefone, data), números como
+    foram digitados, posição em bytes após a última linha). Os números
+    inválidos vão para estatisticas_arquivo['numeros_invalidos']; um erro de
+    leitura vai para estatisticas_arquivo['erro'] e encerra a origem, depois
+    de gerado o lote com as linhas lidas até ali.
+    """
+    linhas = []
+    digitados = []
+    posicao = 0
+    try:
+        for row, posicao in _ler_origem_a_partir(arquivo_origem):
+            chave = normalizar_numero(row['numero'])
+            if chave is None:
+                estatisticas_arquivo['numeros_invalidos'].append(row['numero'])
+                continue
+            linhas.append((chave, row['nome'], row['telefone'], data_compra))
+            digitados.append(row['numero'])
+            
+            if len(linhas) == LINHAS_POR_ENVIO:
+                yield linhas, digitados, posicao
+                linhas = []
+                digitados = []
+    except ValueError as e:
+        estatisticas_arquivo['erro'] = str(e)
     except Exception as e:
-        return False, f"Erro ao ler o arquivo: {str(e)}", {}
+        estatisticas_arquivo['erro'] = f"Erro ao ler o arquivo: {str(e)}"
+    
+    if linhas:
+        yield linhas, digitados, posicao
+
+@medido
+def importar_no_armazenamento(armazenamento, arquivo_origem, progresso=None, cancelar=None):
+    """Importa arquivos CSV externos pelo inserir de um armazenamento (ver armazenamento.py).
+    
+    É o caminho do banco SQLite e do servidor de rifas, em que o destino não
+    é um CSV local: cada origem é lida linha a linha e enviada em lotes de
+    LINHAS_POR_ENVIO linhas, e o armazenamento grava só os números livres (o
+    servidor, com a trava e o diário dele). Vale sempre o registro que já
+    existia, como no modo 'manter_existente' de merge_csv_files, e o
+    cancelamento mantém os lotes já enviados.
+    
+    Args:
+        armazenamento: ArmazenamentoSQLite, ArmazenamentoRemoto ou outro com inserir
+        arquivo_origem: Arquivo CSV de origem, diretório, padrão glob ou lista deles
+        progresso: Função chamada como progresso(feito, total) a cada lote
+        cancelar: threading.Event que, quando ativado, interrompe a importação
+    
+    Returns:
+        tuple: (sucesso, mensagem, estatísticas), como merge_csv_files
+    """
+    arquivos = expandir_origens(arquivo_origem)
+    if not arquivos:
+        return False, "Arquivo de origem não encontrado.", {}
+    
+    data_compra = datetime.now().strftime("%d/%m/%Y %H:%M")
+    por_arquivo = {}
+    interrompida = False
+    erro_gravacao = None
     
-    # Escrever dados mesclados de volta ao arquivo de destino
-    with open(arquivo_destino, 'w', newline='', encoding='utf-8') as arquivo:
-        writer = csv.DictWriter(arquivo, fieldnames=['numero', 'nome', 'telefone', 'data_compra'])
-        writer.writeheader()
+    for arquivo in arquivos:
+        adicionados, ignorados, invalidos = [], [], []
+        por_arquivo[arquivo] = estatisticas_arquivo = {
+            'erro': None,
+            'numeros_adicionados': adicionados,
+            'numeros_substituidos': [],
+            'numeros_preteridos': [],
+            'numeros_separados': [],
+            'numeros_ignorados': ignorados,
+            'numeros_invalidos': invalidos
+        }
+        tamanho = os.path.getsize(arquivo)
         
-        # Escrever dados originais
-        for row in dados_destino:
-            writer.writerow(row)
+        for linhas, digitados, posicao in _lotes_para_enviar(arquivo, data_compra, estatisticas_arquivo):
+            if cancelar is not None and cancelar.is_set():
+                interrompida = True
+                break
+            try:
+                gravadas = armazenamento.inserir(linhas)
+            except Exception as e:
+                erro_gravacao = str(e)
+                break
+            for numero_digitado, gravada in zip(digitados, gravadas):
+                (adicionados if gravada else ignorados).append(numero_digitado)
+            if progresso:
+                progresso(posicao, tamanho)
         
-        # Escrever novos dados
-        for row in dados_origem:
-            writer.writerow(row)
+        if interrompida or erro_gravacao:
+            break
+        contar('bytes_lidos', tamanho)
     
-    # Preparar estatísticas
-    estatisticas = {
-        'total_adicionados': len(numeros_adicionados),
-        'total_ignorados': len(numeros_ignorados),
-        'numeros_adicionados': numeros_adicionados,
-        'numeros_ignorados': numeros_ignorados
-    }
+    estatisticas = _estatisticas(por_arquivo, [], None)
+    contar('linhas_lidas', sum(estatisticas['total_' + chave]
+                               for chave in ('adicionados', 'ignorados', 'invalidos')))
     
-    mensagem = f"Importação concluída. {len(numeros_adicionados)} números adicionados."
-    if numeros_ignorados:
-        mensagem += f" {len(numeros_ignorados)} números ignorados por já existirem."
+    if erro_gravacao:
+        return False, (f"Erro ao gravar: {erro_gravacao}. {estatisticas['total_adicionados']} "
+                       "números foram adicionados antes do erro."), estatisticas
+    if interrompida:
+        return False, (f"Importação cancelada com {estatisticas['total_adicionados']} números "
+                       "já adicionados."), estatisticas
     
+    arquivos_com_erro = [arquivo for arquivo, estatisticas_arquivo in por_arquivo.items()
+                         if estatisticas_arquivo['erro']]
+    if len(arquivos_com_erro) == len(arquivos) and not estatisticas['total_adicionados']:
+        erro = por_arquivo[arquivos[0]]['erro']
+        return False, erro if len(arquivos) == 1 else "Nenhum arquivo pôde ser lido.", {}
+    
+    mensagem = "Importação concluída. " + _resumo(estatisticas)
+    if arquivos_com_erro:
+        mensagem += f" {len(arquivos_com_erro)} de {len(arquivos)} arquivos não puderam ser lidos por completo."
     return True, mensagem, estatisticas
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        arquivo_origem = sys.argv[1]
-        sucesso, mensagem, stats = merge_csv_files(arquivo_origem=arquivo_origem)
+    opcoes = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+    argumentos = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    modo_conflito = next((opcao.split('=', 1)[1] for opcao in opcoes
+                          if opcao.startswith('--conflitos=')), 'manter_existente')
+    if argumentos:
+        sucesso, mensagem, stats = merge_csv_files(arquivo_origem=argumentos,
+                                                   reescrever='--reescrever' in opcoes,
+                                                   retomar='--retomar' in opcoes,
+                                                   modo_conflito=modo_conflito)
         print(mensagem)
         
+        if sucesso and len(stats['arquivos']) > 1:
+            print("\nPor arquivo:")
+            for arquivo, stats_arquivo in stats['arquivos'].items():
+                if stats_arquivo['erro']:
+                    print(f" - {arquivo}: {stats_arquivo['erro']}")
+                else:
+                    print(f" - {arquivo}: {stats_arquivo['total_adicionados']} adicionados, "
+                          f"{stats_arquivo['total_substituidos']} substituídos, "
+                          f"{stats_arquivo['total_preteridos'] + stats_arquivo['total_separados']} "
+                          f"em conflito, {stats_arquivo['total_ignorados']} ignorados")
+        
         if sucesso and stats['total_adicionados'] > 0:
             print("\nNúmeros adicionados:")
             for num in stats['numeros_adicionados']:
                 print(f" - {num}")
         
-        if stats['total_ignorados'] > 0:
+        if sucesso and stats['total_substituidos'] > 0:
+            print("\nNúmeros passados para a compra mais recente:")
+            for num in stats['numeros_substituidos']:
+                print(f" - {num}")
+        
+        if sucesso and stats['total_preteridos'] > 0:
+            print("\nNúmeros que ficaram de fora por uma compra mais recente:")
+            for num in stats['numeros_preteridos']:
+                print(f" - {num}")
+        
+        if sucesso and stats['total_separados'] > 0:
+            print("\nNúmeros separados no relatório de conflitos:")
+            for num in stats['numeros_separados']:
+                print(f" - {num}")
+        
+        if sucesso and stats['total_ignorados'] > 0:
             print("\nNúmeros ignorados (já existentes):")
             for num in stats['numeros_ignorados']:
                 print(f" - {num}")
+        
+        if sucesso and stats['total_conflitos'] > 0:
+            print("\nConflitos (mesmo número, outro comprador):")
+            for conflito in stats['conflitos']:
+                print(f" - {conflito['numero']}: {conflito['nome_a']} ({conflito['origem_a']}) x "
+                      f"{conflito['nome_b']} ({conflito['origem_b']})")
     else:
-        print("Uso: python csv_merger.py arquivo_origem.csv")
+        print("Uso: python csv_merger.py origem.csv [outra.csv | diretório | 'padrão*.csv' ...] "
+              "[--reescrever] [--retomar] [--conflitos=manter_existente|mais_recente|separar]")
@@ -0,0 +1,198 @@
+import csv
+import json
+import os
+import shutil
+import threading
+import zlib
+from metricas import contar
+from trava import trava_do_arquivo
+
+# Extensão do diário, gravado ao lado do arquivo CSV (ex: rifas.csv.diario)
+EXTENSAO_DIARIO = '.diario'
+
+# Tamanho do diário (bytes) a partir do qual ele é incorporado ao CSV
+LIMITE_DIARIO = 4 * 1024 * 1024
+
+def caminho_diario(arquivo_csv):
+    return arquivo_csv + EXTENSAO_DIARIO
+
+def codificar_registro(registro):
+    """Codifica um registro (dicionário campo -> texto) para o diário.
+    
+    Cada registro ocupa uma linha: o CRC32 do conteúdo em hexadecimal, um
+    espaço e o registro em JSON.
+    """
+    conteudo = json.dumps(registro, ensure_ascii=False).encode('utf-8')
+    return b'%08x %s\n' % (zlib.crc32(conteudo), conteudo)
+
+def ler_registros(dados):
+    """Decodifica os registros do diário, ignorando os corrompidos.
+    
+    Returns:
+        tuple: (registros válidos, bytes lidos até o fim da última linha completa)
+    """
+    registros = []
+    posicao = 0
+    while True:
+        fim = dados.find(b'\n', posicao)
+        if fim == -1:
+            # Registro incompleto: a gravação foi interrompida no meio
+            break
+        
+        linha = dados[posicao:fim]
+        posicao = fim + 1
+        try:
+            crc, conteudo = linha.split(b' ', 1)
+            if int(crc, 16) == zlib.crc32(conteudo):
+                registros.append(json.loads(conteudo.decode('utf-8')))
+        except ValueError:
+            continue
+    return registros, posicao
+
+class Diario:
+    """Diário de gravação (write-ahead log) dos cadastros.
+    
+    Os cadastros são acrescentados ao diário em vez de ao CSV; de tempos em
+    tempos o diário é incorporado ao CSV por compactar_diario. Gravações
+    feitas ao mesmo tempo por várias threads são agrupadas num único fsync
+    (group commit).
+    """
+    
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._trava_fila = threading.Lock()
+        self._trava_gravacao = threading.Lock()
+        self._pendentes = []
+        self._sequencia = 0
+        self._gravada = 0
+        self.recuperar()
+    
+    def recuperar(self):
+        """Remove do fim do diário um registro deixado pela metade por uma falha.
+        
+        Sem isso, o próximo registro seria gravado na mesma linha do pedaço
+        incompleto e também seria descartado na leitura.
+        """
+        if not os.path.exists(self.caminho):
+            return
+        
+        with open(self.caminho, 'rb+') as arquivo:
+            dados = arquivo.read()
+            fim = dados.rfind(b'\n') + 1
+            if fim < len(dados):
+                arquivo.truncate(fim)
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+    
+    def acrescentar(self, registros):
+        """Grava os registros no diário e só retorna depois de eles estarem no disco."""
+        dados = b''.join(codificar_registro(registro) for registro in registros)
+        with self._trava_fila:
+            self._pendentes.append(dados)
+            self._sequencia += 1
+            minha = self._sequencia
+        
+        with self._trava_gravacao:
+            # Outra thread pode já ter gravado este registro junto com os dela
+            if self._gravada >= minha:
+                return
+            
+            with self._trava_fila:
+                lote = b''.join(self._pendentes)
+                self._pendentes = []
+                ultima = self._sequencia
+            
+            # Reabrir a cada gravação acompanha o diário caso outro processo o compacte
+            with open(self.caminho, 'ab') as arquivo:
+                arquivo.write(lote)
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+            self._gravada = ultima
+            contar('bytes_gravados', len(lote))
+    
+    def tamanho(self):
+        try:
+            return os.path.getsize(self.caminho)
+        except OSError:
+            return 0
+
+def sincronizar_diretorio(caminho):
+    """Garante que a troca de arquivos feita por os.replace chegou ao disco."""
+    if os.name != 'posix':
+        return
+    descritor = os.open(os.path.dirname(os.path.abspath(caminho)), os.O_RDONLY)
+    try:
+        os.fsync(descritor)
+    finally:
+        os.close(descritor)
+
+def compactar_diario(arquivo_csv):
+    """Incorpora os registros do diário ao CSV e esvazia o diário.
+    
+    O novo CSV é gravado num arquivo temporário e só então substitui o
+    original com os.replace, então uma falha no meio deixa o CSV antigo e o
+    diário intactos. Se a falha ocorrer depois da troca e antes de esvaziar o
+    diário, os registros apenas aparecem repetidos na próxima leitura, onde a
+    primeira ocorrência prevalece.
+    
+    Returns:
+        int: Quantidade de registros incorporados ao CSV
+    """
+    with trava_do_arquivo(arquivo_csv):
+        return _compactar_diario(arquivo_csv)
+
+def _compactar_diario(arquivo_csv):
+    diario = caminho_diario(arquivo_csv)
+    if not os.path.exists(diario):
+        return 0
+    
+    with open(diario, 'rb') as arquivo:
+        registros, lido = ler_registros(arquivo.read())
+    
+    if registros:
+        temporario = arquivo_csv + '.tmp'
+        try:
+            cabecalho = None
+            with open(temporario, 'wb') as destino:
+                if os.path.exists(arquivo_csv):
+                    with open(arquivo_csv, 'rb') as origem:
+                        primeira = origem.readline()
+                        cabecalho = next(csv.reader([primeira.decode('utf-8-sig')]), None)
+                        origem.seek(0)
+                        shutil.copyfileobj(origem, destino)
+                        
+                        origem.seek(0, os.SEEK_END)
+                        if origem.tell():
+                            origem.seek(-1, os.SEEK_END)
+                            if origem.read(1) != b'\n':
+                                destino.write(b'\r\n')
+            
+            with open(temporario, 'a', newline='', encoding='utf-8') as destino:
+                # O CSV pode ter outra ordem de colunas que a dos registros
+                writer = csv.DictWriter(destino, fieldnames=cabecalho or list(registros[0]),
+                                        extrasaction='ignore')
+                if not cabecalho:
+                    writer.writeheader()
+                writer.writerows(registros)
+                destino.flush()
+                os.fsync(destino.fileno())
+            
+            contar('bytes_gravados', os.path.getsize(temporario))
+            os.replace(temporario, arquivo_csv)
+            sincronizar_diretorio(arquivo_csv)
+        except Exception:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+    
+    # Esvaziar mantendo o mesmo arquivo, que é reaberto a cada gravação. Registros
+    # acrescentados durante a compactação são preservados no início do diário
+    with open(diario, 'rb+') as arquivo:
+        arquivo.seek(lido)
+        restante = arquivo.read()
+        arquivo.seek(0)
+        arquivo.write(restante)
+        arquivo.truncate(len(restante))
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    return len(registros)
@@ -0,0 +1,117 @@
+"""Teste de estresse: vários processos cadastrando no mesmo arquivo de rifas.
+
+Uso: python estresse_concorrencia.py [processos] [números por processo] [arquivo]
+     python estresse_concorrencia.py --help
+
+Todos os processos tentam cadastrar os mesmos números, parte deles com
+cadastro direto e parte reservando o próximo número livre. No final, o
+arquivo não pode ter números repetidos nem linhas incompletas, e cada
+número gravado deve ter sido aceito por exatamente um processo.
+
+O código de saída é 1 quando a verificação encontra problemas, para que o
+teste possa rodar na integração contínua; a partir de outro código, use
+executar_estresse, que devolve o resultado sem imprimir nada.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from rifa_manager import RifaManager
+
+def cadastrar(arquivo, processo, quantidade):
+    """Executado em cada processo. Retorna os números que este processo gravou."""
+    rifa = RifaManager(arquivo)
+    gravados = []
+    for i in range(quantidade):
+        if i % 10 == 0:
+            sucesso, mensagem, numero = rifa.reservar_proximo_numero(f"Processo {processo}", "0")
+        else:
+            numero = i
+            sucesso, mensagem = rifa.cadastrar_comprador(str(i), f"Processo {processo}", "0")
+        if sucesso:
+            gravados.append(numero)
+    rifa.fechar()
+    return gravados
+
+def verificar(arquivo, gravados):
+    """Confere o arquivo final, exportado para CSV. Retorna a lista de problemas encontrados."""
+    exportado = os.path.join(tempfile.mkdtemp(), 'exportado.csv')
+    RifaManager(arquivo).exportar_para_csv(exportado)
+    
+    problemas = []
+    with open(exportado, 'r', newline='', encoding='utf-8') as arquivo_csv:
+        reader = csv.reader(arquivo_csv)
+        cabecalho = next(reader)
+        numeros = []
+        for linha in reader:
+            if len(linha) != len(cabecalho) or not linha[0].isdigit():
+                problemas.append(f"Linha incompleta: {linha}")
+            else:
+                numeros.append(int(linha[0]))
+    
+    repetidos = len(numeros) - len(set(numeros))
+    if repetidos:
+        problemas.append(f"{repetidos} números repetidos no arquivo")
+    
+    todos_gravados = [numero for lista in gravados for numero in lista]
+    if len(todos_gravados) != len(set(todos_gravados)):
+        problemas.append("Um mesmo número foi aceito por mais de um processo")
+    if sorted(todos_gravados) != sorted(set(numeros)):
+        problemas.append("Os números aceitos não correspondem aos gravados no arquivo")
+    return problemas
+
+def executar_estresse(processos=8, quantidade=2000, arquivo=None):
+    """Roda os processos sobre o mesmo arquivo e confere o resultado.
+    
+    Sem arquivo, usa um novo num diretório temporário. Retorna
+    (sucesso, problemas, gravados, duração em segundos), em que gravados
+    é a lista dos números aceitos por cada processo.
+    """
+    if arquivo is None:
+        arquivo = os.path.join(tempfile.mkdtemp(), 'rifas.csv')
+    
+    inicio = time.perf_counter()
+    with multiprocessing.Pool(processos) as pool:
+        gravados = pool.starmap(cadastrar, [(arquivo, p, quantidade) for p in range(processos)])
+    duracao = time.perf_counter() - inicio
+    
+    problemas = verificar(arquivo, gravados)
+    return not problemas, problemas, gravados, duracao
+
+def _positivo(texto):
+    valor = int(texto)
+    if valor < 1:
+        raise argparse.ArgumentTypeError(f"deve ser um inteiro positivo: {texto}")
+    return valor
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(
+        description="Vários processos cadastrando no mesmo arquivo de rifas; "
+                    "termina com código 1 se houver números repetidos ou linhas incompletas.")
+    parser.add_argument('processos', nargs='?', type=_positivo, default=8,
+                        help="quantidade de processos (padrão: 8)")
+    parser.add_argument('quantidade', nargs='?', type=_positivo, default=2000,
+                        help="cadastros por processo (padrão: 2000)")
+    parser.add_argument('arquivo', nargs='?',
+                        help="arquivo de rifas (padrão: um novo num diretório temporário)")
+    opcoes = parser.parse_args(argumentos)
+    
+    print(f"{opcoes.processos} processos x {opcoes.quantidade} cadastros em "
+          f"{opcoes.arquivo or 'arquivo temporário'}")
+    sucesso, problemas, gravados, duracao = executar_estresse(
+        opcoes.processos, opcoes.quantidade, opcoes.arquivo)
+    
+    total = sum(len(lista) for lista in gravados)
+    print(f"{total} números gravados em {duracao:.1f} s "
+          f"({opcoes.processos * opcoes.quantidade / duracao:.0f} tentativas/s)")
+    for problema in problemas:
+        print(f"ERRO: {problema}")
+    if sucesso:
+        print("OK: nenhum número repetido e nenhuma linha incompleta")
+    return 0 if sucesso else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""Exportação dos registros em lotes, com filtros e escolha de formato.
+
+Os registros chegam em lotes (listas de Registro) e cada lote é filtrado e
+gravado antes do próximo ser lido, então a memória usada não depende do
+tamanho da rifa. Formatos:
+
+    csv     CSV com as colunas de CAMPOS, igual ao rifas.csv
+    csv.gz  o mesmo CSV compactado com gzip
+    jsonl   JSON Lines: um objeto {"numero": ..., "nome": ...} por linha
+    xlsx    planilha do Excel (precisa do openpyxl)
+
+O arquivo é gravado com outro nome (.tmp) e só substitui o destino no fim,
+então uma exportação cancelada ou com erro não deixa um arquivo pela metade.
+"""
+import csv
+import gzip
+import json
+import os
+from indice_nomes import normalizar_nome
+from metricas import contar
+from registro import CAMPOS
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+FORMATOS = ('csv', 'csv.gz', 'jsonl', 'xlsx')
+
+# Registros lidos e gravados de cada vez
+TAMANHO_LOTE = 5000
+
+class ExportacaoCancelada(Exception):
+    """Indica que a exportação foi cancelada antes de terminar."""
+
+def formato_do_arquivo(caminho):
+    """Formato de exportação deduzido da extensão do arquivo (CSV se não for conhecida)."""
+    nome = caminho.lower()
+    if nome.endswith('.gz'):
+        return 'csv.gz'
+    if nome.endswith('.jsonl'):
+        return 'jsonl'
+    if nome.endswith('.xlsx'):
+        return 'xlsx'
+    return 'csv'
+
+def criar_filtro(inicio=None, fim=None, nome=None, desde=None, ate=None):
+    """Função registro -> bool com os filtros informados, ou None se não houver filtro.
+    
+    Args:
+        inicio, fim: faixa de números (inclusive)
+        nome: parte do nome, sem diferenciar acentos e maiúsculas
+        desde, ate: faixa da data da compra (datetime, inclusive); registros
+            sem data ficam de fora quando ela é usada
+    """
+    termo = normalizar_nome(nome) if nome else None
+    if inicio is None and fim is None and not termo and desde is None and ate is None:
+        return None
+    
+    def filtro(registro):
+        if inicio is not None and registro.numero < inicio:
+            return False
+        if fim is not None and registro.numero > fim:
+            return False
+        if termo and termo not in normalizar_nome(registro.nome):
+            return False
+        if desde is not None or ate is not None:
+            data = registro.data
+            if data is None or desde is not None and data < desde or ate is not None and data > ate:
+                return False
+        return True
+    return filtro
+
+class EscritorCSV:
+    def __init__(self, caminho, compactado=False):
+        if compactado:
+            self.arquivo = gzip.open(caminho, 'wt', newline='', encoding='utf-8')
+        else:
+            self.arquivo = open(caminho, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.arquivo)
+        self.writer.writerow(CAMPOS)
+    
+    def escrever(self, registros):
+        self.writer.writerows(registro.linha_csv() for registro in registros)
+    
+    def fechar(self):
+        self.arquivo.close()
+
+class EscritorJSONL:
+    def __init__(self, caminho):
+        self.arquivo = open(caminho, 'w', encoding='utf-8')
+    
+    def escrever(self, registros):
+        self.arquivo.writelines(json.dumps(registro.para_dicionario(), ensure_ascii=False) + '\n'
+                                for registro in registros)
+    
+    def fechar(self):
+        self.arquivo.close()
+
+class EscritorXLSX:
+    """Planilha gravada no modo write_only do openpyxl, que não guarda as linhas na memória."""
+    
+    def __init__(self, caminho):
+        if openpyxl is None:
+            raise RuntimeError("Para exportar em XLSX, instale o openpyxl (pip install openpyxl).")
+        self.caminho = caminho
+        self.planilha = openpyxl.Workbook(write_only=True)
+        self.folha = self.planilha.create_sheet("Rifas")
+        self.folha.append(CAMPOS)
+    
+    def escrever(self, registros):
+        for registro in registros:
+            # Número e data como valores do Excel; datas noutro formato ficam em texto
+            data = registro.data
+            self.folha.append([registro.numero, registro.nome, registro.telefone,
+                               data if data is not None else registro['data_compra']])
+    
+    def fechar(self):
+        self.planilha.save(self.caminho)
+
+def _criar_escritor(caminho, formato):
+    if formato == 'csv':
+        return EscritorCSV(caminho)
+    if formato == 'csv.gz':
+        return EscritorCSV(caminho, compactado=True)
+    if formato == 'jsonl':
+        return EscritorJSONL(caminho)
+    if formato == 'xlsx':
+        return EscritorXLSX(caminho)
+    raise ValueError(f"Formato de exportação desconhecido: {formato}")
+
+def lotes_em_ordem(armazenamento, inicio, fim, tamanho_lote=TAMANHO_LOTE):
+    """Percorre em lotes, em ordem de número, os registros entre inicio e fim.
+    
+    Cada lote começa depois do último número do anterior, então cadastros
+    feitos durante a exportação não deslocam as páginas.
+    """
+    while inicio <= fim:
+        registros = armazenamento.listar_intervalo(inicio, fim, 0, tamanho_lote)
+        if not registros:
+            return
+        yield registros
+        inicio = registros[-1].numero + 1
+
+def exportar_lotes(lotes, destino, formato, filtro=None, total=0, progresso=None, cancelar=None):
+    """Grava os lotes de registros no destino, no formato pedido.
+    
+    Args:
+        lotes: iterável de listas de registros
+        filtro: função registro -> bool (ver criar_filtro), ou None
+        total: quantidade de registros esperada, para o progresso (0 se desconhecida)
+        progresso: Função chamada como progresso(feito, total) a cada lote
+        cancelar: threading.Event que, quando ativado, interrompe a exportação
+    
+    Returns:
+        int: Quantidade de registros gravados
+    
+    Raises:
+        ExportacaoCancelada: se cancelar for ativado; o destino não é alterado
+    """
+    temporario = destino + '.tmp'
+    escritor = _criar_escritor(temporario, formato)
+    lidos = 0
+    gravados = 0
+    try:
+        try:
+            for lote in lotes:
+                if cancelar is not None and cancelar.is_set():
+                    raise ExportacaoCancelada()
+                lidos += len(lote)
+                if filtro is not None:
+                    lote = [registro for registro in lote if filtro(registro)]
+                escritor.escrever(lote)
+                gravados += len(lote)
+                if progresso:
+                    progresso(lidos, max(total, lidos) if total else 0)
+        finally:
+            escritor.fechar()
+        contar('bytes_gravados', os.path.getsize(temporario))
+        os.replace(temporario, destino)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return gravados
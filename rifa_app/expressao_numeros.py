@@ -0,0 +1,123 @@
+import re
+from itertools import chain
+
+# Maior quantidade de números aceita numa única expressão
+LIMITE_NUMEROS_EXPRESSAO = 1000000
+
+# Quantidade de trechos mostrados ao resumir uma lista de números
+LIMITE_TRECHOS_RESUMO = 20
+
+SEPARADORES = re.compile(r'[,;\n]')
+NUMERO = re.compile(r'\d+', re.ASCII)
+INTERVALO = re.compile(
+    r'(\d+)\s*(?:-|a|até|ate|to)\s*(\d+)(?:\s*(?:step|passo|de)\s*(\d+))?',
+    re.IGNORECASE | re.ASCII)
+LIVRES = re.compile(
+    r'(?:(?:next|pr[oó]xim[oa]s?)\s+(\d+)(?:\s+(?:free|livres?))?'
+    r'|(\d+)\s+(?:free|livres?))',
+    re.IGNORECASE | re.ASCII)
+
+class ExpressaoNumeros:
+    """Números pedidos numa expressão como "1-500, 1000-1999 passo 10, próximos 50 livres".
+    
+    Os intervalos são guardados como range e só são expandidos quando
+    percorridos, então "1-1000000" não cria um milhão de números de uma vez.
+    
+    Attributes:
+        intervalos: lista de range com os números pedidos explicitamente
+        livres: quantidade de números livres pedidos ("próximos N livres")
+        invalidos: partes da expressão que não puderam ser interpretadas
+    """
+    
+    def __init__(self):
+        self.intervalos = []
+        self.livres = 0
+        self.invalidos = []
+    
+    def __len__(self):
+        """Quantidade de números pedidos explicitamente (sem contar os livres)."""
+        return sum(len(intervalo) for intervalo in self.intervalos)
+    
+    def __iter__(self):
+        return chain.from_iterable(self.intervalos)
+
+def interpretar_numeros(texto):
+    """Interpreta uma expressão de números de rifa.
+    
+    Partes separadas por vírgula (ou ponto e vírgula), cada uma em um destes formatos:
+        12                      um número
+        1-500                   intervalo (também "1 a 500")
+        1000-1999 step 10       intervalo com passo (também "passo 10")
+        next 50 free            os próximos 50 números livres (também "próximos 50 livres")
+    
+    Raises:
+        ValueError: se a expressão pedir mais de LIMITE_NUMEROS_EXPRESSAO números
+    """
+    expressao = ExpressaoNumeros()
+    total = 0
+    for parte in SEPARADORES.split(texto):
+        parte = parte.strip()
+        if not parte:
+            continue
+        
+        pedido = _interpretar_parte(parte)
+        if pedido is None:
+            expressao.invalidos.append(parte)
+            continue
+        
+        if isinstance(pedido, range):
+            expressao.intervalos.append(pedido)
+            total += len(pedido)
+        else:
+            expressao.livres += pedido
+            total += pedido
+        if total > LIMITE_NUMEROS_EXPRESSAO:
+            raise ValueError(f"A expressão pede mais de {LIMITE_NUMEROS_EXPRESSAO} números.")
+    return expressao
+
+def _interpretar_parte(parte):
+    """Retorna um range, a quantidade de livres pedidos (int) ou None se a parte for inválida."""
+    if NUMERO.fullmatch(parte):
+        return range(int(parte), int(parte) + 1)
+    
+    encontrado = INTERVALO.fullmatch(parte)
+    if encontrado:
+        primeiro, ultimo, passo = (int(valor) if valor else 1 for valor in encontrado.groups())
+        if ultimo < primeiro or passo == 0:
+            return None
+        return range(primeiro, ultimo + 1, passo)
+    
+    encontrado = LIVRES.fullmatch(parte)
+    if encontrado:
+        return int(encontrado.group(1) or encontrado.group(2))
+    return None
+
+def resumir_numeros(numeros, limite=LIMITE_TRECHOS_RESUMO):
+    """Escreve números em ordem crescente como trechos: [1, 2, 3, 7] -> "1-3, 7".
+    
+    Com mais de limite trechos, os restantes são resumidos em "... (mais N números)".
+    """
+    trechos = []
+    restantes = 0
+    primeiro = anterior = None
+    for numero in numeros:
+        if anterior is not None and numero == anterior + 1:
+            anterior = numero
+            continue
+        if primeiro is not None:
+            if len(trechos) < limite:
+                trechos.append(str(primeiro) if primeiro == anterior else f"{primeiro}-{anterior}")
+            else:
+                restantes += anterior - primeiro + 1
+        primeiro = anterior = numero
+    
+    if primeiro is not None:
+        if len(trechos) < limite:
+            trechos.append(str(primeiro) if primeiro == anterior else f"{primeiro}-{anterior}")
+        else:
+            restantes += anterior - primeiro + 1
+    
+    texto = ", ".join(trechos)
+    if restantes:
+        texto += f"... (mais {restantes} números)"
+    return texto
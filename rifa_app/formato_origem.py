@@ -0,0 +1,116 @@
+"""Detecção do formato dos arquivos CSV de origem das importações.
+
+Só o começo do arquivo (AMOSTRA bytes) é examinado, para descobrir:
+
+    codificação   BOM do UTF-8; senão UTF-8 se a amostra for UTF-8 válido,
+                  senão cp1252 (o "CSV (separado por vírgulas)" do Excel no Windows)
+    delimitador   ',', ';', tabulação ou '|', o que mais aparece no cabeçalho
+    colunas       nomes do cabeçalho levados aos de CAMPOS pelos apelidos
+                  (ex: "Número" e "Nº" -> numero, "Tel" -> telefone)
+
+O restante do arquivo é lido em seguida com o decodificador escolhido. Bytes
+que não valem na codificação escolhida (ex: um acento em cp1252 depois do
+trecho examinado de um arquivo UTF-8) são lidos como cp1252, byte a byte,
+pelo tratador de erros ERROS_DECODIFICACAO, em vez de interromper a leitura.
+"""
+import codecs
+import csv
+from indice_nomes import normalizar_nome
+
+# Bytes do começo do arquivo examinados na detecção
+AMOSTRA = 1 << 15
+
+DELIMITADORES = (',', ';', '\t', '|')
+
+# Nomes de coluna aceitos para cada campo, já normalizados (ver _normalizar_coluna)
+APELIDOS = {
+    'numero': ('numero', 'no', 'n', 'num', 'nro', 'numero da rifa', 'rifa', 'bilhete', 'cota'),
+    'nome': ('nome', 'comprador', 'nome do comprador', 'cliente'),
+    'telefone': ('telefone', 'tel', 'fone', 'celular', 'whatsapp', 'contato'),
+    'data_compra': ('data compra', 'data da compra', 'data'),
+}
+CAMPO_DO_APELIDO = {apelido: campo for campo, apelidos in APELIDOS.items() for apelido in apelidos}
+
+# Nome do tratador de erros de decodificação registrado neste módulo
+ERROS_DECODIFICACAO = 'rifas_cp1252'
+
+# Texto de cada byte em cp1252; os 5 bytes sem caractere no cp1252 ficam como no latin-1
+_TEXTO_DO_BYTE = [bytes([byte]).decode('cp1252', errors='ignore') or chr(byte) for byte in range(256)]
+
+def _decodificar_como_cp1252(erro):
+    if not isinstance(erro, UnicodeDecodeError):
+        raise erro
+    trecho = erro.object[erro.start:erro.end]
+    return ''.join(_TEXTO_DO_BYTE[byte] for byte in trecho), erro.end
+
+codecs.register_error(ERROS_DECODIFICACAO, _decodificar_como_cp1252)
+
+class FormatoOrigem:
+    """Codificação, delimitador e colunas (já com os nomes de CAMPOS) de um arquivo de origem."""
+    
+    def __init__(self, encoding, delimitador, colunas):
+        self.encoding = encoding
+        self.delimitador = delimitador
+        # None se o arquivo estiver vazio
+        self.colunas = colunas
+    
+    @property
+    def encoding_linhas(self):
+        """Codificação das linhas depois do cabeçalho (o BOM só aparece no começo)."""
+        return 'utf-8' if self.encoding == 'utf-8-sig' else self.encoding
+    
+    def __repr__(self):
+        return f"FormatoOrigem({self.encoding!r}, {self.delimitador!r}, {self.colunas!r})"
+
+def _normalizar_coluna(nome):
+    """Ex: " Nº " -> "no", "Data_Compra" -> "data compra", "Núm." -> "num"."""
+    nome = nome.replace('_', ' ').replace('.', ' ').replace(':', ' ')
+    return normalizar_nome(nome)
+
+def nomes_das_colunas(cabecalho):
+    """Leva os nomes do cabeçalho aos de CAMPOS; os demais ficam como estão.
+    
+    Se dois nomes forem apelidos do mesmo campo, vale o primeiro.
+    """
+    colunas = []
+    for nome in cabecalho:
+        campo = CAMPO_DO_APELIDO.get(_normalizar_coluna(nome))
+        colunas.append(campo if campo is not None and campo not in colunas else nome)
+    return colunas
+
+def _detectar_encoding(amostra):
+    if amostra.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if amostra.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        raise ValueError("Arquivo em UTF-16 não é suportado. Salve-o como \"CSV UTF-8\".")
+    try:
+        # Incremental: um caractere cortado no fim da amostra não é erro
+        codecs.getincrementaldecoder('utf-8')().decode(amostra, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp1252'
+
+def _detectar_delimitador(linha):
+    contagens = [(linha.count(delimitador), -i, delimitador)
+                 for i, delimitador in enumerate(DELIMITADORES)]
+    quantidade, _, delimitador = max(contagens)
+    return delimitador if quantidade else ','
+
+def detectar_formato(caminho):
+    """Examina o começo do arquivo e retorna o seu FormatoOrigem.
+    
+    Raises:
+        ValueError: se o arquivo estiver numa codificação não suportada (UTF-16)
+    """
+    with open(caminho, 'rb') as arquivo:
+        amostra = arquivo.read(AMOSTRA)
+    
+    encoding = _detectar_encoding(amostra)
+    texto = amostra.decode(encoding, errors=ERROS_DECODIFICACAO)
+    primeira = texto.splitlines()[0] if texto else ''
+    if not primeira.strip():
+        return FormatoOrigem(encoding, ',', None)
+    
+    delimitador = _detectar_delimitador(primeira)
+    cabecalho = next(csv.reader([primeira], delimiter=delimitador))
+    return FormatoOrigem(encoding, delimitador, nomes_das_colunas(cabecalho))
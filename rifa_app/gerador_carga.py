@@ -0,0 +1,105 @@
+"""Gerador de carga para o servidor de rifas.
+
+Uso: python gerador_carga.py [http://host:porta] [clientes] [cadastros por cliente]
+
+Sem endereço, um servidor é iniciado em localhost com um arquivo temporário.
+Cada cliente é uma thread com sua própria conexão, que cadastra números
+sorteados (disputados entre os clientes) e, a cada dez cadastros, reserva o
+próximo número livre. No final, confere se nenhum número foi aceito por
+mais de um cliente e se o servidor tem exatamente os números aceitos.
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from rifa_manager import RifaManager
+from servidor import ServidorRifas
+
+def iniciar_servidor_local():
+    """Inicia um servidor em localhost numa thread. Retorna (url, função para pará-lo)."""
+    arquivo = os.path.join(tempfile.mkdtemp(), 'rifas.csv')
+    servidor = ServidorRifas(arquivo, '127.0.0.1', 0)
+    loop = asyncio.new_event_loop()
+    porta = loop.run_until_complete(servidor.iniciar())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    
+    def parar():
+        asyncio.run_coroutine_threadsafe(servidor.parar(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        servidor.fechar()
+    
+    return f"http://127.0.0.1:{porta}", parar
+
+def cliente(url, indice, quantidade, intervalo, aceitos, latencias):
+    rifa = RifaManager(url)
+    sorteio = random.Random(indice)
+    for i in range(quantidade):
+        inicio = time.perf_counter()
+        if i % 10 == 0:
+            sucesso, mensagem, numero = rifa.reservar_proximo_numero(f"Cliente {indice}", "0")
+        else:
+            numero = sorteio.randrange(intervalo)
+            sucesso, mensagem = rifa.cadastrar_comprador(str(numero), f"Cliente {indice}", "0")
+        latencias.append(time.perf_counter() - inicio)
+        if sucesso:
+            aceitos.append(numero)
+    rifa.fechar()
+
+def percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * fracao))]
+
+def main():
+    argumentos = sys.argv[1:]
+    url = argumentos.pop(0) if argumentos and argumentos[0].startswith('http://') else None
+    clientes = int(argumentos[0]) if len(argumentos) > 0 else 8
+    quantidade = int(argumentos[1]) if len(argumentos) > 1 else 500
+    
+    parar_servidor = None
+    if url is None:
+        url, parar_servidor = iniciar_servidor_local()
+    print(f"{clientes} clientes x {quantidade} cadastros em {url}")
+    
+    # Números de partida: o que já está cadastrado não conta na verificação
+    existentes = {r.numero for r in RifaManager(url).listar_compradores()}
+    intervalo = max(existentes, default=0) + clientes * quantidade
+    
+    aceitos = [[] for _ in range(clientes)]
+    latencias = []
+    threads = [threading.Thread(target=cliente,
+                                args=(url, i, quantidade, intervalo, aceitos[i], latencias))
+               for i in range(clientes)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+    
+    print(f"{len(latencias)} pedidos em {duracao:.1f} s ({len(latencias) / duracao:.0f} pedidos/s)")
+    print(f"Latência: p50 {percentil(latencias, 0.50) * 1000:.1f} ms, "
+          f"p99 {percentil(latencias, 0.99) * 1000:.1f} ms")
+    
+    todos = [numero for lista in aceitos for numero in lista]
+    no_servidor = {r.numero for r in RifaManager(url).listar_compradores()} - existentes
+    problemas = []
+    if len(todos) != len(set(todos)):
+        problemas.append("Um mesmo número foi aceito por mais de um cliente")
+    if set(todos) != no_servidor:
+        problemas.append("Os números aceitos não correspondem aos cadastrados no servidor")
+    
+    if parar_servidor is not None:
+        parar_servidor()
+    for problema in problemas:
+        print(f"ERRO: {problema}")
+    if problemas:
+        sys.exit(1)
+    print(f"OK: {len(todos)} números aceitos, nenhum repetido")
+
+if __name__ == "__main__":
+    main()
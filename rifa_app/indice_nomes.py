@@ -0,0 +1,196 @@
+import unicodedata
+from bisect import bisect_left
+
+# Acima desta quantidade de nomes candidatos, a pesquisa paginada percorre os
+# números em ordem em vez de ordenar todos os números encontrados
+LIMITE_CANDIDATOS = 5000
+
+def normalizar_nome(nome):
+    """Normaliza um nome para buscas: sem acentos, sem maiúsculas e sem espaços extras.
+    
+    Ex: "  João da CONCEIÇÃO " -> "joao da conceicao"
+    """
+    if not nome.isascii():
+        decomposto = unicodedata.normalize('NFKD', nome)
+        nome = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(nome.casefold().split())
+
+def trigramas(texto):
+    """Retorna o conjunto de trechos de 3 caracteres do texto."""
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+class IndiceNomes:
+    """Índice de trigramas para buscas parciais por nome.
+    
+    Como um mesmo comprador costuma ter vários números, o índice guarda cada
+    nome normalizado uma única vez, com o conjunto de números daquele nome.
+    Uma busca só compara o texto com os nomes que contêm todos os trigramas
+    da consulta.
+    
+    Os nomes dos registros de um instantâneo (instantaneo.py) não são
+    copiados para cá: o índice gravado nele é consultado junto com este.
+    """
+    
+    def __init__(self):
+        self.limpar()
+    
+    def limpar(self, base=None):
+        """Esvazia o índice. base é o instantâneo cujos números já estão indexados."""
+        self.numeros_por_nome = {}
+        self.nome_por_numero = {}
+        self.postings = {}
+        self.base = base
+    
+    def adicionar(self, nome, numero):
+        """Associa o número ao nome no índice."""
+        nome = normalizar_nome(nome)
+        numeros = self.numeros_por_nome.get(nome)
+        if numeros is None:
+            numeros = self.numeros_por_nome[nome] = set()
+            for trigrama in trigramas(nome):
+                self.postings.setdefault(trigrama, set()).add(nome)
+        numeros.add(numero)
+        self.nome_por_numero[numero] = nome
+    
+    def _listas_candidatas(self, termo):
+        """Listas de nomes dos trigramas do termo, da mais curta para a mais longa."""
+        return sorted((self.postings.get(t, set()) for t in trigramas(termo)), key=len)
+    
+    def _listas_do_instantaneo(self, termo):
+        """Listas (ordenadas) de ids de nomes do instantâneo para os trigramas do termo."""
+        if self.base is None:
+            return []
+        return sorted((self.base.ids_do_trigrama(t) for t in trigramas(termo)), key=len)
+    
+    def _numeros_dos_nomes(self, termo, listas, listas_base):
+        if listas:
+            candidatos = set(listas[0]).intersection(*listas[1:])
+        else:
+            # Termos com menos de 3 letras: comparar com cada nome distinto
+            candidatos = self.numeros_por_nome
+        
+        numeros = set()
+        for nome in candidatos:
+            if termo in nome:
+                numeros.update(self.numeros_por_nome[nome])
+        if self.base is not None:
+            numeros.update(self._numeros_do_instantaneo(termo, listas_base))
+        return numeros
+    
+    def _numeros_do_instantaneo(self, termo, listas):
+        base = self.base
+        if listas:
+            # As listas do instantâneo são ordenadas: procurar os ids da mais
+            # curta nas outras por busca binária, sem montar conjuntos
+            candidatos = (id_nome for id_nome in listas[0]
+                          if all(_contem(lista, id_nome) for lista in listas[1:]))
+        else:
+            candidatos = range(base.quantidade_nomes)
+        
+        numeros = []
+        for id_nome in candidatos:
+            if termo in base.nome_normalizado(id_nome):
+                numeros.extend(map(base.numeros.__getitem__, base.posicoes_do_nome(id_nome)))
+        return numeros
+    
+    def buscar(self, termo):
+        """Retorna o conjunto de números cujo nome contém o termo."""
+        termo = normalizar_nome(termo)
+        # Começar pela lista de nomes mais curta reduz as interseções
+        return self._numeros_dos_nomes(termo, self._listas_candidatas(termo),
+                                       self._listas_do_instantaneo(termo))
+    
+    def pesquisar(self, termo, chaves_ordenadas, offset=0, limite=None, maximo=None):
+        """Busca uma página dos números, em ordem, cujo nome contém o termo.
+        
+        Termos seletivos usam os trigramas e ordenam só os números encontrados.
+        Termos curtos ou muito comuns percorrem chaves_ordenadas e param assim
+        que a página e a contagem (limitada a maximo) estão completas.
+        
+        Returns:
+            tuple: (total de números encontrados, até maximo; números da página)
+        """
+        termo = normalizar_nome(termo)
+        fim = None if limite is None else offset + limite
+        
+        listas = self._listas_candidatas(termo)
+        listas_base = self._listas_do_instantaneo(termo)
+        candidatos = (len(listas[0]) if listas else 0) + (len(listas_base[0]) if listas_base else 0)
+        # Sem página nem máximo, todos os números encontrados são devolvidos de
+        # qualquer forma: ordenar só eles custa menos que percorrer todos
+        if listas and candidatos <= LIMITE_CANDIDATOS or fim is None and maximo is None:
+            numeros = sorted(self._numeros_dos_nomes(termo, listas, listas_base))
+            if maximo is not None:
+                numeros = numeros[:maximo]
+            return len(numeros), numeros[offset:fim]
+        
+        if self.base is not None:
+            encontrado = self._comparador_do_instantaneo(termo)
+        total = 0
+        pagina = []
+        for numero in chaves_ordenadas:
+            nome = self.nome_por_numero.get(numero)
+            if termo in nome if nome is not None else encontrado(numero):
+                if total >= offset and (fim is None or total < fim):
+                    pagina.append(numero)
+                total += 1
+                if total == maximo:
+                    break
+        return total, pagina
+    
+    def nome_do_numero(self, numero):
+        """Nome normalizado de um número já indexado."""
+        nome = self.nome_por_numero.get(numero)
+        if nome is None:
+            nome = self.base.nome_normalizado(self.base.id_nome[self.base.posicao(numero)])
+        return nome
+    
+    def nomes_em_ordem(self, chaves):
+        """Nomes normalizados dos números de chaves (em ordem crescente e todos já indexados)."""
+        nome_por_numero = self.nome_por_numero
+        base = self.base
+        if base is None:
+            return [nome_por_numero[numero] for numero in chaves]
+        
+        # Cada nome distinto do instantâneo vira um único objeto str
+        nomes_base = [base.nome_normalizado(id_nome) for id_nome in range(base.quantidade_nomes)]
+        numeros = base.numeros
+        id_nome = base.id_nome
+        nomes = []
+        posicao = -1
+        for numero in chaves:
+            nome = nome_por_numero.get(numero)
+            if nome is None:
+                posicao += 1
+                if numeros[posicao] != numero:
+                    posicao = base.posicao(numero)
+                nome = nomes_base[id_nome[posicao]]
+            nomes.append(nome)
+        return nomes
+    
+    def _comparador_do_instantaneo(self, termo):
+        """Função que diz se o nome de um número do instantâneo contém o termo.
+        
+        Deve ser chamada com números crescentes: a posição no instantâneo
+        avança junto, e cada nome distinto é comparado uma única vez.
+        """
+        base = self.base
+        numeros = base.numeros
+        resultados = {}
+        posicao = 0
+        
+        def encontrado(numero):
+            nonlocal posicao
+            while numeros[posicao] < numero:
+                posicao += 1
+            id_nome = base.id_nome[posicao]
+            resultado = resultados.get(id_nome)
+            if resultado is None:
+                resultado = resultados[id_nome] = termo in base.nome_normalizado(id_nome)
+            return resultado
+        return encontrado
+
+def _contem(lista, valor):
+    """Verifica se o valor está na lista ordenada."""
+    posicao = bisect_left(lista, valor)
+    return posicao < len(lista) and lista[posicao] == valor
@@ -0,0 +1,40 @@
+from array import array
+
+class IndiceOrdenado:
+    """Números dos registros ordenados por outro valor (nome, data da compra).
+    
+    É um índice secundário para listar em páginas numa ordem diferente da
+    dos números: guarda só os números (array de inteiros, 8 bytes cada),
+    na ordem de (valor, número). O valor de cada número é consultado pela
+    função valor_do_numero quando é preciso comparar.
+    """
+    
+    def __init__(self, chaves, valores, valor_do_numero):
+        """Monta o índice.
+        
+        Args:
+            chaves: números em ordem crescente
+            valores: valor de cada número, na mesma ordem das chaves
+            valor_do_numero: função número -> valor, usada nas inserções
+        """
+        self.valor_do_numero = valor_do_numero
+        # A ordenação é estável: valores iguais mantêm a ordem dos números
+        ordem = sorted(range(len(chaves)), key=valores.__getitem__)
+        self.numeros = array('q', map(chaves.__getitem__, ordem))
+    
+    def __len__(self):
+        return len(self.numeros)
+    
+    def adicionar(self, numero):
+        """Insere um número novo na posição da ordem (busca binária)."""
+        numeros = self.numeros
+        valor_do_numero = self.valor_do_numero
+        chave = (valor_do_numero(numero), numero)
+        inicio, fim = 0, len(numeros)
+        while inicio < fim:
+            meio = (inicio + fim) // 2
+            if (valor_do_numero(numeros[meio]), numeros[meio]) < chave:
+                inicio = meio + 1
+            else:
+                fim = meio
+        numeros.insert(inicio, numero)
@@ -0,0 +1,558 @@
+"""Instantâneo binário do CSV de rifas, carregado com mmap para abrir arquivos grandes na hora.
+
+O instantâneo (rifas.csv.instantaneo) guarda os registros do CSV em colunas:
+
+    numeros         array('I') ordenado (array('Q') se algum número não couber)
+    nomes/telefones textos UTF-8 concatenados, com um array('I') de posições
+                    (em caracteres: o texto é decodificado uma vez e fatiado)
+    datas           array('q') com a data da compra em segundos desde 1970
+
+e o índice de busca por nome (nomes normalizados distintos, o nome de cada
+registro, os registros de cada nome e os trigramas de cada nome). Nada disso
+é convertido em objetos Python ao abrir: os arrays são vistas (memoryview)
+sobre o arquivo mapeado em memória, e cada registro é um RegistroInstantaneo,
+que guarda só a posição e lê os campos das colunas quando usados.
+
+O instantâneo cobre o CSV até um certo byte (offset_csv). Ao abrir, ele só é
+usado se o CRC32 desse trecho do CSV ainda for o mesmo; as linhas que vierem
+depois (acrescentadas por compactações) são lidas do CSV normalmente.
+"""
+import json
+import mmap
+import os
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from heapq import merge
+from datetime import datetime, timedelta
+from functools import cached_property
+from indice_nomes import normalizar_nome, trigramas
+from registro import Registro, RegistroBase
+
+# Extensão do instantâneo, gravado ao lado do arquivo CSV (ex: rifas.csv.instantaneo)
+EXTENSAO_INSTANTANEO = '.instantaneo'
+
+MAGICO = b'RIFASIN2'
+
+# Data guardada para os registros sem data da compra
+SEM_DATA = -2 ** 63
+EPOCA = datetime(1970, 1, 1)
+UM_SEGUNDO = timedelta(seconds=1)
+
+HORARIOS = tuple(f"{minuto // 60:02d}:{minuto % 60:02d}" for minuto in range(24 * 60))
+
+# Quantidade de datas já convertidas em texto mantidas em memória
+LIMITE_DATAS_EM_CACHE = 65536
+
+# Tamanho dos blocos lidos ao conferir o CRC32 do CSV
+TAMANHO_BLOCO = 1 << 20
+
+def caminho_instantaneo(arquivo_csv):
+    return arquivo_csv + EXTENSAO_INSTANTANEO
+
+def segundos_da_data(data):
+    """Data da compra (datetime ou None) em segundos desde 1970; SEM_DATA se não houver."""
+    return SEM_DATA if data is None else (data - EPOCA) // UM_SEGUNDO
+
+def crc_do_trecho(arquivo, tamanho):
+    """CRC32 dos primeiros tamanho bytes do arquivo (aberto em modo binário)."""
+    arquivo.seek(0)
+    crc = 0
+    while tamanho > 0:
+        bloco = arquivo.read(min(TAMANHO_BLOCO, tamanho))
+        if not bloco:
+            break
+        crc = zlib.crc32(bloco, crc)
+        tamanho -= len(bloco)
+    return crc
+
+def _textos(valores):
+    """Concatena os textos em UTF-8.
+    
+    Returns:
+        tuple: (bytes, array('I') com a posição, em caracteres, do início de
+        cada texto e do fim do último) ou None se passar de 4 bilhões de caracteres
+    """
+    posicoes = array('I', [0])
+    total = 0
+    for valor in valores:
+        total += len(valor)
+        if total > 0xFFFFFFFF:
+            return None
+        posicoes.append(total)
+    return ''.join(valores).encode('utf-8'), posicoes
+
+def _agrupar(grupos, quantidade_grupos):
+    """Agrupa os índices 0..n-1 pelo grupo de cada um (counting sort).
+    
+    Returns:
+        tuple: (array('I') de posições de início de cada grupo, array('I') de índices)
+    """
+    inicios = array('I', bytes(4 * (quantidade_grupos + 1)))
+    for grupo in grupos:
+        inicios[grupo + 1] += 1
+    for i in range(quantidade_grupos):
+        inicios[i + 1] += inicios[i]
+    
+    proximo = array('I', inicios)
+    indices = array('I', bytes(4 * len(grupos)))
+    for indice, grupo in enumerate(grupos):
+        indices[proximo[grupo]] = indice
+        proximo[grupo] += 1
+    return inicios, indices
+
+def gravar_instantaneo(caminho, chaves, registros, cabecalho, offset_csv, cauda, crc_csv,
+                       invalidas=()):
+    """Grava o instantâneo de forma atômica (arquivo temporário + os.replace).
+    
+    Args:
+        chaves: números (int) em ordem crescente, sem repetição
+        registros: registros (RegistroBase) na mesma ordem das chaves
+        cabecalho: colunas do CSV
+        offset_csv, cauda, crc_csv: tamanho do trecho do CSV coberto, seus
+            últimos bytes e o CRC32 do trecho
+        invalidas: linhas do trecho que ficaram fora do índice (campo -> texto)
+    
+    Returns:
+        bool: False se os dados não cabem no formato (o instantâneo não é gravado)
+    """
+    if not chaves or chaves[0] < 0 or chaves[-1] > 0xFFFFFFFFFFFFFFFF:
+        return False
+    numeros = array('I' if chaves[-1] <= 0xFFFFFFFF else 'Q', chaves)
+    
+    nomes = []
+    telefones = []
+    datas = array('q')
+    excecoes = {}
+    ids_nomes = {}
+    ids_por_nome = {}
+    id_nome = array('I')
+    for posicao, registro in enumerate(registros):
+        nome = registro.nome
+        data = registro.data
+        nomes.append(nome)
+        telefones.append(registro.telefone)
+        datas.append(segundos_da_data(data))
+        
+        # Registros que as colunas não reproduzem exatamente são guardados inteiros
+        originais = registro.textos_originais()
+        if originais is not None:
+            excecoes[posicao] = originais
+        
+        # Um comprador costuma ter vários números: normalizar cada nome uma vez
+        id_normalizado = ids_por_nome.get(nome)
+        if id_normalizado is None:
+            id_normalizado = ids_por_nome[nome] = ids_nomes.setdefault(
+                normalizar_nome(nome), len(ids_nomes))
+        id_nome.append(id_normalizado)
+    
+    # Com datas noutro formato ou colunas a mais, quase tudo viraria exceção
+    if len(excecoes) > len(numeros) // 10:
+        return False
+    
+    textos_nomes = _textos(nomes)
+    textos_telefones = _textos(telefones)
+    nomes_normalizados = list(ids_nomes)
+    textos_normalizados = _textos(nomes_normalizados)
+    if textos_nomes is None or textos_telefones is None or textos_normalizados is None:
+        return False
+    del nomes, telefones, ids_nomes, ids_por_nome
+    
+    inicios_por_nome, posicoes_por_nome = _agrupar(id_nome, len(nomes_normalizados))
+    
+    postings = {}
+    for id_normalizado, nome in enumerate(nomes_normalizados):
+        for trigrama in trigramas(nome):
+            postings.setdefault(trigrama, []).append(id_normalizado)
+    chaves_trigramas = sorted(postings)
+    textos_trigramas = _textos(chaves_trigramas)
+    inicios_trigramas = array('I', [0])
+    ids_trigramas = array('I')
+    for trigrama in chaves_trigramas:
+        ids_trigramas.extend(postings[trigrama])
+        inicios_trigramas.append(len(ids_trigramas))
+    
+    secoes = [
+        ('numeros', numeros),
+        ('nomes', textos_nomes[0]), ('posicoes_nomes', textos_nomes[1]),
+        ('telefones', textos_telefones[0]), ('posicoes_telefones', textos_telefones[1]),
+        ('datas', datas),
+        ('id_nome', id_nome),
+        ('normalizados', textos_normalizados[0]), ('posicoes_normalizados', textos_normalizados[1]),
+        ('inicios_por_nome', inicios_por_nome), ('posicoes_por_nome', posicoes_por_nome),
+        ('trigramas', textos_trigramas[0]), ('posicoes_trigramas', textos_trigramas[1]),
+        ('inicios_trigramas', inicios_trigramas), ('ids_trigramas', ids_trigramas),
+    ]
+    
+    # As seções começam depois do cabeçalho, alinhadas em 8 bytes
+    descricao = {
+        'ordem_bytes': sys.byteorder,
+        'registros': len(numeros),
+        'cabecalho': list(cabecalho),
+        'offset_csv': offset_csv,
+        'cauda': cauda.hex(),
+        'crc_csv': crc_csv,
+        'excecoes': {str(posicao): registro for posicao, registro in excecoes.items()},
+        'invalidas': list(invalidas),
+        'secoes': {},
+    }
+    posicao = 0
+    for nome_secao, dados in secoes:
+        tipo = dados.typecode if isinstance(dados, array) else 'B'
+        tamanho = len(dados) * (dados.itemsize if isinstance(dados, array) else 1)
+        descricao['secoes'][nome_secao] = [posicao, tamanho, tipo]
+        posicao += (tamanho + 7) & ~7
+    conteudo_descricao = json.dumps(descricao, ensure_ascii=False).encode('utf-8')
+    inicio_dados = (len(MAGICO) + 8 + len(conteudo_descricao) + 7) & ~7
+    
+    temporario = caminho + '.tmp'
+    try:
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(MAGICO)
+            arquivo.write(len(conteudo_descricao).to_bytes(8, 'little'))
+            arquivo.write(conteudo_descricao)
+            arquivo.write(bytes(inicio_dados - arquivo.tell()))
+            for nome_secao, dados in secoes:
+                inicio, tamanho, tipo = descricao['secoes'][nome_secao]
+                arquivo.write(bytes(inicio_dados + inicio - arquivo.tell()))
+                arquivo.write(dados)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    return True
+
+def carregar_instantaneo(caminho):
+    """Abre o instantâneo com mmap. Retorna None se ele não existir ou não for legível."""
+    try:
+        with open(caminho, 'rb') as arquivo:
+            if arquivo.read(len(MAGICO)) != MAGICO:
+                return None
+            tamanho = int.from_bytes(arquivo.read(8), 'little')
+            descricao = json.loads(arquivo.read(tamanho).decode('utf-8'))
+            mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    
+    if descricao.get('ordem_bytes') != sys.byteorder:
+        return None
+    inicio_dados = (len(MAGICO) + 8 + tamanho + 7) & ~7
+    visao = memoryview(mapa)
+    secoes = {}
+    try:
+        for nome_secao, (inicio, tamanho_secao, tipo) in descricao['secoes'].items():
+            trecho = visao[inicio_dados + inicio:inicio_dados + inicio + tamanho_secao]
+            if len(trecho) != tamanho_secao:
+                return None
+            secoes[nome_secao] = trecho if tipo == 'B' else trecho.cast(tipo)
+    except (TypeError, ValueError):
+        return None
+    return Instantaneo(descricao, secoes)
+
+class Instantaneo:
+    """Registros de um instantâneo aberto, acessados pela posição (ordem dos números)."""
+    
+    def __init__(self, descricao, secoes):
+        self.cabecalho = descricao['cabecalho']
+        self.offset_csv = descricao['offset_csv']
+        self.cauda = bytes.fromhex(descricao['cauda'])
+        self.crc_csv = descricao['crc_csv']
+        self._excecoes = {int(posicao): Registro.de_dicionario(campos)
+                          for posicao, campos in descricao['excecoes'].items()}
+        self.invalidas = descricao['invalidas']
+        
+        self.numeros = secoes['numeros']
+        self._nomes = secoes['nomes']
+        self._posicoes_nomes = secoes['posicoes_nomes']
+        self._telefones = secoes['telefones']
+        self._posicoes_telefones = secoes['posicoes_telefones']
+        self._datas = secoes['datas']
+        self.id_nome = secoes['id_nome']
+        self._normalizados = secoes['normalizados']
+        self._posicoes_normalizados = secoes['posicoes_normalizados']
+        self._inicios_por_nome = secoes['inicios_por_nome']
+        self._posicoes_por_nome = secoes['posicoes_por_nome']
+        self._trigramas = secoes['trigramas']
+        self._posicoes_trigramas = secoes['posicoes_trigramas']
+        self._inicios_trigramas = secoes['inicios_trigramas']
+        self._ids_trigramas = secoes['ids_trigramas']
+        self._indice_trigramas = None
+        self._textos_dias = {}
+        self._textos_datas = {}
+    
+    def __len__(self):
+        return len(self.numeros)
+    
+    def posicao(self, chave):
+        """Posição do número no instantâneo, ou -1 se ele não estiver lá."""
+        numeros = self.numeros
+        # Rifas costumam ter números seguidos: tentar primeiro a posição que o
+        # número teria se não houvesse buracos
+        palpite = chave - numeros[0]
+        if 0 <= palpite < len(numeros) and numeros[palpite] == chave:
+            return palpite
+        posicao = bisect_left(numeros, chave)
+        if posicao < len(self.numeros) and self.numeros[posicao] == chave:
+            return posicao
+        return -1
+    
+    # Os textos são decodificados na primeira vez em que são usados
+    
+    @cached_property
+    def _texto_nomes(self):
+        return str(self._nomes, 'utf-8')
+    
+    @cached_property
+    def _texto_telefones(self):
+        return str(self._telefones, 'utf-8')
+    
+    @cached_property
+    def _texto_normalizados(self):
+        return str(self._normalizados, 'utf-8')
+    
+    def nome(self, posicao):
+        posicoes = self._posicoes_nomes
+        return self._texto_nomes[posicoes[posicao]:posicoes[posicao + 1]]
+    
+    def telefone(self, posicao):
+        posicoes = self._posicoes_telefones
+        return self._texto_telefones[posicoes[posicao]:posicoes[posicao + 1]]
+    
+    def data(self, posicao):
+        segundos = self._datas[posicao]
+        return None if segundos == SEM_DATA else EPOCA + timedelta(seconds=segundos)
+    
+    def texto_data(self, posicao):
+        """Data da compra da posição, em texto (dd/mm/aaaa hh:mm)."""
+        segundos = self._datas[posicao]
+        if segundos == SEM_DATA:
+            return ''
+        texto = self._textos_datas.get(segundos)
+        if texto is not None:
+            return texto
+        
+        dias, resto = divmod(segundos, 86400)
+        dia = self._textos_dias.get(dias)
+        if dia is None:
+            data = EPOCA + timedelta(days=dias)
+            dia = self._textos_dias[dias] = f"{data.day:02d}/{data.month:02d}/{data.year:04d} "
+        if len(self._textos_datas) >= LIMITE_DATAS_EM_CACHE:
+            self._textos_datas.clear()
+        texto = self._textos_datas[segundos] = dia + HORARIOS[resto // 60]
+        return texto
+    
+    @cached_property
+    def _montados(self):
+        return [None] * len(self.numeros)
+    
+    def registro(self, posicao):
+        """Registro da posição, criado na primeira consulta e reaproveitado nas seguintes."""
+        registro = self._montados[posicao]
+        if registro is None:
+            registro = self._montados[posicao] = self._montar(posicao)
+        return registro
+    
+    def _montar(self, posicao):
+        excecao = self._excecoes.get(posicao)
+        return RegistroInstantaneo(self, posicao) if excecao is None else excecao
+    
+    # Índice de nomes
+    
+    @property
+    def quantidade_nomes(self):
+        return len(self._posicoes_normalizados) - 1
+    
+    def nome_normalizado(self, id_normalizado):
+        posicoes = self._posicoes_normalizados
+        return self._texto_normalizados[posicoes[id_normalizado]:posicoes[id_normalizado + 1]]
+    
+    def posicoes_do_nome(self, id_normalizado):
+        """Posições dos registros com o nome normalizado id_normalizado."""
+        inicios = self._inicios_por_nome
+        return self._posicoes_por_nome[inicios[id_normalizado]:inicios[id_normalizado + 1]]
+    
+    def ids_do_trigrama(self, trigrama):
+        """Ids (em ordem crescente) dos nomes normalizados que contêm o trigrama."""
+        if self._indice_trigramas is None:
+            posicoes = self._posicoes_trigramas
+            texto = str(self._trigramas, 'utf-8')
+            self._indice_trigramas = {
+                texto[posicoes[i]:posicoes[i + 1]]: i for i in range(len(posicoes) - 1)}
+        indice = self._indice_trigramas.get(trigrama)
+        if indice is None:
+            return self._ids_trigramas[0:0]
+        return self._ids_trigramas[self._inicios_trigramas[indice]:self._inicios_trigramas[indice + 1]]
+
+class RegistroInstantaneo(RegistroBase):
+    """Registro do instantâneo: guarda só a posição e lê cada campo das colunas ao ser usado."""
+    
+    __slots__ = ('_instantaneo', '_posicao')
+    
+    def __init__(self, instantaneo, posicao):
+        self._instantaneo = instantaneo
+        self._posicao = posicao
+    
+    @property
+    def numero(self):
+        return self._instantaneo.numeros[self._posicao]
+    
+    @property
+    def nome(self):
+        return self._instantaneo.nome(self._posicao)
+    
+    @property
+    def telefone(self):
+        return self._instantaneo.telefone(self._posicao)
+    
+    @property
+    def data(self):
+        return self._instantaneo.data(self._posicao)
+    
+    def texto_data(self):
+        return self._instantaneo.texto_data(self._posicao)
+
+class IndiceRegistros:
+    """Índice número -> registro formado pelo instantâneo e pelos registros lidos depois dele.
+    
+    Funciona como o dicionário usado antes do instantâneo (in, get, [],
+    atribuição, len), mas os registros do instantâneo só viram objetos
+    quando consultados.
+    """
+    
+    def __init__(self, base=None):
+        self.base = base
+        self.novos = {}
+    
+    @property
+    def tamanho_base(self):
+        return 0 if self.base is None else len(self.base)
+    
+    def __len__(self):
+        return self.tamanho_base + len(self.novos)
+    
+    def __contains__(self, chave):
+        return chave in self.novos or (self.base is not None and self.base.posicao(chave) >= 0)
+    
+    def __getitem__(self, chave):
+        registro = self.get(chave)
+        if registro is None:
+            raise KeyError(chave)
+        return registro
+    
+    def __setitem__(self, chave, registro):
+        self.novos[chave] = registro
+    
+    def get(self, chave, padrao=None):
+        registro = self.novos.get(chave)
+        if registro is not None:
+            return registro
+        if self.base is not None:
+            posicao = self.base.posicao(chave)
+            if posicao >= 0:
+                return self.base.registro(posicao)
+        return padrao
+    
+    def chaves_ordenadas(self):
+        """Números em ordem: a própria coluna do instantâneo, se nada foi lido depois dele.
+        
+        Com registros novos, a coluna é intercalada com eles num array de
+        inteiros, que ocupa 8 bytes por número em vez de um int por item.
+        """
+        if self.base is None:
+            return sorted(self.novos)
+        if not self.novos:
+            return self.base.numeros
+        return array('q', merge(self.base.numeros, sorted(self.novos)))
+    
+    def registros_em_ordem(self, chaves):
+        """Lista os registros das chaves (em ordem crescente e todas já indexadas)."""
+        if self.base is None or len(chaves) != len(self):
+            return list(self.em_ordem(chaves))
+        
+        # Todas as chaves: copiar os registros do instantâneo em fatias e
+        # intercalar os novos, sem percorrer número por número
+        base = self.base
+        montados = base._montados
+        if None in montados:
+            for posicao in [posicao for posicao, registro in enumerate(montados) if registro is None]:
+                montados[posicao] = base._montar(posicao)
+        if not self.novos:
+            return montados[:]
+        
+        registros = []
+        inicio = 0
+        for chave in sorted(self.novos):
+            fim = bisect_left(base.numeros, chave, inicio)
+            registros.extend(montados[inicio:fim])
+            registros.append(self.novos[chave])
+            inicio = fim
+        registros.extend(montados[inicio:])
+        return registros
+    
+    def em_ordem(self, chaves):
+        """Percorre os registros das chaves (em ordem crescente e todas já indexadas)."""
+        novos = self.novos
+        if self.base is None:
+            for chave in chaves:
+                yield novos[chave]
+            return
+        
+        numeros = self.base.numeros
+        montados = self.base._montados
+        registro_da_posicao = self.base.registro
+        posicao = -1
+        for chave in chaves:
+            registro = novos.get(chave) if novos else None
+            if registro is None:
+                # A próxima chave do instantâneo costuma estar na posição seguinte
+                posicao += 1
+                if numeros[posicao] != chave:
+                    posicao = self.base.posicao(chave)
+                registro = montados[posicao] or registro_da_posicao(posicao)
+            yield registro
+    
+    def segundos_da_compra(self, chave):
+        """Data da compra do número (já indexado) em segundos, como na coluna do instantâneo."""
+        registro = self.novos.get(chave)
+        if registro is not None:
+            return segundos_da_data(registro.data)
+        return self.base._datas[self.base.posicao(chave)]
+    
+    def datas_em_ordem(self, chaves):
+        """Datas da compra (em segundos) das chaves, em ordem crescente e todas já indexadas."""
+        novos = self.novos
+        if self.base is None:
+            return [segundos_da_data(novos[chave].data) for chave in chaves]
+        if not novos:
+            return self.base._datas
+        
+        numeros = self.base.numeros
+        datas_base = self.base._datas
+        datas = []
+        posicao = -1
+        for chave in chaves:
+            registro = novos.get(chave)
+            if registro is not None:
+                datas.append(segundos_da_data(registro.data))
+                continue
+            posicao += 1
+            if numeros[posicao] != chave:
+                posicao = self.base.posicao(chave)
+            datas.append(datas_base[posicao])
+        return datas
+    
+    def proximo_livre(self, chave):
+        """Primeiro número a partir de chave que não está no índice."""
+        numeros = self.base.numeros if self.base is not None else ()
+        posicao = bisect_left(numeros, chave)
+        while True:
+            while posicao < len(numeros) and numeros[posicao] < chave:
+                posicao += 1
+            no_instantaneo = posicao < len(numeros) and numeros[posicao] == chave
+            if not no_instantaneo and chave not in self.novos:
+                return chave
+            chave += 1
@@ -0,0 +1,294 @@
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+
+# Linhas extras materializadas além das visíveis na tela
+FOLGA = 5
+
+# Registros buscados de cada vez pela ListagemPaginada
+TAMANHO_PAGINA = 500
+
+# Páginas mantidas na memória pela ListagemPaginada (as usadas mais recentemente)
+PAGINAS_EM_MEMORIA = 20
+
+class ListagemPaginada:
+    """Sequência de registros buscada por páginas, conforme a rolagem.
+    
+    Só o total e as páginas usadas mais recentemente ficam na memória. Ao
+    pedir uma fatia, as páginas que faltam para ela (e para meia página antes
+    e depois dela) são pedidas a buscar_pagina(listagem, indice), que deve
+    carregá-las em segundo plano e entregá-las com receber; até lá, as
+    posições delas valem None. Uma página que deixou de ser necessária antes
+    de ser buscada (a rolagem passou por ela) pode ser devolvida com liberar.
+    
+    Registros cadastrados depois da busca entram com inserir, na posição da
+    ordem dada por chave(registro) (decrescente ou não), sem buscar nada.
+    """
+    
+    def __init__(self, total, buscar_pagina, tamanho_pagina=TAMANHO_PAGINA, chave=None,
+                 decrescente=False):
+        self.total = total
+        self.buscar_pagina = buscar_pagina
+        self.tamanho_pagina = tamanho_pagina
+        self.chave = chave
+        self.decrescente = decrescente
+        # Índice da página -> [posição do primeiro registro, registros]. A
+        # posição começa em indice * tamanho_pagina e anda uma casa a cada
+        # registro inserido antes da página
+        self.paginas = OrderedDict()
+        self.pedidas = set()
+        # Páginas da última fatia pedida, com a folga (primeira, última)
+        self.paginas_em_uso = (0, -1)
+    
+    def __len__(self):
+        return self.total
+    
+    def __getitem__(self, fatia):
+        inicio, fim, _ = fatia.indices(self.total)
+        folga = self.tamanho_pagina // 2
+        primeira = max(0, inicio - folga) // self.tamanho_pagina
+        ultima = (min(self.total, fim + folga) - 1) // self.tamanho_pagina
+        self.paginas_em_uso = (primeira, ultima)
+        for indice in range(primeira, ultima + 1):
+            if indice in self.paginas:
+                self.paginas.move_to_end(indice)
+            if indice not in self.pedidas and self._falta(
+                    indice * self.tamanho_pagina, min(self.total, (indice + 1) * self.tamanho_pagina)):
+                self.pedidas.add(indice)
+                self.buscar_pagina(self, indice)
+        
+        linhas = [None] * max(0, fim - inicio)
+        for posicao, registros in self.paginas.values():
+            de, ate = max(inicio, posicao), min(fim, posicao + len(registros))
+            if de < ate:
+                linhas[de - inicio:ate - inicio] = registros[de - posicao:ate - posicao]
+        return linhas
+    
+    def _falta(self, inicio, fim):
+        """Verifica se alguma posição de inicio a fim não está nas páginas carregadas."""
+        trechos = sorted((posicao, posicao + len(registros))
+                         for posicao, registros in self.paginas.values()
+                         if posicao < fim and posicao + len(registros) > inicio)
+        for de, ate in trechos:
+            if de > inicio:
+                return True
+            inicio = max(inicio, ate)
+        return inicio < fim
+    
+    def receber(self, indice, registros):
+        """Guarda uma página buscada, descartando a usada há mais tempo se passar do limite."""
+        self.pedidas.discard(indice)
+        inicio = indice * self.tamanho_pagina
+        fim = inicio + len(registros)
+        
+        # Páginas deslocadas por inserções podem invadir a faixa da recém-buscada,
+        # que prevalece: as carregadas ficam sem posições em comum
+        for outro, pagina in list(self.paginas.items()):
+            posicao, anteriores = pagina
+            if outro == indice or posicao >= fim or posicao + len(anteriores) <= inicio:
+                continue
+            if posicao < inicio:
+                del anteriores[inicio - posicao:]
+            elif posicao + len(anteriores) > fim:
+                pagina[:] = [fim, anteriores[fim - posicao:]]
+            else:
+                del self.paginas[outro]
+        
+        self.paginas[indice] = [inicio, list(registros)]
+        self.paginas.move_to_end(indice)
+        while len(self.paginas) > PAGINAS_EM_MEMORIA:
+            self.paginas.popitem(last=False)
+    
+    def inserir(self, registro):
+        """Conta um registro novo e o coloca nas páginas carregadas, na posição da ordem.
+        
+        A posição é achada por busca binária na página em que o registro cai, e
+        as páginas seguintes andam uma casa. Se ele cai entre páginas não
+        carregadas, só a posição logo antes da página seguinte fica
+        desconhecida (e é buscada de novo se for exibida).
+        
+        Returns:
+            bool: False se o número já estava na página em que cairia (nada muda)
+        """
+        valor = self.chave(registro)
+        if self.decrescente:
+            depois = lambda outro: self.chave(outro) < valor
+        else:
+            depois = lambda outro: self.chave(outro) > valor
+        
+        paginas = sorted((pagina for pagina in self.paginas.values() if pagina[1]),
+                         key=lambda pagina: pagina[0])
+        # Primeira página carregada que termina depois do registro
+        alvo = next((pagina for pagina in paginas if depois(pagina[1][-1])), None)
+        
+        if alvo is None:
+            if paginas and self.chave(paginas[-1][1][-1]) == valor:
+                return False
+            # Depois de todas as carregadas: só entra na página se ela é o fim da listagem
+            if paginas and paginas[-1][0] + len(paginas[-1][1]) == self.total:
+                paginas[-1][1].append(registro)
+            self.total += 1
+            return True
+        
+        posicao, registros = alvo
+        inserido = True
+        if depois(registros[0]):
+            # Antes da página: a posição só é conhecida se ela é a primeira da
+            # listagem ou se a página carregada anterior termina logo antes dela
+            if posicao == 0 or any(p + len(r) == posicao for p, r in paginas):
+                registros.insert(0, registro)
+            else:
+                inserido = False
+        else:
+            inicio, fim = 1, len(registros)
+            while inicio < fim:
+                meio = (inicio + fim) // 2
+                if depois(registros[meio]):
+                    fim = meio
+                else:
+                    inicio = meio + 1
+            if self.chave(registros[inicio - 1]) == valor:
+                return False
+            registros.insert(inicio, registro)
+        
+        # As páginas seguintes andam uma casa, e também a do registro se ele
+        # ficou no trecho não carregado antes dela
+        for pagina in paginas:
+            if pagina[0] > posicao or (pagina is alvo and not inserido):
+                pagina[0] += 1
+        self.total += 1
+        return True
+    
+    def em_uso(self, indice):
+        """Verifica se a página faz parte da última fatia pedida (com a folga)."""
+        primeira, ultima = self.paginas_em_uso
+        return primeira <= indice <= ultima
+    
+    def liberar(self, indice):
+        """Desiste de uma página pedida, que volta a ser pedida se for exibida de novo."""
+        self.pedidas.discard(indice)
+
+class ListaVirtual:
+    """Tabela que cria no Treeview apenas as linhas visíveis na tela.
+    
+    Os dados ficam numa sequência (lista ordenada de registros ou uma
+    ListagemPaginada) e a barra de rolagem é controlada aqui: ao rolar, as
+    mesmas linhas do Treeview apenas recebem novos valores. Assim o custo de
+    exibir e rolar não depende do total de registros. Posições ainda não
+    carregadas (None) aparecem em branco.
+    """
+    
+    def __init__(self, parent, colunas, titulos, larguras):
+        self.colunas = colunas
+        self.dados = []
+        self.inicio = 0
+        
+        self.tree = ttk.Treeview(parent, columns=colunas, show="headings")
+        for coluna in colunas:
+            self.tree.heading(coluna, text=titulos[coluna])
+            self.tree.column(coluna, width=larguras[coluna])
+        
+        # A rolagem vertical percorre os dados, não os itens do Treeview
+        self.scrollbar_y = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.rolar)
+        self.scrollbar_x = ttk.Scrollbar(parent, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.scrollbar_x.set)
+        
+        self.tree.bind("<Configure>", lambda event: self.renderizar())
+        self.tree.bind("<MouseWheel>", self._on_roda_mouse)
+        self.tree.bind("<Button-4>", lambda event: self._rolar_linhas(-3))
+        self.tree.bind("<Button-5>", lambda event: self._rolar_linhas(3))
+        self.tree.bind("<Prior>", lambda event: self._rolar_linhas(-self.linhas_visiveis()))
+        self.tree.bind("<Next>", lambda event: self._rolar_linhas(self.linhas_visiveis()))
+        self.tree.bind("<Home>", lambda event: self._ir_para(0))
+        self.tree.bind("<End>", lambda event: self._ir_para(len(self.dados)))
+        self.tree.bind("<Up>", lambda event: self._mover_selecao(-1))
+        self.tree.bind("<Down>", lambda event: self._mover_selecao(1))
+    
+    def pack(self):
+        """Posiciona a tabela e as barras de rolagem no frame pai."""
+        self.scrollbar_y.pack(side=tk.RIGHT, fill=tk.Y)
+        self.scrollbar_x.pack(side=tk.BOTTOM, fill=tk.X)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    
+    def definir_dados(self, dados):
+        """Troca a sequência exibida, mantendo a posição de rolagem se possível."""
+        self.dados = dados
+        self._ir_para(self.inicio)
+    
+    def linhas_visiveis(self):
+        """Calcula quantas linhas cabem na altura atual do Treeview."""
+        altura_linha = int(ttk.Style().lookup("Treeview", "rowheight") or 25)
+        # Descontar a altura aproximada do cabeçalho
+        return max(1, (self.tree.winfo_height() - altura_linha) // altura_linha)
+    
+    def renderizar(self):
+        """Atualiza os itens do Treeview com a fatia visível dos dados."""
+        visiveis = self.linhas_visiveis()
+        pagina = self.dados[self.inicio:self.inicio + visiveis + FOLGA]
+        itens = self.tree.get_children()
+        
+        # Reaproveitar os itens existentes e criar/remover apenas a diferença
+        for item, registro in zip(itens, pagina):
+            self.tree.item(item, values=self._valores(registro))
+        for registro in pagina[len(itens):]:
+            self.tree.insert("", tk.END, values=self._valores(registro))
+        if len(itens) > len(pagina):
+            self.tree.delete(*itens[len(pagina):])
+        
+        total = len(self.dados)
+        if total:
+            self.scrollbar_y.set(self.inicio / total, min(1.0, (self.inicio + visiveis) / total))
+        else:
+            self.scrollbar_y.set(0.0, 1.0)
+    
+    def _valores(self, registro):
+        if registro is None:
+            return [''] * len(self.colunas)
+        return [registro[coluna] for coluna in self.colunas]
+    
+    def rolar(self, *args):
+        """Trata os comandos da barra de rolagem vertical."""
+        if args[0] == "moveto":
+            self._ir_para(int(float(args[1]) * len(self.dados)))
+        elif args[0] == "scroll":
+            passos = int(args[1])
+            if args[2] == "pages":
+                passos *= self.linhas_visiveis()
+            self._rolar_linhas(passos)
+    
+    def _ir_para(self, inicio):
+        limite = max(0, len(self.dados) - self.linhas_visiveis())
+        self.inicio = min(max(0, inicio), limite)
+        self.renderizar()
+        return "break"
+    
+    def _rolar_linhas(self, passos):
+        return self._ir_para(self.inicio + passos)
+    
+    def _on_roda_mouse(self, event):
+        # No Windows o delta vem em múltiplos de 120; no macOS, em unidades
+        passos = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+        return self._rolar_linhas(passos * 3)
+    
+    def _mover_selecao(self, direcao):
+        """Move a seleção com as setas, rolando quando chega à borda da tela."""
+        itens = self.tree.get_children()
+        if not itens:
+            return "break"
+        
+        atual = self.tree.focus()
+        posicao = itens.index(atual) if atual in itens else -1
+        nova = posicao + direcao
+        ultima_visivel = min(self.linhas_visiveis(), len(itens)) - 1
+        
+        if nova < 0:
+            self._rolar_linhas(-1)
+            nova = 0
+        elif nova > ultima_visivel:
+            self._rolar_linhas(1)
+            nova = ultima_visivel
+        
+        item = self.tree.get_children()[nova]
+        self.tree.focus(item)
+        self.tree.selection_set(item)
+        return "break"
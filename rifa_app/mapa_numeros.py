@@ -0,0 +1,215 @@
+import random
+import re
+
+# Faixa de números da rifa usada quando nenhuma outra é configurada
+FAIXA_PADRAO = (1, 10000)
+
+# Um byte com algum número livre (bit 0)
+BYTE_COM_LIVRE = re.compile(rb'[^\xff]')
+TRECHO_COM_LIVRE = re.compile(rb'[^\xff]+')
+TRECHO_LIVRE = re.compile(rb'\x00+')
+
+# Tentativas de sorteio direto antes de sortear entre os intervalos livres
+TENTATIVAS_SORTEIO = 32
+
+class MapaNumeros:
+    """Mapa de bits dos números vendidos numa faixa (inicio..fim, inclusive).
+    
+    Cada número ocupa um bit (1 = vendido). Os bits que sobram no último byte
+    ficam marcados como vendidos, para nunca aparecerem como livres. As buscas
+    por números livres procuram bytes diferentes de 0xFF com expressões
+    regulares, que percorrem o bytearray sem um laço em Python.
+    """
+    
+    def __init__(self, inicio, fim, bits=None):
+        if fim < inicio:
+            raise ValueError(f"Faixa inválida: {inicio}..{fim}")
+        self.inicio = inicio
+        self.fim = fim
+        self.total = fim - inicio + 1
+        
+        tamanho = (self.total + 7) // 8
+        self.bits = bytearray(bits) if bits is not None else bytearray(tamanho)
+        sobra = tamanho * 8 - self.total
+        if sobra:
+            self.bits[-1] |= (0xFF << (8 - sobra)) & 0xFF
+        self.vendidos = int.from_bytes(self.bits, 'little').bit_count() - sobra
+    
+    def __contains__(self, numero):
+        return self.inicio <= numero <= self.fim
+    
+    def marcar(self, numero):
+        """Marca o número como vendido (números fora da faixa são ignorados)."""
+        if not self.inicio <= numero <= self.fim:
+            return
+        posicao = numero - self.inicio
+        mascara = 1 << (posicao & 7)
+        if not self.bits[posicao >> 3] & mascara:
+            self.bits[posicao >> 3] |= mascara
+            self.vendidos += 1
+    
+    def marcar_varios(self, numeros):
+        """Marca vários números de uma vez (mesmo efeito de marcar, com menos custo)."""
+        bits = self.bits
+        inicio = self.inicio
+        fim = self.fim
+        novos = 0
+        for numero in numeros:
+            if inicio <= numero <= fim:
+                posicao = numero - inicio
+                mascara = 1 << (posicao & 7)
+                if not bits[posicao >> 3] & mascara:
+                    bits[posicao >> 3] |= mascara
+                    novos += 1
+        self.vendidos += novos
+    
+    def vendido(self, numero):
+        if not self.inicio <= numero <= self.fim:
+            return False
+        posicao = numero - self.inicio
+        return bool(self.bits[posicao >> 3] & (1 << (posicao & 7)))
+    
+    @property
+    def livres(self):
+        return self.total - self.vendidos
+    
+    def proximo_livre(self, a_partir=None):
+        """Retorna o primeiro número livre a partir de a_partir, ou None."""
+        posicao = 0 if a_partir is None else max(0, a_partir - self.inicio)
+        if posicao >= self.total:
+            return None
+        
+        # Bits restantes do primeiro byte
+        byte = self.bits[posicao >> 3] | ((1 << (posicao & 7)) - 1)
+        if byte != 0xFF:
+            return self.inicio + (posicao & ~7) + _primeiro_zero(byte)
+        
+        encontrado = BYTE_COM_LIVRE.search(self.bits, (posicao >> 3) + 1)
+        if encontrado is None:
+            return None
+        indice = encontrado.start()
+        return self.inicio + indice * 8 + _primeiro_zero(self.bits[indice])
+    
+    def livre_aleatorio(self, sorteio=random):
+        """Sorteia um número livre, com a mesma chance para todos. Retorna None se não houver."""
+        if not self.livres:
+            return None
+        
+        # Com a rifa pouco vendida, poucas tentativas bastam
+        for _ in range(TENTATIVAS_SORTEIO):
+            numero = sorteio.randint(self.inicio, self.fim)
+            if not self.vendido(numero):
+                return numero
+        
+        escolhido = sorteio.randrange(self.livres)
+        for primeiro, ultimo in self.intervalos_livres():
+            if escolhido <= ultimo - primeiro:
+                return primeiro + escolhido
+            escolhido -= ultimo - primeiro + 1
+    
+    def intervalos_livres(self, limite=None, primeiro=None, ultimo=None):
+        """Lista os números livres como intervalos [(primeiro, último), ...].
+        
+        Com primeiro/ultimo, só o trecho entre eles (inclusive) é examinado.
+        Trechos de bytes totalmente livres são tratados de uma vez; só os
+        bytes parcialmente vendidos são examinados bit a bit.
+        """
+        primeiro = self.inicio if primeiro is None else max(primeiro, self.inicio)
+        ultimo = self.fim if ultimo is None else min(ultimo, self.fim)
+        if primeiro > ultimo:
+            return []
+        
+        posicao_inicial = primeiro - self.inicio
+        posicao_final = ultimo - self.inicio
+        if posicao_inicial == 0 and posicao_final == self.total - 1:
+            bits = self.bits
+        else:
+            # Cópia só dos bytes do trecho, com os bits de fora marcados como vendidos
+            bits = bytearray(self.bits[posicao_inicial >> 3:(posicao_final >> 3) + 1])
+            bits[0] |= (1 << (posicao_inicial & 7)) - 1
+            bits[-1] |= (0xFF << ((posicao_final & 7) + 1)) & 0xFF
+        base = self.inicio + (posicao_inicial & ~7)
+        
+        intervalos = []
+        atual = None
+        
+        def acrescentar(primeiro, ultimo):
+            nonlocal atual
+            if atual is not None and atual[1] + 1 == primeiro:
+                atual[1] = ultimo
+                return
+            if atual is not None:
+                intervalos.append(tuple(atual))
+            atual = [primeiro, ultimo]
+        
+        for trecho in TRECHO_COM_LIVRE.finditer(bits):
+            if limite is not None and len(intervalos) >= limite:
+                break
+            indice = trecho.start()
+            while indice < trecho.end():
+                livres = TRECHO_LIVRE.match(bits, indice, trecho.end())
+                if livres:
+                    acrescentar(base + indice * 8, min(ultimo, base + livres.end() * 8 - 1))
+                    indice = livres.end()
+                    continue
+                
+                byte = bits[indice]
+                for bit in range(8):
+                    if not byte & (1 << bit):
+                        numero = base + indice * 8 + bit
+                        acrescentar(numero, numero)
+                indice += 1
+        
+        if atual is not None:
+            intervalos.append(tuple(atual))
+        return intervalos if limite is None else intervalos[:limite]
+    
+    def proximos_livres(self, quantidade, a_partir=None):
+        """Retorna os próximos números livres (até quantidade) como uma lista de range."""
+        resultado = []
+        for primeiro, ultimo in self.intervalos_livres(quantidade, a_partir):
+            if quantidade <= 0:
+                break
+            resultado.append(range(primeiro, min(ultimo, primeiro + quantidade - 1) + 1))
+            quantidade -= len(resultado[-1])
+        return resultado
+    
+    def separar(self, numeros):
+        """Separa os números de um range (passo positivo) em livres e vendidos.
+        
+        A consulta é feita pelos intervalos livres do trecho, sem testar
+        número por número. Números fora da faixa do mapa ficam com os livres,
+        já que o mapa não sabe nada sobre eles.
+        
+        Returns:
+            tuple: (livres, vendidos), cada um uma lista de range
+        """
+        if not numeros:
+            return [], []
+        primeiro, ultimo, passo = numeros[0], numeros[-1], numeros.step
+        
+        def trecho(a, b):
+            # Números da progressão entre a e b (inclusive)
+            return range(a + (primeiro - a) % passo, b + 1, passo)
+        
+        livres = []
+        vendidos = []
+        if primeiro < self.inicio:
+            livres.append(trecho(primeiro, min(ultimo, self.inicio - 1)))
+        
+        proximo = max(primeiro, self.inicio)
+        for a, b in self.intervalos_livres(primeiro=primeiro, ultimo=ultimo):
+            if a > proximo:
+                vendidos.append(trecho(proximo, a - 1))
+            livres.append(trecho(a, b))
+            proximo = b + 1
+        if proximo <= min(ultimo, self.fim):
+            vendidos.append(trecho(proximo, min(ultimo, self.fim)))
+        
+        if ultimo > self.fim:
+            livres.append(trecho(max(primeiro, self.fim + 1), ultimo))
+        return [r for r in livres if r], [r for r in vendidos if r]
+
+def _primeiro_zero(byte):
+    """Posição do bit 0 menos significativo do byte."""
+    return ((~byte & (byte + 1)) & 0xFF).bit_length() - 1
@@ -0,0 +1,129 @@
+"""Medição do tempo das operações e contadores de trabalho (linhas lidas, bytes, cache, trava).
+
+A coleta começa desativada. Pode ser ativada no programa (metricas.ativar())
+ou pelo ambiente, o que vale para a GUI, a linha de comando e o servidor:
+
+    RIFAS_METRICAS=1              ativa a coleta desde o início
+    RIFAS_METRICAS_INTERVALO=60   ativa e escreve um resumo a cada 60 s (stderr)
+
+Desativada, cada operação medida custa só a verificação de um atributo, e
+cada contador, uma chamada de função que retorna em seguida.
+"""
+import functools
+import os
+import sys
+import threading
+import time
+
+class Metricas:
+    """Tempos por operação e contadores acumulados desde o início (ou desde zerar())."""
+    
+    def __init__(self):
+        self.ativas = False
+        self._lock = threading.Lock()
+        self._operacoes = {}
+        self._contadores = {}
+        self._inicio = time.time()
+    
+    def ativar(self):
+        self.ativas = True
+    
+    def desativar(self):
+        self.ativas = False
+    
+    def zerar(self):
+        with self._lock:
+            self._operacoes = {}
+            self._contadores = {}
+            self._inicio = time.time()
+    
+    def registrar_tempo(self, nome, duracao):
+        """Soma uma execução de duracao segundos à operação nome."""
+        with self._lock:
+            operacao = self._operacoes.get(nome)
+            if operacao is None:
+                self._operacoes[nome] = [1, duracao, duracao]
+            else:
+                operacao[0] += 1
+                operacao[1] += duracao
+                if duracao > operacao[2]:
+                    operacao[2] = duracao
+    
+    def contar(self, nome, quantidade=1):
+        with self._lock:
+            self._contadores[nome] = self._contadores.get(nome, 0) + quantidade
+    
+    def stats(self):
+        """Retorna um retrato das métricas.
+        
+        Returns:
+            dict: {'ativas', 'segundos', 'operacoes': {nome: {'chamadas', 'total_ms',
+            'media_ms', 'maior_ms'}}, 'contadores': {nome: valor}}
+        """
+        with self._lock:
+            operacoes = {
+                nome: {
+                    'chamadas': chamadas,
+                    'total_ms': round(total * 1000, 3),
+                    'media_ms': round(total * 1000 / chamadas, 3),
+                    'maior_ms': round(maior * 1000, 3),
+                }
+                for nome, (chamadas, total, maior) in sorted(self._operacoes.items())
+            }
+            return {
+                'ativas': self.ativas,
+                'segundos': round(time.time() - self._inicio, 1),
+                'operacoes': operacoes,
+                'contadores': dict(sorted(self._contadores.items())),
+            }
+    
+    def resumo(self):
+        """Uma linha com as operações que mais tomaram tempo e os contadores."""
+        estado = self.stats()
+        operacoes = sorted(estado['operacoes'].items(), key=lambda item: -item[1]['total_ms'])
+        partes = [f"{nome} {valores['chamadas']}x {valores['total_ms']:.0f}ms"
+                  for nome, valores in operacoes[:5]]
+        partes += [f"{nome}={valor}" for nome, valor in estado['contadores'].items()]
+        return f"[métricas {estado['segundos']:.0f}s] " + (", ".join(partes) or "sem atividade")
+
+metricas = Metricas()
+
+def contar(nome, quantidade=1):
+    """Soma quantidade ao contador nome, se a coleta estiver ativa."""
+    if metricas.ativas:
+        metricas.contar(nome, quantidade)
+
+def medido(funcao):
+    """Decorador que soma o tempo de cada chamada à operação com o nome da função."""
+    nome = funcao.__qualname__
+    
+    @functools.wraps(funcao)
+    def envoltorio(*args, **kwargs):
+        if not metricas.ativas:
+            return funcao(*args, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            metricas.registrar_tempo(nome, time.perf_counter() - inicio)
+    return envoltorio
+
+def iniciar_registro_periodico(intervalo, saida=None):
+    """Escreve metricas.resumo() a cada intervalo segundos, numa thread em segundo plano.
+    
+    Returns:
+        threading.Event: ative-o para parar o registro
+    """
+    parar = threading.Event()
+    
+    def registrar():
+        while not parar.wait(intervalo):
+            print(metricas.resumo(), file=saida or sys.stderr, flush=True)
+    
+    threading.Thread(target=registrar, daemon=True, name="metricas").start()
+    return parar
+
+if os.environ.get('RIFAS_METRICAS') == '1' or os.environ.get('RIFAS_METRICAS_INTERVALO'):
+    metricas.ativar()
+    if os.environ.get('RIFAS_METRICAS_INTERVALO'):
+        iniciar_registro_periodico(float(os.environ['RIFAS_METRICAS_INTERVALO']))
@@ -0,0 +1,199 @@
+"""Registro compacto de um comprador, usado no lugar de um dicionário por linha.
+
+Os campos ficam convertidos (numero como int, data como datetime) em
+atributos, e o acesso como dicionário continua devolvendo os textos do CSV:
+
+    registro.numero       -> 42
+    registro.data         -> datetime(2024, 5, 1, 10, 30)
+    registro['numero']    -> '42'
+    registro['data_compra'] -> '01/05/2024 10:30'
+    dict(registro)        -> {'numero': '42', 'nome': ..., 'telefone': ..., 'data_compra': ...}
+"""
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+CAMPOS = ['numero', 'nome', 'telefone', 'data_compra']
+CONJUNTO_CAMPOS = frozenset(CAMPOS)
+
+# Maior número aceito pelo SQLite; limita os intervalos das buscas e exportações
+MAIOR_NUMERO = 2 ** 63 - 1
+
+# Visão das chaves dos registros, que se comporta como a de um dicionário
+CHAVES = dict.fromkeys(CAMPOS).keys()
+
+FORMATO_DIA = re.compile(r'(\d\d)/(\d\d)/(\d{4})', re.ASCII)
+
+# "hh:mm" -> tempo desde a meia-noite
+HORARIOS = {f"{hora:02d}:{minuto:02d}": timedelta(hours=hora, minutes=minuto)
+            for hora in range(24) for minuto in range(60)}
+
+def normalizar_numero(numero):
+    """Converte o número da rifa para inteiro. Retorna None se for inválido."""
+    texto = str(numero).strip()
+    if not texto or not texto.isascii() or not texto.isdigit():
+        return None
+    return int(texto)
+
+def interpretar_data(texto):
+    """Converte "dd/mm/aaaa hh:mm" em datetime. Retorna None se o texto estiver noutro formato."""
+    if len(texto) != 16 or texto[10] != ' ':
+        return None
+    horario = HORARIOS.get(texto[11:])
+    if horario is None:
+        return None
+    dia = _interpretar_dia(texto[:10])
+    return None if dia is None else dia + horario
+
+@lru_cache(maxsize=4096)
+def _interpretar_dia(texto):
+    encontrado = FORMATO_DIA.fullmatch(texto)
+    if encontrado is None:
+        return None
+    dia, mes, ano = map(int, encontrado.groups())
+    try:
+        return datetime(ano, mes, dia)
+    except ValueError:
+        return None
+
+def formatar_data(data):
+    return f"{data.day:02d}/{data.month:02d}/{data.year:04d} {data.hour:02d}:{data.minute:02d}"
+
+class RegistroBase:
+    """Acesso como dicionário (somente leitura) aos textos de um registro.
+    
+    As subclasses definem os atributos numero, nome, telefone e data.
+    """
+    
+    __slots__ = ()
+    
+    def textos_originais(self):
+        """Textos da linha do CSV quando os campos não os reproduzem (ex: número "007"), senão None."""
+        return None
+    
+    def texto_data(self):
+        return '' if self.data is None else formatar_data(self.data)
+    
+    def linha_csv(self):
+        """Textos das colunas de CAMPOS, na ordem do CSV ('' para as que faltarem)."""
+        originais = self.textos_originais()
+        if originais is not None:
+            return [originais.get(campo, '') for campo in CAMPOS]
+        return [str(self.numero), self.nome, self.telefone, self.texto_data()]
+    
+    def __getitem__(self, campo):
+        originais = self.textos_originais()
+        if originais is not None:
+            return originais[campo]
+        if campo == 'numero':
+            return str(self.numero)
+        if campo == 'nome':
+            return self.nome
+        if campo == 'telefone':
+            return self.telefone
+        if campo == 'data_compra':
+            return self.texto_data()
+        raise KeyError(campo)
+    
+    def get(self, campo, padrao=None):
+        try:
+            return self[campo]
+        except KeyError:
+            return padrao
+    
+    def keys(self):
+        originais = self.textos_originais()
+        return CHAVES if originais is None else originais.keys()
+    
+    def __iter__(self):
+        return iter(self.keys())
+    
+    def __len__(self):
+        return len(self.keys())
+    
+    def __contains__(self, campo):
+        return campo in self.keys()
+    
+    def values(self):
+        return [self[campo] for campo in self.keys()]
+    
+    def items(self):
+        return [(campo, self[campo]) for campo in self.keys()]
+    
+    def para_dicionario(self):
+        return {campo: self[campo] for campo in self.keys()}
+    
+    def __eq__(self, outro):
+        if isinstance(outro, (RegistroBase, dict)):
+            return self.para_dicionario() == dict(outro)
+        return NotImplemented
+    
+    __hash__ = None
+    
+    def __repr__(self):
+        return f"{type(self).__name__}({self.para_dicionario()!r})"
+
+class Registro(RegistroBase):
+    """Registro com os valores guardados no próprio objeto."""
+    
+    __slots__ = ('numero', 'nome', 'telefone', 'data', '_originais')
+    
+    def __init__(self, numero, nome='', telefone='', data=None, originais=None):
+        self.numero = numero
+        self.nome = nome
+        self.telefone = telefone
+        self.data = data
+        self._originais = originais
+    
+    @classmethod
+    def de_linha(cls, numero, nome, telefone, data_compra):
+        """Cria o registro com o número já normalizado (int) e a data em texto."""
+        data = interpretar_data(data_compra) if data_compra else None
+        originais = None
+        if data is None and data_compra:
+            originais = {'numero': str(numero), 'nome': nome, 'telefone': telefone,
+                         'data_compra': data_compra}
+        return cls(numero, nome, telefone, data, originais)
+    
+    @classmethod
+    def de_textos(cls, numero, nome, telefone, data_compra):
+        """Cria o registro a partir dos textos das quatro colunas, na ordem de CAMPOS.
+        
+        Returns:
+            Registro: ou None se o número for inválido
+        """
+        chave = normalizar_numero(numero)
+        if chave is None:
+            return None
+        data = interpretar_data(data_compra) if data_compra else None
+        registro = cls(chave, nome, telefone, data)
+        if numero != str(chave) or data is None and data_compra:
+            registro._originais = {'numero': numero, 'nome': nome, 'telefone': telefone,
+                                   'data_compra': data_compra}
+        return registro
+    
+    @classmethod
+    def de_dicionario(cls, campos):
+        """Cria o registro a partir de uma linha do CSV (campo -> texto).
+        
+        Returns:
+            Registro: ou None se o número for inválido
+        """
+        texto_numero = campos.get('numero') or ''
+        numero = normalizar_numero(texto_numero)
+        if numero is None:
+            return None
+        
+        texto_data = campos.get('data_compra') or ''
+        data = interpretar_data(texto_data) if texto_data else None
+        registro = cls(numero, campos.get('nome') or '', campos.get('telefone') or '', data)
+        
+        # Linhas com outras colunas ou textos que não seriam refeitos iguais
+        # guardam os textos originais, para exportar e listar sem alterações
+        if (len(campos) != len(CAMPOS) or texto_numero != str(numero)
+                or data is None and texto_data or campos.keys() != CONJUNTO_CAMPOS):
+            registro._originais = dict(campos)
+        return registro
+    
+    def textos_originais(self):
+        return self._originais
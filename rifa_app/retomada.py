@@ -0,0 +1,68 @@
+"""Pontos de controle das importações retomáveis (merge_csv_files com retomar=True).
+
+Ao lado do arquivo de destino fica um arquivo JSON (ex: rifas.csv.importacoes)
+com o andamento de cada origem, pelo caminho absoluto:
+
+    {"/vendas/loja1.csv": {"assinatura": "52311:1718030000000000000",
+                           "posicao": 40960, "linhas": 800, "concluida": false}}
+
+posicao é o byte da origem logo após a última linha já gravada no destino e
+linhas é quantas linhas da origem foram lidas até ali. A assinatura (tamanho
+e data de modificação) identifica o conteúdo da origem: se ela mudar, o ponto
+de controle é descartado e a origem é lida desde o início, o que não duplica
+nada, porque números já gravados no destino são ignorados como repetidos.
+"""
+import json
+import os
+
+# Extensão do arquivo de pontos de controle, gravado ao lado do destino
+EXTENSAO_PONTOS = '.importacoes'
+
+def caminho_pontos(arquivo_destino):
+    return arquivo_destino + EXTENSAO_PONTOS
+
+def assinatura_do_arquivo(caminho):
+    """Tamanho e data de modificação (ns) do arquivo, como texto."""
+    info = os.stat(caminho)
+    return f"{info.st_size}:{info.st_mtime_ns}"
+
+class PontosDeControle:
+    """Andamento das importações de um arquivo de destino."""
+    
+    def __init__(self, arquivo_destino):
+        self.caminho = caminho_pontos(arquivo_destino)
+        self.origens = self._carregar()
+    
+    def _carregar(self):
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as arquivo:
+                origens = json.load(arquivo)
+        except (OSError, ValueError):
+            # Sem pontos de controle (ou ilegíveis): tudo é lido desde o início
+            return {}
+        return origens if isinstance(origens, dict) else {}
+    
+    def obter(self, origem, assinatura):
+        """Ponto de controle da origem, ou None se não houver ou a origem tiver mudado."""
+        ponto = self.origens.get(os.path.abspath(origem))
+        if not isinstance(ponto, dict) or ponto.get('assinatura') != assinatura:
+            return None
+        return ponto
+    
+    def registrar(self, origem, assinatura, posicao, linhas, concluida=False):
+        """Grava o andamento da origem; chamado depois de as linhas estarem no destino."""
+        self.origens[os.path.abspath(origem)] = {
+            'assinatura': assinatura,
+            'posicao': posicao,
+            'linhas': linhas,
+            'concluida': concluida
+        }
+        
+        # Arquivo temporário e troca atômica: uma queda no meio da gravação
+        # mantém o ponto de controle anterior
+        temporario = self.caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(self.origens, arquivo, ensure_ascii=False, indent=1)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self.caminho)
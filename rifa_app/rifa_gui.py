@@ -1,8 +1,14 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
+import sys
+from bisect import bisect_left
+from datetime import datetime, timedelta
 from rifa_manager import RifaManager
-from csv_merger import merge_csv_files
+from armazenamento import ErroServidor, chave_da_ordem, normalizar_nome, normalizar_numero
+from lista_virtual import TAMANHO_PAGINA, ListaVirtual, ListagemPaginada
+from metricas import metricas
+from tarefas import ExecutorTarefas, TarefaCancelada
 
 # Cores do tema
 CORES = {
@@ -17,15 +23,82 @@ CORES = {
     "branco": "#FFFFFF"          # Branco
 }
 
+# Quantidade máxima de números listados no resultado da importação
+LIMITE_NUMEROS_EXIBIDOS = 1000
+
+# Ordens da aba de listagem: texto exibido -> ordem do RifaManager
+ORDENS_LISTAGEM = {"Número": 'numero', "Nome": 'nome', "Data da compra": 'data'}
+
+# Formatos da aba Exportar: texto exibido -> (formato do RifaManager, extensão)
+FORMATOS_EXPORTACAO = {
+    "CSV": ('csv', '.csv'),
+    "CSV compactado (gzip)": ('csv.gz', '.csv.gz'),
+    "JSON Lines": ('jsonl', '.jsonl'),
+    "Excel (XLSX)": ('xlsx', '.xlsx'),
+}
+
+# Modos de conflito da aba Importar: texto exibido -> modo_conflito do RifaManager.importar_csv
+MODOS_CONFLITO = {
+    "Manter o registro existente": 'manter_existente',
+    "Ficar com a compra mais recente": 'mais_recente',
+    "Separar num arquivo de conflitos": 'separar',
+}
+
+# Conflitos exibidos no resultado da importação (o relatório completo fica no arquivo)
+LIMITE_CONFLITOS_EXIBIDOS = 100
+
+# Espera (ms) após a última tecla antes de fazer a busca ao digitar
+ATRASO_BUSCA_AO_DIGITAR = 150
+
+# Quantidade de resultados exibidos por página na aba de busca
+TAMANHO_PAGINA_BUSCA = 50
+
+# Máximo de resultados contados e paginados na busca ao digitar
+LIMITE_RESULTADOS_BUSCA = 1000
+
+# Grade da aba Mapa: colunas x linhas de números exibidos por página
+COLUNAS_MAPA = 25
+LINHAS_MAPA = 20
+
+# Intervalo (ms) entre as atualizações da aba Diagnóstico enquanto ela está aberta
+INTERVALO_DIAGNOSTICO = 2000
+
+# Quantidade de intervalos livres listados na aba Mapa
+LIMITE_INTERVALOS_EXIBIDOS = 50
+
 class RifaGUI:
-    def __init__(self, root):
+    def __init__(self, root, arquivo_dados='rifas.csv'):
         self.root = root
         self.root.title("Sistema de Gerenciamento de Rifas")
         self.root.geometry("900x650")
         self.root.minsize(800, 600)
         self.root.configure(background=CORES["background"])
         
-        self.rifa_manager = RifaManager()
+        # Arquivo CSV, banco .db ou endereço de um servidor de rifas (http://...)
+        self.rifa_manager = RifaManager(arquivo_dados)
+        if arquivo_dados.lower().startswith('http://'):
+            self.root.title(f"Sistema de Gerenciamento de Rifas - Servidor {arquivo_dados}")
+        
+        # Listagem exibida (buscada por páginas) e a última busca, atualizada a cada cadastro
+        self.compradores = ListagemPaginada(0, None)
+        self.busca_atual = None
+        
+        # Mapa de números vendidos exibido e primeiro número da página da grade
+        self.mapa = None
+        self.inicio_pagina_mapa = None
+        
+        # Busca ao digitar: agendamento pendente, geração da consulta mais
+        # recente e a página exibida (tipo, texto, offset, total)
+        self.busca_agendada = None
+        self.geracao_busca = 0
+        self.pagina_busca = None
+        
+        # Resultados exibidos: número -> item da árvore e os números em ordem
+        self.itens_busca = {}
+        self.numeros_busca = []
+        
+        # Próxima atualização automática da aba Diagnóstico
+        self.diagnostico_agendado = None
         
         # Configuração do estilo
         self.configurar_estilo()
@@ -40,6 +113,14 @@ class RifaGUI:
         # Barra de status na parte inferior - Movida para antes da criação das abas
         self.criar_barra_status()
         
+        # Todo acesso ao RifaManager roda numa thread de trabalho; os eventos do
+        # manager chegam nessa thread e são repassados para a thread da interface
+        self.tarefas = ExecutorTarefas(self.root, ao_atualizar_progresso=self.atualizar_progresso)
+        self.rifa_manager.inscrever(
+            lambda evento, registros: self.tarefas.na_thread_principal(
+                self.on_compradores_alterados, evento, registros))
+        self.root.protocol("WM_DELETE_WINDOW", self.fechar)
+        
         # Notebook para as diferentes funcionalidades
         self.notebook = ttk.Notebook(self.main_frame)
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -48,21 +129,27 @@ class RifaGUI:
         self.cadastro_frame = ttk.Frame(self.notebook, padding="10", style="Tab.TFrame")
         self.listagem_frame = ttk.Frame(self.notebook, padding="10", style="Tab.TFrame")
         self.busca_frame = ttk.Frame(self.notebook, padding="10", style="Tab.TFrame")
+        self.mapa_frame = ttk.Frame(self.notebook, padding="10", style="Tab.TFrame")
         self.exportar_frame = ttk.Frame(self.notebook, padding="10", style="Tab.TFrame")
         self.importar_frame = ttk.Frame(self.notebook, padding="10", style="Tab.TFrame")
+        self.diagnostico_frame = ttk.Frame(self.notebook, padding="10", style="Tab.TFrame")
         
         self.notebook.add(self.cadastro_frame, text=" Cadastro ")
         self.notebook.add(self.listagem_frame, text=" Listar Compradores ")
         self.notebook.add(self.busca_frame, text=" Buscar ")
+        self.notebook.add(self.mapa_frame, text=" Mapa de Números ")
         self.notebook.add(self.exportar_frame, text=" Exportar ")
         self.notebook.add(self.importar_frame, text=" Importar CSV ")
+        self.notebook.add(self.diagnostico_frame, text=" Diagnóstico ")
         
         # Configuração das abas
         self.setup_cadastro_tab()
         self.setup_listagem_tab()
         self.setup_busca_tab()
+        self.setup_mapa_tab()
         self.setup_exportar_tab()
         self.setup_importar_tab()
+        self.setup_diagnostico_tab()
         
         # Vincular eventos
         self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
@@ -130,6 +217,11 @@ class RifaGUI:
         self.status_frame = ttk.Frame(self.root, style="Header.TFrame")
         self.status_frame.pack(fill=tk.X, side=tk.BOTTOM)
         
+        # Indicador de progresso e botão de cancelar, visíveis durante as tarefas
+        self.cancelar_button = ttk.Button(self.status_frame, text="Cancelar",
+                                          command=lambda: self.tarefas.cancelar_todas())
+        self.progresso_bar = ttk.Progressbar(self.status_frame, length=160, mode="determinate")
+        
         self.status_label = ttk.Label(self.status_frame, 
                                      text="Pronto", 
                                      style="Status.TLabel")
@@ -139,6 +231,41 @@ class RifaGUI:
         """Atualiza a mensagem na barra de status"""
         self.status_label.config(text=mensagem)
     
+    def atualizar_progresso(self, tarefa):
+        """Mostra o progresso da tarefa em segundo plano na barra de status"""
+        self._mostrar_progresso_exportacao(tarefa)
+        if tarefa is None:
+            self.progresso_bar.stop()
+            self.progresso_bar.pack_forget()
+            self.cancelar_button.pack_forget()
+            return
+        
+        if not self.progresso_bar.winfo_ismapped():
+            self.status_label.pack_forget()
+            if tarefa.cancelavel:
+                self.cancelar_button.pack(side=tk.RIGHT, padx=5, pady=2)
+            self.progresso_bar.pack(side=tk.RIGHT, padx=5, pady=2)
+            self.status_label.pack(fill=tk.X)
+        
+        if tarefa.total:
+            self.progresso_bar.stop()
+            self.progresso_bar.config(mode="determinate", maximum=tarefa.total, value=tarefa.feito)
+            self.atualizar_status(f"{tarefa.descricao} ({tarefa.feito} de {tarefa.total})")
+        else:
+            if str(self.progresso_bar.cget("mode")) != "indeterminate":
+                self.progresso_bar.config(mode="indeterminate")
+                self.progresso_bar.start(15)
+            detalhe = f" ({tarefa.feito} linhas)" if tarefa.feito else ""
+            self.atualizar_status(f"{tarefa.descricao}...{detalhe}")
+    
+    def fechar(self):
+        """Espera as gravações pendentes terminarem antes de fechar a janela"""
+        self.atualizar_status("Finalizando...")
+        self.root.update_idletasks()
+        self.tarefas.encerrar()
+        self.rifa_manager.fechar()
+        self.root.destroy()
+    
     def on_tab_changed(self, event):
         """Função chamada quando a aba é alterada"""
         tab_id = self.notebook.select()
@@ -148,6 +275,10 @@ class RifaGUI:
         # Se a aba de listagem for selecionada, atualizar a lista
         if "Listar" in tab_name:
             self.atualizar_listagem()
+        elif "Mapa" in tab_name:
+            self.atualizar_mapa()
+        elif "Diagnóstico" in tab_name:
+            self.atualizar_diagnostico()
     
     def setup_cadastro_tab(self):
         # Título da aba
@@ -163,7 +294,7 @@ class RifaGUI:
         self.cadastro_frame_inner.columnconfigure(1, weight=3)
         
         # Campos para cadastro
-        ttk.Label(self.cadastro_frame_inner, text="Números (separados por vírgula):").grid(
+        ttk.Label(self.cadastro_frame_inner, text="Números (ex: 10, 11 ou 1-500):").grid(
             row=0, column=0, sticky=tk.W, pady=10, padx=5)
         self.numeros_entry = ttk.Entry(self.cadastro_frame_inner, width=40, font=("Arial", 11))
         self.numeros_entry.grid(row=0, column=1, sticky=tk.W+tk.E, pady=10, padx=5)
@@ -195,6 +326,8 @@ class RifaGUI:
         
         info_text = "• Para cadastrar um único número, insira apenas um número no campo acima.\n"
         info_text += "• Para cadastrar múltiplos números, separe-os por vírgula (ex: 10, 11, 12, 13)\n"
+        info_text += "• Talões inteiros podem ser informados como intervalo (ex: 1-500 ou 1000-1999 passo 10)\n"
+        info_text += "• Para pegar os primeiros números livres da faixa, use \"próximos 50 livres\"\n"
         info_text += "• Todos os campos são obrigatórios."
         
         info_label = ttk.Label(info_frame, text=info_text, wraplength=600, justify="left")
@@ -220,6 +353,17 @@ class RifaGUI:
         ttk.Button(controles_frame, text="Atualizar Listagem", 
                   command=self.atualizar_listagem).pack(side=tk.LEFT, padx=5)
         
+        # Ordem da listagem, servida pelos índices do armazenamento
+        ttk.Label(controles_frame, text="Ordenar por:").pack(side=tk.LEFT, padx=(15, 5))
+        self.ordem_listagem = tk.StringVar(value="Número")
+        ordem_combo = ttk.Combobox(controles_frame, textvariable=self.ordem_listagem,
+                                   values=list(ORDENS_LISTAGEM), state="readonly", width=15)
+        ordem_combo.pack(side=tk.LEFT)
+        ordem_combo.bind("<<ComboboxSelected>>", lambda event: self.atualizar_listagem())
+        self.listagem_decrescente = tk.BooleanVar(value=False)
+        ttk.Checkbutton(controles_frame, text="Decrescente", variable=self.listagem_decrescente,
+                        command=self.atualizar_listagem).pack(side=tk.LEFT, padx=5)
+        
         # Contador de registros
         self.contador_label = ttk.Label(controles_frame, text="Total: 0 registros")
         self.contador_label.pack(side=tk.RIGHT, padx=5)
@@ -228,30 +372,15 @@ class RifaGUI:
         tabela_frame = ttk.Frame(self.listagem_frame, style="Card.TFrame")
         tabela_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
-        # Treeview para exibir os compradores
+        # Tabela virtual: apenas as linhas visíveis são criadas no Treeview
         columns = ("numero", "nome", "telefone", "data_compra")
-        self.tree = ttk.Treeview(tabela_frame, columns=columns, show="headings")
-        
-        # Configurando as colunas
-        self.tree.heading("numero", text="Número")
-        self.tree.heading("nome", text="Nome")
-        self.tree.heading("telefone", text="Telefone")
-        self.tree.heading("data_compra", text="Data da Compra")
-        
-        self.tree.column("numero", width=100)
-        self.tree.column("nome", width=250)
-        self.tree.column("telefone", width=150)
-        self.tree.column("data_compra", width=180)
-        
-        # Adicionando scrollbars
-        scrollbar_y = ttk.Scrollbar(tabela_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        scrollbar_x = ttk.Scrollbar(tabela_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
-        self.tree.configure(yscroll=scrollbar_y.set, xscroll=scrollbar_x.set)
-        
-        # Posicionando os componentes
-        scrollbar_y.pack(side=tk.RIGHT, fill=tk.Y)
-        scrollbar_x.pack(side=tk.BOTTOM, fill=tk.X)
-        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.lista_compradores = ListaVirtual(
+            tabela_frame, columns,
+            titulos={"numero": "Número", "nome": "Nome", "telefone": "Telefone",
+                     "data_compra": "Data da Compra"},
+            larguras={"numero": 100, "nome": 250, "telefone": 150, "data_compra": 180})
+        self.tree = self.lista_compradores.tree
+        self.lista_compradores.pack()
         
         # Iniciar com a listagem atualizada
         self.atualizar_listagem()
@@ -282,6 +411,7 @@ class RifaGUI:
             row=0, column=0, sticky=tk.W, pady=10)
         self.busca_numero_entry = ttk.Entry(self.busca_numero_frame, width=15, font=("Arial", 11))
         self.busca_numero_entry.grid(row=0, column=1, sticky=tk.W, pady=10, padx=5)
+        self.busca_numero_entry.bind("<KeyRelease>", lambda event: self.agendar_busca('numero'))
         
         # Frame para botões
         botoes_numero_frame = ttk.Frame(self.busca_numero_frame)
@@ -291,7 +421,7 @@ class RifaGUI:
                   command=self.buscar_por_numero, width=15).pack(side=tk.LEFT, padx=5)
         
         ttk.Button(botoes_numero_frame, text="Limpar", 
-                  command=lambda: self.busca_numero_entry.delete(0, tk.END)).pack(side=tk.LEFT, padx=5)
+                  command=lambda: self.limpar_busca(self.busca_numero_entry)).pack(side=tk.LEFT, padx=5)
         
         # Frame para busca por nome
         self.busca_nome_frame = ttk.Frame(busca_notebook, padding=15, style="Card.TFrame")
@@ -306,6 +436,7 @@ class RifaGUI:
             row=0, column=0, sticky=tk.W, pady=10)
         self.busca_nome_entry = ttk.Entry(self.busca_nome_frame, width=30, font=("Arial", 11))
         self.busca_nome_entry.grid(row=0, column=1, sticky=tk.W+tk.E, pady=10, padx=5)
+        self.busca_nome_entry.bind("<KeyRelease>", lambda event: self.agendar_busca('nome'))
         
         # Frame para botões
         botoes_nome_frame = ttk.Frame(self.busca_nome_frame)
@@ -315,7 +446,7 @@ class RifaGUI:
                   command=self.buscar_por_nome, width=15).pack(side=tk.LEFT, padx=5)
         
         ttk.Button(botoes_nome_frame, text="Limpar", 
-                  command=lambda: self.busca_nome_entry.delete(0, tk.END)).pack(side=tk.LEFT, padx=5)
+                  command=lambda: self.limpar_busca(self.busca_nome_entry)).pack(side=tk.LEFT, padx=5)
         
         # Frame para resultados
         resultado_label_frame = ttk.Frame(self.busca_frame)
@@ -327,6 +458,21 @@ class RifaGUI:
         self.resultado_contador = ttk.Label(resultado_label_frame, text="")
         self.resultado_contador.pack(side=tk.RIGHT)
         
+        # Navegação entre as páginas de resultados da busca ao digitar
+        paginacao_frame = ttk.Frame(self.busca_frame)
+        paginacao_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=20, pady=(0, 5))
+        
+        self.proxima_pagina_button = ttk.Button(paginacao_frame, text="Próxima >", state=tk.DISABLED,
+                                                command=lambda: self.mudar_pagina_busca(1))
+        self.proxima_pagina_button.pack(side=tk.RIGHT, padx=5)
+        
+        self.pagina_label = ttk.Label(paginacao_frame, text="")
+        self.pagina_label.pack(side=tk.RIGHT, padx=5)
+        
+        self.anterior_pagina_button = ttk.Button(paginacao_frame, text="< Anterior", state=tk.DISABLED,
+                                                 command=lambda: self.mudar_pagina_busca(-1))
+        self.anterior_pagina_button.pack(side=tk.RIGHT, padx=5)
+        
         # Frame para a tabela de resultados
         resultados_frame = ttk.Frame(self.busca_frame, style="Card.TFrame")
         resultados_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=5)
@@ -358,6 +504,154 @@ class RifaGUI:
         scrollbar_x.pack(side=tk.BOTTOM, fill=tk.X)
         self.resultados_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
+    def setup_mapa_tab(self):
+        # Título da aba
+        ttk.Label(self.mapa_frame, text="Mapa de Números Vendidos e Livres", 
+                 style="Subheader.TLabel").pack(pady=(0, 10))
+        
+        # Faixa da rifa e resumo
+        faixa_frame = ttk.Frame(self.mapa_frame)
+        faixa_frame.pack(fill=tk.X, padx=20, pady=5)
+        
+        ttk.Label(faixa_frame, text="Faixa da rifa: de").pack(side=tk.LEFT)
+        self.faixa_inicio_entry = ttk.Entry(faixa_frame, width=10)
+        self.faixa_inicio_entry.pack(side=tk.LEFT, padx=5)
+        ttk.Label(faixa_frame, text="até").pack(side=tk.LEFT)
+        self.faixa_fim_entry = ttk.Entry(faixa_frame, width=10)
+        self.faixa_fim_entry.pack(side=tk.LEFT, padx=5)
+        self.faixa_inicio_entry.insert(0, str(self.rifa_manager.faixa[0]))
+        self.faixa_fim_entry.insert(0, str(self.rifa_manager.faixa[1]))
+        
+        ttk.Button(faixa_frame, text="Aplicar", command=self.aplicar_faixa).pack(side=tk.LEFT, padx=5)
+        
+        self.resumo_mapa_label = ttk.Label(faixa_frame, text="")
+        self.resumo_mapa_label.pack(side=tk.RIGHT)
+        
+        # Sugestão de números livres
+        sugestao_frame = ttk.Frame(self.mapa_frame)
+        sugestao_frame.pack(fill=tk.X, padx=20, pady=5)
+        
+        ttk.Button(sugestao_frame, text="Próximo Livre", style="Primary.TButton",
+                  command=lambda: self.sugerir_numero(self.rifa_manager.proximo_numero_livre)).pack(
+                      side=tk.LEFT, padx=5)
+        ttk.Button(sugestao_frame, text="Livre Aleatório",
+                  command=lambda: self.sugerir_numero(self.rifa_manager.numero_livre_aleatorio)).pack(
+                      side=tk.LEFT, padx=5)
+        
+        ttk.Button(sugestao_frame, text="Próxima >", command=lambda: self.mudar_pagina_mapa(1)).pack(
+            side=tk.RIGHT, padx=5)
+        self.pagina_mapa_label = ttk.Label(sugestao_frame, text="")
+        self.pagina_mapa_label.pack(side=tk.RIGHT, padx=5)
+        ttk.Button(sugestao_frame, text="< Anterior", command=lambda: self.mudar_pagina_mapa(-1)).pack(
+            side=tk.RIGHT, padx=5)
+        
+        # Grade: cada célula é um número, colorido conforme vendido ou livre.
+        # As células são criadas uma vez e apenas recoloridas
+        self.mapa_canvas = tk.Canvas(self.mapa_frame, height=LINHAS_MAPA * 18 + 2,
+                                     background=CORES["branco"], highlightthickness=0)
+        self.mapa_canvas.pack(fill=tk.X, padx=20, pady=5)
+        self.celulas_mapa = []
+        for linha in range(LINHAS_MAPA):
+            for coluna in range(COLUNAS_MAPA):
+                x, y = coluna * 32 + 1, linha * 18 + 1
+                retangulo = self.mapa_canvas.create_rectangle(x, y, x + 31, y + 17, outline=CORES["branco"])
+                texto = self.mapa_canvas.create_text(x + 16, y + 9, font=("Arial", 7))
+                self.celulas_mapa.append((retangulo, texto))
+        self.mapa_canvas.bind("<Button-1>", self.on_clique_mapa)
+        
+        # Intervalos livres
+        self.intervalos_label = ttk.Label(self.mapa_frame, text="", wraplength=760, justify="left")
+        self.intervalos_label.pack(fill=tk.X, padx=20, pady=5)
+    
+    def atualizar_mapa(self):
+        self.tarefas.executar(self.rifa_manager.mapa_numeros,
+                              descricao="Carregando mapa",
+                              ao_concluir=self._exibir_mapa,
+                              ao_falhar=self._exibir_erro)
+    
+    def _exibir_mapa(self, mapa):
+        self.mapa = mapa
+        if self.inicio_pagina_mapa is None or self.inicio_pagina_mapa not in mapa:
+            self.inicio_pagina_mapa = mapa.inicio
+        
+        self.resumo_mapa_label.config(
+            text=f"Vendidos: {mapa.vendidos} | Livres: {mapa.livres} | Total: {mapa.total}")
+        
+        intervalos = mapa.intervalos_livres(LIMITE_INTERVALOS_EXIBIDOS + 1)
+        texto = ", ".join(f"{a}" if a == b else f"{a}-{b}" for a, b in intervalos[:LIMITE_INTERVALOS_EXIBIDOS])
+        if len(intervalos) > LIMITE_INTERVALOS_EXIBIDOS:
+            texto += ", ..."
+        self.intervalos_label.config(text=f"Números livres: {texto or 'nenhum'}")
+        
+        self.desenhar_pagina_mapa()
+    
+    def desenhar_pagina_mapa(self):
+        mapa = self.mapa
+        inicio = self.inicio_pagina_mapa
+        for posicao, (retangulo, texto) in enumerate(self.celulas_mapa):
+            numero = inicio + posicao
+            if numero > mapa.fim:
+                self.mapa_canvas.itemconfig(retangulo, fill=CORES["background"])
+                self.mapa_canvas.itemconfig(texto, text="")
+                continue
+            cor = CORES["erro"] if mapa.vendido(numero) else CORES["sucesso"]
+            self.mapa_canvas.itemconfig(retangulo, fill=cor)
+            self.mapa_canvas.itemconfig(texto, text=str(numero), fill=CORES["branco"])
+        
+        ultimo = min(mapa.fim, inicio + len(self.celulas_mapa) - 1)
+        self.pagina_mapa_label.config(text=f"{inicio}-{ultimo}")
+    
+    def mudar_pagina_mapa(self, direcao):
+        if self.mapa is None:
+            return
+        
+        inicio = self.inicio_pagina_mapa + direcao * len(self.celulas_mapa)
+        if self.mapa.inicio <= inicio <= self.mapa.fim:
+            self.inicio_pagina_mapa = inicio
+            self.desenhar_pagina_mapa()
+    
+    def on_clique_mapa(self, event):
+        """Leva o número livre clicado para o campo de cadastro."""
+        if self.mapa is None:
+            return
+        
+        coluna, linha = event.x // 32, event.y // 18
+        if coluna >= COLUNAS_MAPA or linha >= LINHAS_MAPA:
+            return
+        numero = self.inicio_pagina_mapa + linha * COLUNAS_MAPA + coluna
+        if numero <= self.mapa.fim and not self.mapa.vendido(numero):
+            self._preencher_cadastro(numero)
+    
+    def aplicar_faixa(self):
+        sucesso, mensagem = self.rifa_manager.definir_faixa(
+            self.faixa_inicio_entry.get(), self.faixa_fim_entry.get())
+        if not sucesso:
+            messagebox.showerror("Erro", mensagem)
+            return
+        
+        self.inicio_pagina_mapa = None
+        self.atualizar_status(mensagem)
+        self.atualizar_mapa()
+    
+    def sugerir_numero(self, funcao):
+        self.tarefas.executar(funcao,
+                              descricao="Procurando número livre",
+                              ao_concluir=self._exibir_sugestao,
+                              ao_falhar=self._exibir_erro)
+    
+    def _exibir_sugestao(self, numero):
+        if numero is None:
+            messagebox.showinfo("Mapa", "Todos os números da faixa já foram vendidos.")
+            return
+        self._preencher_cadastro(numero)
+    
+    def _preencher_cadastro(self, numero):
+        self.numeros_entry.delete(0, tk.END)
+        self.numeros_entry.insert(0, str(numero))
+        self.notebook.select(self.cadastro_frame)
+        self.nome_multi_entry.focus_set()
+        self.atualizar_status(f"Número {numero} livre selecionado para cadastro")
+    
     def setup_exportar_tab(self):
         # Título da aba
         ttk.Label(self.exportar_frame, text="Exportação de Dados", 
@@ -369,18 +663,59 @@ class RifaGUI:
         
         # Texto explicativo
         ttk.Label(self.exportar_inner_frame, 
-                 text="Exporte os dados para um arquivo CSV que pode ser aberto em Excel ou similares.",
+                 text="Exporte os dados em CSV, CSV compactado, JSON Lines ou planilha do Excel.",
                  wraplength=500, justify="center").pack(pady=10)
         
         ttk.Label(self.exportar_inner_frame, 
                  text="Esta função permite criar um backup dos seus dados ou compartilhá-los.",
                  wraplength=500, justify="center").pack(pady=5)
         
+        # Opções: formato, ordem e filtros (campos vazios não filtram)
+        opcoes_frame = ttk.Frame(self.exportar_inner_frame, style="Card.TFrame")
+        opcoes_frame.pack(pady=10)
+        
+        ttk.Label(opcoes_frame, text="Formato:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=3)
+        self.formato_exportacao = tk.StringVar(value="CSV")
+        ttk.Combobox(opcoes_frame, textvariable=self.formato_exportacao,
+                     values=list(FORMATOS_EXPORTACAO), state="readonly",
+                     width=22).grid(row=0, column=1, columnspan=3, sticky=tk.W, padx=5, pady=3)
+        
+        self.exportar_ordenado = tk.BooleanVar(value=True)
+        ttk.Checkbutton(opcoes_frame, text="Ordenar por número (senão, na ordem do arquivo)",
+                        variable=self.exportar_ordenado).grid(row=1, column=1, columnspan=3,
+                                                              sticky=tk.W, padx=5, pady=3)
+        
+        ttk.Label(opcoes_frame, text="Números de:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=3)
+        self.exportar_inicio_entry = ttk.Entry(opcoes_frame, width=12)
+        self.exportar_inicio_entry.grid(row=2, column=1, sticky=tk.W, padx=5, pady=3)
+        ttk.Label(opcoes_frame, text="até:").grid(row=2, column=2, sticky=tk.W, padx=5, pady=3)
+        self.exportar_fim_entry = ttk.Entry(opcoes_frame, width=12)
+        self.exportar_fim_entry.grid(row=2, column=3, sticky=tk.W, padx=5, pady=3)
+        
+        ttk.Label(opcoes_frame, text="Nome contém:").grid(row=3, column=0, sticky=tk.W, padx=5, pady=3)
+        self.exportar_nome_entry = ttk.Entry(opcoes_frame, width=30)
+        self.exportar_nome_entry.grid(row=3, column=1, columnspan=3, sticky=tk.W, padx=5, pady=3)
+        
+        ttk.Label(opcoes_frame, text="Compras de:").grid(row=4, column=0, sticky=tk.W, padx=5, pady=3)
+        self.exportar_desde_entry = ttk.Entry(opcoes_frame, width=12)
+        self.exportar_desde_entry.grid(row=4, column=1, sticky=tk.W, padx=5, pady=3)
+        ttk.Label(opcoes_frame, text="até:").grid(row=4, column=2, sticky=tk.W, padx=5, pady=3)
+        self.exportar_ate_entry = ttk.Entry(opcoes_frame, width=12)
+        self.exportar_ate_entry.grid(row=4, column=3, sticky=tk.W, padx=5, pady=3)
+        ttk.Label(opcoes_frame, text="(dd/mm/aaaa)").grid(row=4, column=4, sticky=tk.W, pady=3)
+        
         # Botão de exportação
         ttk.Button(self.exportar_inner_frame, text="Escolher Local e Exportar", 
                   style="Primary.TButton", command=self.exportar_dados,
                   width=25).pack(pady=20)
         
+        # Progresso da exportação em andamento (o cancelamento fica na barra de status)
+        self.exportar_progresso_bar = ttk.Progressbar(self.exportar_inner_frame, length=400,
+                                                      mode="determinate")
+        self.exportar_progresso_bar.pack(pady=(0, 5))
+        self.exportar_progresso_label = ttk.Label(self.exportar_inner_frame, text="")
+        self.exportar_progresso_label.pack()
+        
         # Informações adicionais
         info_frame = ttk.Frame(self.exportar_frame, padding=10)
         info_frame.pack(fill=tk.X, padx=20, pady=10)
@@ -390,6 +725,8 @@ class RifaGUI:
         tips = [
             "• Exporte regularmente como backup para evitar perda de dados",
             "• O arquivo CSV pode ser aberto no Excel, Google Sheets, LibreOffice, etc.",
+            "• Os filtros por número, nome e data exportam só parte dos compradores",
+            "• Exportar em XLSX requer o pacote openpyxl",
             "• Para transferir dados entre computadores, use a exportação e importação"
         ]
         
@@ -411,7 +748,7 @@ class RifaGUI:
                  wraplength=500, justify="center").pack(pady=10)
         
         ttk.Label(self.importar_inner_frame, 
-                 text="Números de rifa duplicados serão ignorados automaticamente.",
+                 text="Números de rifa duplicados do mesmo comprador serão ignorados automaticamente.",
                  wraplength=500, justify="center").pack(pady=5)
         
         # Frame para exibir o caminho do arquivo
@@ -423,6 +760,30 @@ class RifaGUI:
         ttk.Entry(file_frame, textvariable=self.filepath_var, width=50).pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
         ttk.Button(file_frame, text="Procurar...", command=self.escolher_arquivo_csv).pack(side=tk.LEFT, padx=5)
         
+        # Os modos de conflito e a importação retomável só existem num CSV local;
+        # no banco SQLite e no servidor os registros existentes são mantidos
+        opcoes_csv = tk.NORMAL if self.rifa_manager.csv_local is not None else tk.DISABLED
+        if opcoes_csv == tk.DISABLED:
+            ttk.Label(self.importar_inner_frame,
+                      text="Importando para o banco ou servidor aberto: os registros existentes são mantidos.",
+                      wraplength=500, justify="center").pack(pady=5)
+        
+        # O que fazer com o mesmo número comprado por outra pessoa
+        conflito_frame = ttk.Frame(self.importar_inner_frame, style="Card.TFrame")
+        conflito_frame.pack(pady=5)
+        ttk.Label(conflito_frame, text="Número de outro comprador:").pack(side=tk.LEFT, padx=5)
+        self.modo_conflito = tk.StringVar(value=next(iter(MODOS_CONFLITO)))
+        ttk.Combobox(conflito_frame, textvariable=self.modo_conflito,
+                     values=list(MODOS_CONFLITO),
+                     state="readonly" if opcoes_csv == tk.NORMAL else tk.DISABLED,
+                     width=32).pack(side=tk.LEFT, padx=5)
+        
+        # Importação em partes, que continua de onde parou se for interrompida
+        self.importacao_retomavel = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.importar_inner_frame,
+                        text="Gravar em partes e continuar de onde parou se for interrompida",
+                        variable=self.importacao_retomavel, state=opcoes_csv).pack(pady=5)
+        
         # Botão para importar
         ttk.Button(self.importar_inner_frame, text="Importar Dados", 
                   style="Primary.TButton", command=self.importar_csv,
@@ -451,6 +812,81 @@ class RifaGUI:
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.resultado_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
     
+    def setup_diagnostico_tab(self):
+        # Título da aba
+        ttk.Label(self.diagnostico_frame, text="Diagnóstico de Desempenho",
+                 style="Subheader.TLabel").pack(pady=(0, 10))
+        
+        controles_frame = ttk.Frame(self.diagnostico_frame)
+        controles_frame.pack(fill=tk.X, padx=20, pady=5)
+        
+        self.metricas_ativas = tk.BooleanVar(value=metricas.ativas)
+        ttk.Checkbutton(controles_frame, text="Coletar métricas", variable=self.metricas_ativas,
+                        command=self.alternar_metricas).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controles_frame, text="Atualizar",
+                  command=self.atualizar_diagnostico).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controles_frame, text="Zerar",
+                  command=self.zerar_diagnostico).pack(side=tk.LEFT, padx=5)
+        
+        self.resumo_diagnostico_label = ttk.Label(controles_frame, text="")
+        self.resumo_diagnostico_label.pack(side=tk.RIGHT)
+        
+        # Tempo por operação
+        self.operacoes_tree = ttk.Treeview(
+            self.diagnostico_frame, columns=("chamadas", "total", "media", "maior"), height=10)
+        self.operacoes_tree.heading("#0", text="Operação")
+        self.operacoes_tree.heading("chamadas", text="Chamadas")
+        self.operacoes_tree.heading("total", text="Total (ms)")
+        self.operacoes_tree.heading("media", text="Média (ms)")
+        self.operacoes_tree.heading("maior", text="Maior (ms)")
+        self.operacoes_tree.column("#0", width=280)
+        for coluna in ("chamadas", "total", "media", "maior"):
+            self.operacoes_tree.column(coluna, width=100, anchor=tk.E)
+        self.operacoes_tree.pack(fill=tk.BOTH, expand=True, padx=20, pady=5)
+        
+        # Contadores: linhas lidas, bytes lidos e gravados, acertos de cache...
+        self.contadores_tree = ttk.Treeview(self.diagnostico_frame, columns=("valor",), height=6)
+        self.contadores_tree.heading("#0", text="Contador")
+        self.contadores_tree.heading("valor", text="Valor")
+        self.contadores_tree.column("#0", width=280)
+        self.contadores_tree.column("valor", width=150, anchor=tk.E)
+        self.contadores_tree.pack(fill=tk.X, padx=20, pady=5)
+    
+    def alternar_metricas(self):
+        if self.metricas_ativas.get():
+            metricas.ativar()
+        else:
+            metricas.desativar()
+        self.atualizar_diagnostico()
+    
+    def zerar_diagnostico(self):
+        metricas.zerar()
+        self.atualizar_diagnostico()
+    
+    def atualizar_diagnostico(self):
+        """Mostra as métricas atuais e repete enquanto a aba Diagnóstico estiver aberta."""
+        if self.diagnostico_agendado is not None:
+            self.root.after_cancel(self.diagnostico_agendado)
+            self.diagnostico_agendado = None
+        
+        estado = metricas.stats()
+        self.operacoes_tree.delete(*self.operacoes_tree.get_children())
+        for nome, valores in sorted(estado['operacoes'].items(), key=lambda item: -item[1]['total_ms']):
+            self.operacoes_tree.insert("", tk.END, text=nome, values=(
+                valores['chamadas'], f"{valores['total_ms']:.1f}",
+                f"{valores['media_ms']:.3f}", f"{valores['maior_ms']:.1f}"))
+        
+        self.contadores_tree.delete(*self.contadores_tree.get_children())
+        for nome, valor in estado['contadores'].items():
+            self.contadores_tree.insert("", tk.END, text=nome, values=(f"{valor:,}".replace(",", "."),))
+        
+        situacao = "ativa" if estado['ativas'] else "desativada"
+        self.resumo_diagnostico_label.config(
+            text=f"Coleta {situacao} | {estado['segundos']:.0f} s de medição")
+        
+        if "Diagnóstico" in self.notebook.tab(self.notebook.select(), "text"):
+            self.diagnostico_agendado = self.root.after(INTERVALO_DIAGNOSTICO, self.atualizar_diagnostico)
+    
     def cadastrar_multiplos(self):
         numeros_input = self.numeros_entry.get().strip()
         nome = self.nome_multi_entry.get().strip()
@@ -460,41 +896,271 @@ class RifaGUI:
             messagebox.showerror("Erro", "Todos os campos são obrigatórios!")
             return
         
-        numeros = [num.strip() for num in numeros_input.split(',')]
-        
-        # Se for apenas um número, usar a função de cadastro único
-        if len(numeros) == 1:
-            sucesso, mensagem = self.rifa_manager.cadastrar_comprador(numeros[0], nome, telefone)
-        else:
-            sucesso, mensagem = self.rifa_manager.cadastrar_multiplos_numeros(numeros, nome, telefone)
-        
+        # Aceita números soltos, intervalos e pedidos de livres (ver interpretar_numeros)
+        self.tarefas.executar(
+            self.rifa_manager.cadastrar_expressao, numeros_input, nome, telefone,
+            descricao="Cadastrando",
+            ao_concluir=lambda resultado: self._exibir_cadastro(resultado, nome),
+            ao_falhar=self._exibir_erro)
+    
+    def _exibir_cadastro(self, resultado, nome):
+        sucesso, mensagem = resultado
         if sucesso:
             messagebox.showinfo("Sucesso", mensagem)
             self.limpar_campos_cadastro()
-            self.atualizar_status(f"Cadastro realizado: {len(numeros)} número(s) para {nome}")
-            self.atualizar_listagem()
+            self.atualizar_status(f"Cadastro realizado para {nome}")
         else:
             messagebox.showwarning("Atenção", mensagem)
     
+    def _exibir_erro(self, erro):
+        """Mostra o erro de uma tarefa em segundo plano"""
+        messagebox.showerror("Erro", f"Ocorreu um erro: {erro}")
+        self.atualizar_status("Erro na operação")
+    
     def atualizar_listagem(self):
-        # Limpar treeview
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Adicionar dados
-        compradores = self.rifa_manager.listar_compradores()
-        for comprador in compradores:
-            self.tree.insert("", tk.END, values=(
-                comprador['numero'],
-                comprador['nome'],
-                comprador['telefone'],
-                comprador['data_compra']
-            ))
-            
+        ordem = ORDENS_LISTAGEM[self.ordem_listagem.get()]
+        self.tarefas.executar(self._carregar_listagem, ordem, self.listagem_decrescente.get(),
+                              self.lista_compradores.inicio,
+                              descricao="Carregando compradores",
+                              ao_concluir=self._exibir_listagem, ao_falhar=self._exibir_erro)
+    
+    def _carregar_listagem(self, ordem, decrescente, inicio):
+        """Roda na thread de trabalho: o total, as linhas inválidas e a página da posição exibida."""
+        total = self.rifa_manager.contar_compradores()
+        indice = min(inicio, max(0, total - 1)) // TAMANHO_PAGINA
+        registros = self.rifa_manager.listar_compradores(
+            indice * TAMANHO_PAGINA, TAMANHO_PAGINA, ordem, decrescente)
+        return ordem, decrescente, total, indice, registros, len(self.rifa_manager.linhas_invalidas())
+    
+    def _exibir_listagem(self, resultado):
+        ordem, decrescente, total, indice, registros, invalidas = resultado
+        # Só o total e as páginas perto da posição exibida são buscados; as
+        # demais, ao rolar até elas
+        self.compradores = ListagemPaginada(
+            total, lambda listagem, pagina: self._buscar_pagina_listagem(listagem, pagina,
+                                                                         ordem, decrescente),
+            chave=chave_da_ordem(ordem), decrescente=decrescente)
+        self.compradores.receber(indice, registros)
+        self.lista_compradores.definir_dados(self.compradores)
+        
         # Atualizar contador
-        total = len(compradores)
+        self.atualizar_contador()
+        mensagem = f"Listagem atualizada: {total} registro{'s' if total != 1 else ''}"
+        if invalidas:
+            mensagem += (f" ({invalidas} linha{'s' if invalidas != 1 else ''} com número"
+                         f" inválido ignorada{'s' if invalidas != 1 else ''})")
+        self.atualizar_status(mensagem)
+    
+    def _buscar_pagina_listagem(self, listagem, indice, ordem, decrescente):
+        """Busca em segundo plano uma página que a listagem exibida pediu ao rolar."""
+        def carregar():
+            # Numa rolagem rápida, as páginas por onde ela só passou não são buscadas
+            if listagem is not self.compradores or not listagem.em_uso(indice):
+                return None
+            return self.rifa_manager.listar_compradores(
+                indice * listagem.tamanho_pagina, listagem.tamanho_pagina, ordem, decrescente)
+        
+        def exibir(registros):
+            if registros is None:
+                listagem.liberar(indice)
+                return
+            listagem.receber(indice, registros)
+            # Uma listagem refeita nesse meio tempo descarta a página
+            if listagem is self.compradores:
+                self.lista_compradores.renderizar()
+        
+        def falhar(erro):
+            listagem.liberar(indice)
+            self._exibir_erro(erro)
+        
+        self.tarefas.executar(carregar, descricao="Carregando compradores",
+                              ao_concluir=exibir, ao_falhar=falhar)
+    
+    def atualizar_contador(self):
+        total = len(self.compradores)
         self.contador_label.config(text=f"Total: {total} registro{'s' if total != 1 else ''}")
-        self.atualizar_status(f"Listagem atualizada: {total} registro{'s' if total != 1 else ''}")
+    
+    def on_compradores_alterados(self, evento, registros):
+        """Aplica na listagem e na busca os registros publicados pelo RifaManager.
+        
+        Cada registro inserido entra na posição da ordem exibida, nas páginas
+        já carregadas da listagem e nos resultados da busca, e conta no total,
+        sem consultar os dados de novo.
+        """
+        if evento == 'inseridos' and self.compradores.chave is not None:
+            for registro in registros:
+                self.compradores.inserir(registro)
+            self.lista_compradores.renderizar()
+            self.atualizar_contador()
+        elif "Listar" in self.notebook.tab(self.notebook.select(), "text"):
+            self.atualizar_listagem()
+        
+        for registro in registros:
+            self.atualizar_resultado_busca(registro)
+        
+        # Com a aba do mapa aberta, recarregá-lo para mostrar os novos vendidos
+        if self.mapa is not None and "Mapa" in self.notebook.tab(self.notebook.select(), "text"):
+            self.atualizar_mapa()
+    
+    def atualizar_resultado_busca(self, registro):
+        """Mostra o registro nos resultados, na ordem de número, se ele atender à última busca feita.
+        
+        Na busca ao digitar, só entra na página exibida o registro que cai
+        dentro dela; o offset e o total da paginação são corrigidos.
+        """
+        if self.busca_atual is None:
+            return
+        
+        tipo, termo = self.busca_atual
+        if tipo == 'numero':
+            atende = registro.numero == termo
+        elif tipo == 'prefixo':
+            atende = registro['numero'].startswith(termo)
+        else:
+            atende = termo in normalizar_nome(registro['nome'])
+        if not atende:
+            return
+        
+        if self.pagina_busca is None:
+            self._inserir_resultado(registro)
+            total = len(self.numeros_busca)
+            self.resultado_contador.config(text=f"{total} resultado{'s' if total != 1 else ''} encontrado{'s' if total != 1 else ''}")
+            return
+        
+        tipo_busca, texto, offset, total = self.pagina_busca
+        numeros = self.numeros_busca
+        if registro.numero in self.itens_busca:
+            self._inserir_resultado(registro)
+            return
+        if offset > 0 and (not numeros or registro.numero < numeros[0]):
+            # Cai numa página anterior: a exibida anda uma posição
+            offset += 1
+        elif len(numeros) < TAMANHO_PAGINA_BUSCA or registro.numero < numeros[-1]:
+            self._inserir_resultado(registro)
+            if len(numeros) > TAMANHO_PAGINA_BUSCA:
+                self.resultados_tree.delete(self.itens_busca.pop(numeros.pop()))
+        if total < LIMITE_RESULTADOS_BUSCA:
+            total += 1
+        self.pagina_busca = (tipo_busca, texto, offset, total)
+        self._atualizar_paginacao_busca()
+    
+    def _inserir_resultado(self, registro):
+        """Põe o registro nos resultados na ordem de número; um número já exibido tem a linha atualizada."""
+        valores = (registro['numero'], registro['nome'], registro['telefone'], registro['data_compra'])
+        item = self.itens_busca.get(registro.numero)
+        if item is not None:
+            self.resultados_tree.item(item, values=valores)
+            return
+        posicao = bisect_left(self.numeros_busca, registro.numero)
+        self.numeros_busca.insert(posicao, registro.numero)
+        self.itens_busca[registro.numero] = self.resultados_tree.insert("", posicao, values=valores)
+    
+    def agendar_busca(self, tipo):
+        """Refaz a busca ao digitar, depois de uma pausa na digitação."""
+        if self.busca_agendada is not None:
+            self.root.after_cancel(self.busca_agendada)
+        self.busca_agendada = self.root.after(ATRASO_BUSCA_AO_DIGITAR, lambda: self.busca_ao_digitar(tipo))
+    
+    def busca_ao_digitar(self, tipo):
+        self.busca_agendada = None
+        entry = self.busca_numero_entry if tipo == 'numero' else self.busca_nome_entry
+        texto = entry.get().strip()
+        
+        if not texto:
+            self.cancelar_busca_ao_digitar()
+            self.limpar_resultados_busca()
+            return
+        
+        if tipo == 'numero' and not texto.isdigit():
+            self.cancelar_busca_ao_digitar()
+            self.limpar_resultados_busca()
+            self.resultado_contador.config(text="Digite apenas números")
+            return
+        
+        self.executar_busca(tipo, texto, 0)
+    
+    def executar_busca(self, tipo, texto, offset):
+        """Busca uma página de resultados na thread de trabalho.
+        
+        Cada consulta recebe uma geração; se outra tecla for digitada antes de
+        a consulta começar, ela nem é executada, e resultados de consultas
+        antigas são descartados ao chegar.
+        """
+        self.geracao_busca += 1
+        geracao = self.geracao_busca
+        pesquisar = self.rifa_manager.pesquisar_numero if tipo == 'numero' else self.rifa_manager.pesquisar_nome
+        
+        def consultar():
+            if geracao != self.geracao_busca:
+                return None
+            return pesquisar(texto, offset, TAMANHO_PAGINA_BUSCA, LIMITE_RESULTADOS_BUSCA)
+        
+        self.tarefas.executar(consultar,
+                              descricao="Buscando",
+                              ao_concluir=lambda resultado: self._exibir_busca_ao_digitar(
+                                  geracao, tipo, texto, offset, resultado),
+                              ao_falhar=self._exibir_erro)
+    
+    def _exibir_busca_ao_digitar(self, geracao, tipo, texto, offset, resultado):
+        if resultado is None or geracao != self.geracao_busca:
+            return
+        
+        total, registros = resultado
+        if tipo == 'numero':
+            self.busca_atual = ('prefixo', str(int(texto)))
+        else:
+            self.busca_atual = ('nome', normalizar_nome(texto))
+        self.pagina_busca = (tipo, texto, offset, total)
+        
+        self.limpar_resultados_busca(manter_busca=True)
+        for r in registros:
+            self._inserir_resultado(r)
+        self._atualizar_paginacao_busca()
+    
+    def _atualizar_paginacao_busca(self):
+        """Mostra o total e a faixa da página exibida na busca ao digitar."""
+        tipo, texto, offset, total = self.pagina_busca
+        exibidos = len(self.numeros_busca)
+        quantidade = f"{total}+" if total >= LIMITE_RESULTADOS_BUSCA else str(total)
+        self.resultado_contador.config(text=f"{quantidade} resultado{'s' if total != 1 else ''} encontrado{'s' if total != 1 else ''}")
+        if total:
+            self.pagina_label.config(text=f"{offset + 1}-{offset + exibidos} de {quantidade}")
+        self.anterior_pagina_button.config(state=tk.NORMAL if offset > 0 else tk.DISABLED)
+        self.proxima_pagina_button.config(
+            state=tk.NORMAL if offset + exibidos < total else tk.DISABLED)
+    
+    def mudar_pagina_busca(self, direcao):
+        if self.pagina_busca is None:
+            return
+        
+        tipo, texto, offset, total = self.pagina_busca
+        offset = max(0, offset + direcao * TAMANHO_PAGINA_BUSCA)
+        if offset < total:
+            self.executar_busca(tipo, texto, offset)
+    
+    def cancelar_busca_ao_digitar(self):
+        """Descarta a busca agendada e as consultas ainda não exibidas."""
+        if self.busca_agendada is not None:
+            self.root.after_cancel(self.busca_agendada)
+            self.busca_agendada = None
+        self.geracao_busca += 1
+    
+    def limpar_resultados_busca(self, manter_busca=False):
+        self.resultados_tree.delete(*self.resultados_tree.get_children())
+        self.itens_busca = {}
+        self.numeros_busca = []
+        self.resultado_contador.config(text="")
+        self.pagina_label.config(text="")
+        self.anterior_pagina_button.config(state=tk.DISABLED)
+        self.proxima_pagina_button.config(state=tk.DISABLED)
+        if not manter_busca:
+            self.busca_atual = None
+            self.pagina_busca = None
+    
+    def limpar_busca(self, entry):
+        entry.delete(0, tk.END)
+        self.cancelar_busca_ao_digitar()
+        self.limpar_resultados_busca()
     
     def buscar_por_numero(self):
         numero = self.busca_numero_entry.get().strip()
@@ -503,19 +1169,21 @@ class RifaGUI:
             messagebox.showerror("Erro", "Digite um número para buscar!")
             return
         
-        comprador = self.rifa_manager.buscar_por_numero(numero)
+        self.cancelar_busca_ao_digitar()
+        self.tarefas.executar(self.rifa_manager.buscar_por_numero, numero,
+                              descricao="Buscando",
+                              ao_concluir=lambda comprador: self._exibir_busca_numero(numero, comprador),
+                              ao_falhar=self._exibir_erro)
+    
+    def _exibir_busca_numero(self, numero, comprador):
+        chave = normalizar_numero(numero)
         
         # Limpar resultados anteriores
-        for item in self.resultados_tree.get_children():
-            self.resultados_tree.delete(item)
+        self.limpar_resultados_busca()
+        self.busca_atual = ('numero', chave) if chave is not None else None
         
         if comprador:
-            self.resultados_tree.insert("", tk.END, values=(
-                comprador['numero'],
-                comprador['nome'],
-                comprador['telefone'],
-                comprador['data_compra']
-            ))
+            self._inserir_resultado(comprador)
             self.resultado_contador.config(text="1 resultado encontrado")
             self.atualizar_status(f"Busca por número: encontrado número {numero}")
         else:
@@ -530,20 +1198,20 @@ class RifaGUI:
             messagebox.showerror("Erro", "Digite um nome para buscar!")
             return
         
-        resultados = self.rifa_manager.buscar_por_nome(nome)
-        
+        self.cancelar_busca_ao_digitar()
+        self.tarefas.executar(self.rifa_manager.buscar_por_nome, nome,
+                              descricao="Buscando",
+                              ao_concluir=lambda resultados: self._exibir_busca_nome(nome, resultados),
+                              ao_falhar=self._exibir_erro)
+    
+    def _exibir_busca_nome(self, nome, resultados):
         # Limpar resultados anteriores
-        for item in self.resultados_tree.get_children():
-            self.resultados_tree.delete(item)
+        self.limpar_resultados_busca()
+        self.busca_atual = ('nome', normalizar_nome(nome))
         
         if resultados:
             for r in resultados:
-                self.resultados_tree.insert("", tk.END, values=(
-                    r['numero'],
-                    r['nome'],
-                    r['telefone'],
-                    r['data_compra']
-                ))
+                self._inserir_resultado(r)
             total = len(resultados)
             self.resultado_contador.config(text=f"{total} resultado{'s' if total != 1 else ''} encontrado{'s' if total != 1 else ''}")
             self.atualizar_status(f"Busca por nome: {total} resultado{'s' if total != 1 else ''} para '{nome}'")
@@ -552,21 +1220,85 @@ class RifaGUI:
             self.resultado_contador.config(text="0 resultados")
             self.atualizar_status(f"Busca por nome: nenhum resultado para '{nome}'")
     
+    def _mostrar_progresso_exportacao(self, tarefa):
+        """Mostra na aba Exportar o progresso da exportação em andamento"""
+        if tarefa is None or tarefa.descricao != "Exportando":
+            self.exportar_progresso_bar.config(value=0)
+            self.exportar_progresso_label.config(text="")
+            return
+        
+        if tarefa.total:
+            self.exportar_progresso_bar.config(maximum=tarefa.total, value=tarefa.feito)
+            self.exportar_progresso_label.config(
+                text=f"{tarefa.feito} de {tarefa.total} registros lidos")
+        else:
+            self.exportar_progresso_label.config(text="Exportando...")
+    
+    def _filtros_exportacao(self):
+        """Lê os filtros da aba Exportar. Retorna None (após avisar) se algum for inválido"""
+        filtros = {}
+        for chave, entry in (('inicio', self.exportar_inicio_entry),
+                             ('fim', self.exportar_fim_entry)):
+            texto = entry.get().strip()
+            if texto:
+                filtros[chave] = normalizar_numero(texto)
+                if filtros[chave] is None:
+                    messagebox.showerror("Erro", f"Número inválido: {texto}")
+                    return None
+        
+        nome = self.exportar_nome_entry.get().strip()
+        if nome:
+            filtros['nome'] = nome
+        
+        for chave, entry in (('desde', self.exportar_desde_entry),
+                             ('ate', self.exportar_ate_entry)):
+            texto = entry.get().strip()
+            if texto:
+                try:
+                    filtros[chave] = datetime.strptime(texto, "%d/%m/%Y")
+                except ValueError:
+                    messagebox.showerror("Erro", f"Data inválida: {texto} (use dd/mm/aaaa)")
+                    return None
+        # A data final inclui as compras feitas durante todo o dia
+        if 'ate' in filtros:
+            filtros['ate'] += timedelta(hours=23, minutes=59)
+        return filtros
+    
     def exportar_dados(self):
+        filtros = self._filtros_exportacao()
+        if filtros is None:
+            return
+        
+        descricao = self.formato_exportacao.get()
+        formato, extensao = FORMATOS_EXPORTACAO[descricao]
+        ordenado = self.exportar_ordenado.get()
         arquivo_destino = filedialog.asksaveasfilename(
-            defaultextension=".csv",
-            filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")],
+            defaultextension=extensao,
+            filetypes=[(descricao, "*" + extensao), ("All Files", "*.*")],
             title="Salvar dados como..."
         )
         
         if arquivo_destino:
-            sucesso, mensagem = self.rifa_manager.exportar_para_csv(arquivo_destino)
-            if sucesso:
-                messagebox.showinfo("Exportação", mensagem)
-                self.atualizar_status(f"Dados exportados para {os.path.basename(arquivo_destino)}")
-            else:
-                messagebox.showerror("Erro", mensagem)
-                self.atualizar_status("Erro na exportação de dados")
+            # Exportar em segundo plano, em lotes, permitindo cancelar
+            def exportar(tarefa):
+                return self.rifa_manager.exportar(
+                    arquivo_destino, formato, ordenado,
+                    progresso=tarefa.informar_progresso, cancelar=tarefa.evento_cancelar,
+                    **filtros)
+            
+            self.tarefas.executar(
+                exportar, descricao="Exportando", cancelavel=True,
+                ao_concluir=lambda resultado: self._exibir_exportacao(resultado, arquivo_destino),
+                ao_falhar=self._exibir_erro)
+    
+    def _exibir_exportacao(self, resultado, arquivo_destino):
+        sucesso, mensagem = resultado
+        if sucesso:
+            messagebox.showinfo("Exportação", mensagem)
+            self.atualizar_status(f"Dados exportados para {os.path.basename(arquivo_destino)}")
+        else:
+            messagebox.showerror("Erro", mensagem)
+            self.atualizar_status("Erro na exportação de dados")
     
     def escolher_arquivo_csv(self):
         arquivo = filedialog.askopenfilename(
@@ -599,8 +1331,44 @@ class RifaGUI:
         self.resultado_text.tag_configure("erro", foreground=CORES["erro"])
         self.resultado_text.tag_configure("aviso", foreground=CORES["aviso"])
         
-        # Executar a importação
-        sucesso, mensagem, stats = merge_csv_files(arquivo_origem=arquivo_origem)
+        # Executar a importação em segundo plano, permitindo cancelar
+        retomar = self.importacao_retomavel.get()
+        modo_conflito = MODOS_CONFLITO[self.modo_conflito.get()]
+        def importar(tarefa):
+            return self.rifa_manager.importar_csv(arquivo_origem,
+                                                  progresso=tarefa.informar_progresso,
+                                                  cancelar=tarefa.evento_cancelar,
+                                                  retomar=retomar,
+                                                  modo_conflito=modo_conflito)
+        
+        self.tarefas.executar(importar, descricao="Importando", cancelavel=True,
+                              ao_concluir=self._exibir_importacao, ao_falhar=self._exibir_erro_importacao)
+    
+    def formatar_numeros(self, numeros):
+        """Formata a lista de números do resultado, limitando o tamanho exibido"""
+        texto = "".join(f" - {num}\n" for num in numeros[:LIMITE_NUMEROS_EXIBIDOS])
+        if len(numeros) > LIMITE_NUMEROS_EXIBIDOS:
+            texto += f" ... e mais {len(numeros) - LIMITE_NUMEROS_EXIBIDOS} números\n"
+        return texto
+    
+    def formatar_conflitos(self, conflitos):
+        """Formata os conflitos do resultado: número e os dois compradores com a origem de cada um"""
+        texto = "".join(f" - {conflito['numero']}: {conflito['nome_a']} ({conflito['origem_a']}) x "
+                        f"{conflito['nome_b']} ({conflito['origem_b']})"
+                        f"{' - nenhum importado' if conflito['resolucao'] == 'nenhum' else ''}\n"
+                        for conflito in conflitos[:LIMITE_CONFLITOS_EXIBIDOS])
+        if len(conflitos) > LIMITE_CONFLITOS_EXIBIDOS:
+            texto += f" ... e mais {len(conflitos) - LIMITE_CONFLITOS_EXIBIDOS} conflitos\n"
+        return texto
+    
+    def _exibir_erro_importacao(self, erro):
+        if isinstance(erro, TarefaCancelada):
+            self._exibir_importacao((False, "Importação cancelada pelo usuário.", {}))
+        else:
+            self._exibir_importacao((False, f"Erro na importação: {erro}", {}))
+    
+    def _exibir_importacao(self, resultado):
+        sucesso, mensagem, stats = resultado
         
         # Exibir resultados
         self.resultado_text.insert(tk.END, mensagem + "\n\n", "titulo")
@@ -608,13 +1376,30 @@ class RifaGUI:
         if sucesso:
             if stats['total_adicionados'] > 0:
                 self.resultado_text.insert(tk.END, "Números adicionados:\n", "sucesso")
-                for num in stats['numeros_adicionados']:
-                    self.resultado_text.insert(tk.END, f" - {num}\n")
+                self.resultado_text.insert(tk.END, self.formatar_numeros(stats['numeros_adicionados']))
             
             if stats['total_ignorados'] > 0:
                 self.resultado_text.insert(tk.END, "\nNúmeros ignorados (já existentes):\n", "aviso")
-                for num in stats['numeros_ignorados']:
-                    self.resultado_text.insert(tk.END, f" - {num}\n")
+                self.resultado_text.insert(tk.END, self.formatar_numeros(stats['numeros_ignorados']))
+            
+            if stats['total_substituidos'] > 0:
+                self.resultado_text.insert(tk.END, "\nNúmeros que passaram para a compra mais recente:\n", "aviso")
+                self.resultado_text.insert(tk.END, self.formatar_numeros(stats['numeros_substituidos']))
+            
+            if stats['total_preteridos'] > 0:
+                self.resultado_text.insert(tk.END, "\nNúmeros que ficaram de fora por uma compra mais recente:\n", "aviso")
+                self.resultado_text.insert(tk.END, self.formatar_numeros(stats['numeros_preteridos']))
+            
+            if stats['total_separados'] > 0:
+                self.resultado_text.insert(tk.END, "\nNúmeros em conflito separados em vez de importados:\n", "aviso")
+                self.resultado_text.insert(tk.END, self.formatar_numeros(stats['numeros_separados']))
+            
+            if stats['total_conflitos'] > 0:
+                self.resultado_text.insert(tk.END, "\nConflitos (mesmo número, outro comprador; "
+                                                   "o da esquerda ficou com o número):\n", "aviso")
+                self.resultado_text.insert(tk.END, self.formatar_conflitos(stats['conflitos']))
+                if stats['arquivo_conflitos']:
+                    self.resultado_text.insert(tk.END, f"Relatório completo: {stats['arquivo_conflitos']}\n")
             
             # Atualizar a lista de compradores após a importação
             self.atualizar_listagem()
@@ -624,12 +1409,21 @@ class RifaGUI:
         else:
             self.resultado_text.insert(tk.END, "Erro na importação!\n", "erro")
             self.resultado_text.insert(tk.END, mensagem)
+            
+            # Uma importação retomável interrompida mantém as partes já gravadas
+            if stats.get('total_adicionados'):
+                self.atualizar_listagem()
             messagebox.showerror("Erro", mensagem)
             self.atualizar_status("Erro na importação de dados")
 
 def main():
     root = tk.Tk()
-    app = RifaGUI(root)
+    try:
+        app = RifaGUI(root, sys.argv[1] if len(sys.argv) > 1 else 'rifas.csv')
+    except ErroServidor as erro:
+        messagebox.showerror("Erro", f"Não foi possível conectar ao servidor de rifas.\n{erro}")
+        root.destroy()
+        return
     root.mainloop()
 
 if __name__ == "__main__":
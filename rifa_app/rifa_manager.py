@@ -1,101 +1,418 @@
-import csv
-import os
 import sys
+import traceback
 from datetime import datetime
+from itertools import chain
+from armazenamento import ArmazenamentoCSV, criar_armazenamento, normalizar_numero
+from csv_merger import importar_no_armazenamento, merge_csv_files
+from exportacao import (TAMANHO_LOTE, ExportacaoCancelada, criar_filtro, exportar_lotes,
+                        formato_do_arquivo, lotes_em_ordem)
+from expressao_numeros import interpretar_numeros, resumir_numeros
+from mapa_numeros import FAIXA_PADRAO, MapaNumeros
+from metricas import medido, metricas
+from registro import MAIOR_NUMERO, Registro
 
 class RifaManager:
-    def __init__(self, arquivo_csv='rifas.csv'):
+    def __init__(self, arquivo_csv='rifas.csv', armazenamento=None, faixa=FAIXA_PADRAO):
         self.arquivo_csv = arquivo_csv
         self.headers = ['numero', 'nome', 'telefone', 'data_compra']
-        self.verificar_arquivo()
+        
+        # Faixa de números da rifa (inicio, fim), usada nas consultas de números livres
+        self.faixa = faixa
+        
+        # Por padrão o tipo de armazenamento é escolhido pela extensão do arquivo
+        # (rifas.csv usa CSV, rifas.db usa SQLite)
+        self.armazenamento = armazenamento or criar_armazenamento(arquivo_csv)
+        
+        # Funções avisadas quando registros são inseridos ou atualizados
+        self._assinantes = []
+    
+    def inscrever(self, callback):
+        """Registra uma função chamada como callback(evento, registros) após cada alteração.
+        
+        O evento é 'inseridos' ou 'atualizados' e os registros vêm no mesmo
+        formato retornado por listar_compradores.
+        """
+        self._assinantes.append(callback)
     
+    def cancelar_inscricao(self, callback):
+        """Remove uma função registrada com inscrever."""
+        if callback in self._assinantes:
+            self._assinantes.remove(callback)
+    
+    def _publicar(self, evento, linhas):
+        """Avisa os assinantes sobre as linhas gravadas."""
+        if not linhas or not self._assinantes:
+            return
+        
+        registros = [Registro.de_linha(*linha) for linha in linhas]
+        for callback in list(self._assinantes):
+            try:
+                callback(evento, registros)
+            except Exception:
+                # Um erro num assinante não desfaz o cadastro já gravado
+                traceback.print_exc()
+    
+    @medido
     def verificar_arquivo(self):
-        """Verifica se o arquivo CSV existe, se não, cria com cabeçalhos."""
-        if not os.path.exists(self.arquivo_csv):
-            with open(self.arquivo_csv, 'w', newline='', encoding='utf-8') as arquivo:
-                writer = csv.writer(arquivo)
-                writer.writerow(self.headers)
+        """Verifica se o arquivo de dados existe, se não, cria vazio."""
+        self.armazenamento.verificar_arquivo()
     
+    @medido
     def cadastrar_comprador(self, numero, nome, telefone):
         """Cadastra um novo comprador de rifa."""
-        # Verificar se o número já está cadastrado
-        if self.buscar_por_numero(numero):
-            return False, f"Erro: Número {numero} já está cadastrado."
+        chave = normalizar_numero(numero)
+        if chave is None:
+            return False, f"Erro: Número {numero} é inválido."
         
         data_compra = datetime.now().strftime("%d/%m/%Y %H:%M")
         
-        with open(self.arquivo_csv, 'a', newline='', encoding='utf-8') as arquivo:
-            writer = csv.writer(arquivo)
-            writer.writerow([numero, nome, telefone, data_compra])
+        # O armazenamento recusa o número se ele já estiver cadastrado
+        linha = [chave, nome, telefone, data_compra]
+        gravadas = self.armazenamento.inserir([linha])
+        if not gravadas[0]:
+            return False, f"Erro: Número {numero} já está cadastrado."
+        
+        self._publicar('inseridos', [linha])
         
         return True, f"Comprador {nome} cadastrado com o número {numero}."
     
+    @medido
+    def reservar_proximo_numero(self, nome, telefone, inicio=1):
+        """Cadastra o comprador no primeiro número livre a partir de inicio.
+        
+        A escolha e a gravação do número são atômicas, mesmo com outros
+        programas cadastrando no mesmo arquivo ao mesmo tempo.
+        
+        Returns:
+            tuple: (sucesso, mensagem, número reservado ou None)
+        """
+        chave = normalizar_numero(inicio)
+        if chave is None:
+            return False, f"Erro: Número {inicio} é inválido.", None
+        
+        data_compra = datetime.now().strftime("%d/%m/%Y %H:%M")
+        chave = self.armazenamento.reservar_proximo(chave, nome, telefone, data_compra)
+        
+        self._publicar('inseridos', [[chave, nome, telefone, data_compra]])
+        
+        return True, f"Comprador {nome} cadastrado com o número {chave}.", chave
+    
+    @medido
     def cadastrar_multiplos_numeros(self, numeros, nome, telefone):
-        """Cadastra múltiplos números de rifa para o mesmo comprador."""
+        """Cadastra múltiplos números de rifa para o mesmo comprador numa única escrita."""
         data_compra = datetime.now().strftime("%d/%m/%Y %H:%M")
-        numeros_cadastrados = []
-        numeros_com_erro = []
+        numeros_invalidos = []
         
+        numeros_validos = []
+        linhas = []
         for numero in numeros:
-            # Verificar se o número já está cadastrado
-            if self.buscar_por_numero(numero):
-                numeros_com_erro.append(numero)
+            chave = normalizar_numero(numero)
+            if chave is None:
+                numeros_invalidos.append(numero)
                 continue
             
-            with open(self.arquivo_csv, 'a', newline='', encoding='utf-8') as arquivo:
-                writer = csv.writer(arquivo)
-                writer.writerow([numero, nome, telefone, data_compra])
-                numeros_cadastrados.append(numero)
+            numeros_validos.append(numero)
+            linhas.append([chave, nome, telefone, data_compra])
+        
+        # O lote inteiro é validado contra o índice e gravado de uma só vez
+        gravadas = self.armazenamento.inserir(linhas)
+        numeros_cadastrados = [n for n, gravada in zip(numeros_validos, gravadas) if gravada]
+        numeros_com_erro = [n for n, gravada in zip(numeros_validos, gravadas) if not gravada]
+        self._publicar('inseridos', [linha for linha, gravada in zip(linhas, gravadas) if gravada])
         
         mensagem = ""
         if numeros_cadastrados:
             mensagem += f"Comprador {nome} cadastrado com os números: {', '.join(numeros_cadastrados)}.\n"
         if numeros_com_erro:
-            mensagem += f"Números já cadastrados: {', '.join(numeros_com_erro)}."
+            mensagem += f"Números já cadastrados: {', '.join(numeros_com_erro)}.\n"
+        if numeros_invalidos:
+            mensagem += f"Números inválidos: {', '.join(numeros_invalidos)}."
         
         return bool(numeros_cadastrados), mensagem.strip()
     
-    def listar_compradores(self):
-        """Lista todos os compradores cadastrados ordenados pelo número da rifa."""
-        compradores = []
+    @medido
+    def cadastrar_expressao(self, expressao, nome, telefone):
+        """Cadastra os números de uma expressão como "1-500, 1000-1999 passo 10, próximos 50 livres".
+        
+        Os intervalos são conferidos contra o mapa de vendidos de uma vez (sem
+        testar número por número) e todos os números vão numa única escrita.
+        Veja interpretar_numeros para os formatos aceitos.
+        """
+        try:
+            pedido = interpretar_numeros(expressao)
+        except ValueError as erro:
+            return False, f"Erro: {erro}"
+        
+        mapa = self.mapa_numeros()
+        livres = []
+        vendidos = []
+        for intervalo in pedido.intervalos:
+            disponiveis, ocupados = mapa.separar(intervalo)
+            livres.extend(disponiveis)
+            vendidos.extend(ocupados)
+        
+        faltam = 0
+        if pedido.livres:
+            # Os livres sorteados não podem repetir os números pedidos na expressão
+            reservados = MapaNumeros(mapa.inicio, mapa.fim, mapa.bits)
+            reservados.marcar_varios(chain.from_iterable(livres))
+            proximos = reservados.proximos_livres(pedido.livres)
+            livres.extend(proximos)
+            faltam = pedido.livres - sum(len(intervalo) for intervalo in proximos)
+        
+        numeros = chain.from_iterable(livres)
+        if len(pedido.intervalos) > 1 or pedido.livres:
+            # Intervalos podem se sobrepor ("1-10, 5-15")
+            numeros = sorted(set(numeros))
+        
+        data_compra = datetime.now().strftime("%d/%m/%Y %H:%M")
+        linhas = [[numero, nome, telefone, data_compra] for numero in numeros]
+        gravadas = self.armazenamento.inserir(linhas)
+        linhas_gravadas = [linha for linha, gravada in zip(linhas, gravadas) if gravada]
+        self._publicar('inseridos', linhas_gravadas)
         
-        with open(self.arquivo_csv, 'r', encoding='utf-8') as arquivo:
-            reader = csv.DictReader(arquivo)
-            for row in reader:
-                compradores.append(row)
+        # Números vendidos por outro ponto de venda depois da leitura do mapa
+        recusados = [linha[0] for linha, gravada in zip(linhas, gravadas) if not gravada]
+        numeros_com_erro = sorted(chain(chain.from_iterable(vendidos), recusados))
         
-        # Ordenar pelo número da rifa (convertendo para int para ordenação numérica)
-        compradores.sort(key=lambda x: int(x['numero']))
+        mensagem = ""
+        if linhas_gravadas:
+            mensagem += (f"Comprador {nome} cadastrado com {len(linhas_gravadas)} número(s): "
+                         f"{resumir_numeros(sorted(linha[0] for linha in linhas_gravadas))}.\n")
+        if numeros_com_erro:
+            mensagem += f"Números já cadastrados: {resumir_numeros(numeros_com_erro)}.\n"
+        if faltam:
+            mensagem += (f"Faltaram {faltam} números livres na faixa "
+                         f"{mapa.inicio} a {mapa.fim}.\n")
+        if pedido.invalidos:
+            mensagem += f"Números inválidos: {', '.join(pedido.invalidos)}."
+        if not mensagem:
+            mensagem = "Nenhum número informado."
+        
+        return bool(linhas_gravadas), mensagem.strip()
+    
+    @medido
+    def listar_compradores(self, offset=0, limite=None, ordem='numero', decrescente=False):
+        """Lista os compradores cadastrados, ou uma página deles, na ordem pedida.
         
-        return compradores
+        Args:
+            offset, limite: página da listagem (por padrão, todos os registros)
+            ordem: 'numero', 'nome' ou 'data' (da compra); empates seguem o número
+            decrescente: True para começar do fim da ordem
+        """
+        return self.armazenamento.listar(offset, limite, ordem, decrescente)
     
+    @medido
+    def contar_compradores(self):
+        """Quantidade de registros da listagem (os de número válido)."""
+        return self.armazenamento.contar_intervalo(0, MAIOR_NUMERO)
+    
+    @medido
+    def linhas_invalidas(self):
+        """Linhas do arquivo que ficaram fora da listagem por terem número inválido."""
+        return self.armazenamento.linhas_invalidas()
+    
+    @medido
     def buscar_por_numero(self, numero):
         """Busca um comprador pelo número da rifa."""
-        with open(self.arquivo_csv, 'r', encoding='utf-8') as arquivo:
-            reader = csv.DictReader(arquivo)
-            for row in reader:
-                if row['numero'] == str(numero):
-                    return row
-        return None
+        chave = normalizar_numero(numero)
+        if chave is None:
+            return None
+        
+        return self.armazenamento.obter(chave)
     
+    @medido
     def buscar_por_nome(self, nome):
         """Busca compradores pelo nome (busca parcial)."""
-        resultados = []
-        nome = nome.lower()
+        return self.armazenamento.buscar_nome(nome)
+    
+    @medido
+    def pesquisar_nome(self, nome, offset=0, limite=50, maximo=None):
+        """Busca uma página dos compradores cujo nome contém o texto.
+        
+        Returns:
+            tuple: (total de compradores encontrados, até maximo; registros da página)
+        """
+        return self.armazenamento.pesquisar_nome(nome, offset, limite, maximo)
+    
+    @medido
+    def pesquisar_numero(self, prefixo, offset=0, limite=50, maximo=None):
+        """Busca uma página dos números que começam com os dígitos digitados.
+        
+        Ex: "12" encontra 12, 120-129, 1200-1299... Os números de cada
+        tamanho são consultados como um intervalo, então a busca não percorre
+        todos os registros.
+        
+        Returns:
+            tuple: (total de números encontrados, até maximo; registros da página)
+        """
+        prefixo = prefixo.strip()
+        if not prefixo.isdigit():
+            return 0, []
+        
+        valor = int(prefixo)
+        if valor == 0:
+            # Nenhum número além do próprio 0 começa com zero
+            intervalos = [(0, 0)]
+        else:
+            intervalos = []
+            escala = 1
+            while valor * escala <= MAIOR_NUMERO:
+                intervalos.append((valor * escala, min((valor + 1) * escala - 1, MAIOR_NUMERO)))
+                escala *= 10
+        
+        total = 0
+        registros = []
+        for inicio, fim in intervalos:
+            quantidade = self.armazenamento.contar_intervalo(inicio, fim)
+            if quantidade and len(registros) < limite:
+                # Posição da página dentro deste intervalo
+                pular = max(0, offset - total)
+                if pular < quantidade:
+                    registros.extend(self.armazenamento.listar_intervalo(
+                        inicio, fim, pular, limite - len(registros)))
+            total += quantidade
+            if maximo is not None and total >= maximo:
+                return maximo, registros
+        return total, registros
+    
+    @medido
+    def compactar(self):
+        """Consolida os cadastros recentes no arquivo de dados principal."""
+        return self.armazenamento.compactar()
+    
+    @medido
+    def fechar(self):
+        """Grava o que estiver pendente e libera o arquivo de dados."""
+        self.armazenamento.fechar()
+    
+    @medido
+    def definir_faixa(self, inicio, fim):
+        """Define a faixa de números da rifa (ex: 1 a 1000000)."""
+        primeiro = normalizar_numero(inicio)
+        ultimo = normalizar_numero(fim)
+        if primeiro is None or ultimo is None or ultimo < primeiro:
+            return False, f"Erro: Faixa {inicio} a {fim} é inválida."
         
-        with open(self.arquivo_csv, 'r', encoding='utf-8') as arquivo:
-            reader = csv.DictReader(arquivo)
-            for row in reader:
-                if nome in row['nome'].lower():
-                    resultados.append(row)
+        self.faixa = (primeiro, ultimo)
+        return True, f"Faixa da rifa definida: {primeiro} a {ultimo}."
+    
+    @medido
+    def mapa_numeros(self):
+        """Retorna o mapa de números vendidos (MapaNumeros) da faixa da rifa."""
+        return self.armazenamento.mapa_numeros(*self.faixa)
+    
+    @medido
+    def contar_numeros(self):
+        """Conta os números da faixa.
         
-        return resultados
+        Returns:
+            tuple: (vendidos, livres)
+        """
+        mapa = self.mapa_numeros()
+        return mapa.vendidos, mapa.livres
+    
+    @medido
+    def proximo_numero_livre(self, a_partir=None):
+        """Retorna o primeiro número livre da faixa (a partir de a_partir), ou None."""
+        return self.mapa_numeros().proximo_livre(a_partir)
+    
+    @medido
+    def numero_livre_aleatorio(self):
+        """Sorteia um número livre da faixa, ou None se todos foram vendidos."""
+        return self.mapa_numeros().livre_aleatorio()
+    
+    @medido
+    def intervalos_livres(self, limite=None):
+        """Lista os números livres da faixa como intervalos [(primeiro, último), ...]."""
+        return self.mapa_numeros().intervalos_livres(limite)
     
+    @medido
     def exportar_para_csv(self, arquivo_destino):
         """Exporta os dados para um novo arquivo CSV."""
-        import shutil
-        shutil.copy(self.arquivo_csv, arquivo_destino)
+        self.armazenamento.exportar_csv(arquivo_destino)
         return True, f"Dados exportados para {arquivo_destino}"
+    
+    @medido
+    def exportar(self, arquivo_destino, formato=None, ordenado=True, inicio=None, fim=None,
+                 nome=None, desde=None, ate=None, progresso=None, cancelar=None):
+        """Exporta os registros em lotes, com filtros, em CSV, CSV gzip, JSON Lines ou XLSX.
+        
+        Args:
+            arquivo_destino: Caminho do arquivo a gravar
+            formato: Um de exportacao.FORMATOS; por padrão vem da extensão do arquivo
+            ordenado: True para exportar em ordem de número, False na ordem do arquivo
+            inicio, fim: Faixa de números a exportar (inclusive)
+            nome: Parte do nome dos compradores a exportar
+            desde, ate: Faixa da data da compra (datetime, inclusive)
+            progresso: Função chamada como progresso(feito, total) a cada lote
+            cancelar: threading.Event que, quando ativado, interrompe a exportação
+        
+        Returns:
+            tuple: (sucesso, mensagem)
+        """
+        formato = formato or formato_do_arquivo(arquivo_destino)
+        filtro = criar_filtro(inicio, fim, nome, desde, ate)
+        if not ordenado and formato == 'csv' and filtro is None:
+            # Sem filtros, o CSV na ordem do arquivo é uma cópia do próprio arquivo
+            return self.exportar_para_csv(arquivo_destino)
+        
+        primeiro = 0 if inicio is None else inicio
+        ultimo = MAIOR_NUMERO if fim is None else fim
+        if ordenado:
+            # A faixa de números já limita a leitura: cada lote vem do índice
+            lotes = lotes_em_ordem(self.armazenamento, primeiro, ultimo)
+        else:
+            lotes = self.armazenamento.lotes_do_arquivo(TAMANHO_LOTE)
+        total = self.armazenamento.contar_intervalo(primeiro, ultimo)
+        
+        try:
+            gravados = exportar_lotes(lotes, arquivo_destino, formato, filtro, total,
+                                      progresso, cancelar)
+        except ExportacaoCancelada:
+            return False, "Exportação cancelada pelo usuário."
+        except (OSError, RuntimeError, ValueError) as erro:
+            return False, f"Erro ao exportar: {erro}"
+        return True, f"{gravados} registros exportados para {arquivo_destino}"
+    
+    @property
+    def csv_local(self):
+        """Caminho do CSV, se o armazenamento for um CSV local; senão None (SQLite ou servidor)."""
+        if isinstance(self.armazenamento, ArmazenamentoCSV):
+            return self.armazenamento.arquivo_csv
+        return None
+    
+    def importar_csv(self, arquivo_origem, progresso=None, cancelar=None, retomar=False,
+                     modo_conflito='manter_existente'):
+        """Importa arquivos CSV externos para o armazenamento aberto.
+        
+        Num CSV local a importação é a de csv_merger.merge_csv_files, com todos
+        os modos; no banco SQLite e no servidor os registros passam pelo
+        inserir do armazenamento (csv_merger.importar_no_armazenamento), que
+        só mantém os registros existentes e não retoma importações.
+        
+        Returns:
+            tuple: (sucesso, mensagem, estatísticas), como merge_csv_files
+        """
+        if self.csv_local is not None:
+            # Levar ao CSV os cadastros que ainda estão só no diário
+            self.compactar()
+            return merge_csv_files(arquivo_destino=self.csv_local, arquivo_origem=arquivo_origem,
+                                   progresso=progresso, cancelar=cancelar, retomar=retomar,
+                                   modo_conflito=modo_conflito)
+        
+        if retomar or modo_conflito != 'manter_existente':
+            return False, ("Neste armazenamento a importação só mantém os registros existentes "
+                           "e não pode ser retomada."), {}
+        return importar_no_armazenamento(self.armazenamento, arquivo_origem, progresso, cancelar)
+    
+    def stats(self):
+        """Retorna as métricas de desempenho coletadas neste processo.
+        
+        A coleta precisa estar ativa (metricas.ativar() ou RIFAS_METRICAS=1);
+        veja Metricas.stats para o formato.
+        """
+        return metricas.stats()
 
 def mostrar_menu():
     print("\n=== SISTEMA DE GERENCIAMENTO DE RIFAS ===")
@@ -105,11 +422,13 @@ def mostrar_menu():
     print("4. Buscar por número da rifa")
     print("5. Buscar por nome")
     print("6. Exportar dados")
+    print("7. Ver números livres")
     print("0. Sair")
     return input("Escolha uma opção: ")
 
 def main():
-    rifa = RifaManager()
+    # Um arquivo .db pode ser informado para usar o armazenamento SQLite
+    rifa = RifaManager(sys.argv[1] if len(sys.argv) > 1 else 'rifas.csv')
     
     while True:
         opcao = mostrar_menu()
@@ -123,12 +442,12 @@ def main():
             print(mensagem)
             
         elif opcao == '2':
-            numeros_input = input("Números da rifa (separados por vírgula): ")
-            numeros = [num.strip() for num in numeros_input.split(',')]
+            print("Ex: 10, 11, 12 | 1-500 | 1000-1999 passo 10 | próximos 50 livres")
+            expressao = input("Números da rifa: ")
             nome = input("Nome do comprador: ")
             telefone = input("Telefone: ")
             
-            sucesso, mensagem = rifa.cadastrar_multiplos_numeros(numeros, nome, telefone)
+            sucesso, mensagem = rifa.cadastrar_expressao(expressao, nome, telefone)
             print(mensagem)
             
         elif opcao == '3':
@@ -169,12 +488,25 @@ def main():
                 print(f"Nenhum comprador encontrado com o nome '{nome}'.")
             
         elif opcao == '6':
-            nome_arquivo = input("Digite o nome do arquivo para exportação (ex: rifas_backup.csv): ")
-            sucesso, mensagem = rifa.exportar_para_csv(nome_arquivo)
+            nome_arquivo = input("Digite o nome do arquivo para exportação "
+                                 "(ex: rifas_backup.csv, .csv.gz, .jsonl ou .xlsx): ")
+            sucesso, mensagem = rifa.exportar(nome_arquivo, ordenado=False)
             print(mensagem)
             
+        elif opcao == '7':
+            vendidos, livres = rifa.contar_numeros()
+            inicio, fim = rifa.faixa
+            print(f"\nFaixa {inicio} a {fim}: {vendidos} vendidos, {livres} livres")
+            
+            intervalos = rifa.intervalos_livres(limite=20)
+            if intervalos:
+                print("Números livres: " + ", ".join(
+                    str(a) if a == b else f"{a}-{b}" for a, b in intervalos))
+                print(f"Próximo livre: {rifa.proximo_numero_livre()}")
+            
         elif opcao == '0':
             print("Saindo do sistema...")
+            rifa.fechar()
             break
             
         else:
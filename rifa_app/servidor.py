@@ -0,0 +1,304 @@
+"""Servidor de vendas para a rede local.
+
+Uso: python servidor.py [arquivo] [--host 127.0.0.1] [--porta 8765]
+
+Vários pontos de venda (RifaGUI ou rifa_manager.py) usam o mesmo arquivo de
+rifas através do servidor, informando o endereço no lugar do arquivo:
+
+    python rifa_gui.py http://192.168.0.10:8765
+
+O servidor não pede senha e entrega o nome e o telefone de todos os
+compradores a quem se conectar. Por isso ele só atende este computador
+(127.0.0.1), a não ser que se peça --host 0.0.0.0 para atender a rede;
+faça isso só numa rede fechada, a do evento.
+
+O servidor fala HTTP/1.1 com JSON e mantém as conexões abertas entre os
+pedidos. Cadastros que chegam ao mesmo tempo são gravados juntos, numa
+única chamada ao armazenamento (e um único fsync).
+"""
+import asyncio
+import base64
+import json
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+from armazenamento import ORDENS, normalizar_numero
+from registro import RegistroBase
+from rifa_manager import RifaManager
+
+PORTA_PADRAO = 8765
+HOST_PADRAO = '127.0.0.1'
+
+# Tamanho máximo aceito para o corpo de um pedido
+TAMANHO_MAXIMO_CORPO = 16 * 1024 * 1024
+
+MOTIVOS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+class PedidoInvalido(Exception):
+    """Pedido com parâmetros ausentes ou inválidos (resposta 400)."""
+
+def _inteiro(parametros, nome, padrao=None):
+    valor = parametros.get(nome)
+    if valor is None:
+        if padrao is None:
+            raise PedidoInvalido(f"Parâmetro '{nome}' é obrigatório")
+        return padrao
+    chave = normalizar_numero(valor)
+    if chave is None:
+        raise PedidoInvalido(f"Parâmetro '{nome}' inválido: {valor}")
+    return chave
+
+def _linha(valores):
+    """Valida uma linha [numero, nome, telefone, data_compra] recebida do cliente."""
+    if not isinstance(valores, list) or len(valores) != 4:
+        raise PedidoInvalido("Cada linha deve ter numero, nome, telefone e data_compra")
+    chave = normalizar_numero(valores[0])
+    if chave is None:
+        raise PedidoInvalido(f"Número inválido: {valores[0]}")
+    return [chave] + [str(valor) for valor in valores[1:]]
+
+def _para_json(valor):
+    """Serializa os registros como dicionários campo -> texto."""
+    if isinstance(valor, RegistroBase):
+        return valor.para_dicionario()
+    raise TypeError(f"{type(valor).__name__} não pode ser convertido em JSON")
+
+class ServidorRifas:
+    """Servidor HTTP/JSON assíncrono em volta do armazenamento de um RifaManager.
+    
+    As operações de arquivo rodam numa única thread auxiliar, na ordem em
+    que chegam, então o armazenamento nunca é usado por duas threads ao
+    mesmo tempo e o laço asyncio continua livre para atender as conexões.
+    """
+    
+    def __init__(self, arquivo='rifas.csv', host=HOST_PADRAO, porta=PORTA_PADRAO):
+        self.rifa = RifaManager(arquivo)
+        self.armazenamento = self.rifa.armazenamento
+        self.host = host
+        self.porta = porta
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._fila_insercoes = None
+        self._gravador = None
+        self._servidor = None
+        
+        self.rotas = {
+            ('GET', '/status'): self.status,
+            ('GET', '/rifas'): self.listar,
+            ('GET', '/invalidas'): self.linhas_invalidas,
+            ('POST', '/rifas'): self.inserir,
+            ('POST', '/reservar'): self.reservar,
+            ('GET', '/intervalo'): self.listar_intervalo,
+            ('GET', '/intervalo/contagem'): self.contar_intervalo,
+            ('GET', '/busca'): self.pesquisar_nome,
+            ('GET', '/mapa'): self.mapa_numeros,
+            ('POST', '/compactar'): self.compactar,
+        }
+    
+    async def iniciar(self):
+        """Começa a aceitar conexões. Retorna a porta em uso (útil com porta 0)."""
+        self._fila_insercoes = asyncio.Queue()
+        self._gravador = asyncio.get_running_loop().create_task(self._gravar_insercoes())
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.porta)
+        return self._servidor.sockets[0].getsockname()[1]
+    
+    async def executar_para_sempre(self):
+        porta = await self.iniciar()
+        print(f"Servidor de rifas em http://{self.host}:{porta} ({self.rifa.arquivo_csv})")
+        if self.host not in (HOST_PADRAO, 'localhost', '::1'):
+            print("Atenção: sem senha, qualquer computador da rede pode ver e cadastrar compradores.")
+        async with self._servidor:
+            await self._servidor.serve_forever()
+    
+    async def parar(self):
+        """Para de aceitar conexões e encerra a tarefa de gravação."""
+        self._servidor.close()
+        self._gravador.cancel()
+        try:
+            await self._gravador
+        except asyncio.CancelledError:
+            pass
+    
+    def fechar(self):
+        """Espera as gravações pendentes e incorpora o diário ao arquivo."""
+        self._executor.shutdown(wait=True)
+        self.rifa.fechar()
+    
+    async def _no_executor(self, funcao, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, funcao, *args)
+    
+    async def _atender(self, leitor, escritor):
+        """Atende os pedidos de uma conexão, que pode ser reaproveitada (keep-alive)."""
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha.strip():
+                    break
+                
+                metodo, alvo, versao = linha.decode('latin-1').split(' ', 2)
+                cabecalhos = {}
+                while True:
+                    cabecalho = await leitor.readline()
+                    if cabecalho in (b'\r\n', b'\n', b''):
+                        break
+                    nome, _, valor = cabecalho.decode('latin-1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                
+                tamanho = int(cabecalhos.get('content-length', 0))
+                if tamanho > TAMANHO_MAXIMO_CORPO:
+                    await self._responder(escritor, 413, {'erro': "Pedido grande demais"})
+                    break
+                corpo = await leitor.readexactly(tamanho) if tamanho else b''
+                
+                codigo, resposta = await self._processar(metodo, alvo, corpo)
+                await self._responder(escritor, codigo, resposta)
+                
+                if (cabecalhos.get('connection', '').lower() == 'close'
+                        or versao.strip() == 'HTTP/1.0'):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            escritor.close()
+    
+    async def _processar(self, metodo, alvo, corpo):
+        url = urlsplit(alvo)
+        parametros = {nome: valores[0] for nome, valores in parse_qs(url.query).items()}
+        
+        rota = self.rotas.get((metodo, url.path))
+        if rota is None and metodo == 'GET' and url.path.startswith('/rifas/'):
+            rota = self.obter
+            parametros['numero'] = url.path[len('/rifas/'):]
+        if rota is None:
+            return 404, {'erro': f"Rota não encontrada: {metodo} {url.path}"}
+        
+        try:
+            dados = json.loads(corpo.decode('utf-8')) if corpo else {}
+            return 200, await rota(parametros, dados)
+        except (PedidoInvalido, json.JSONDecodeError, UnicodeDecodeError) as erro:
+            return 400, {'erro': str(erro)}
+        except Exception as erro:
+            traceback.print_exc()
+            return 500, {'erro': str(erro)}
+    
+    async def _responder(self, escritor, codigo, resposta):
+        dados = json.dumps(resposta, ensure_ascii=False, default=_para_json).encode('utf-8')
+        escritor.write(
+            b'HTTP/1.1 %d %s\r\nContent-Type: application/json; charset=utf-8\r\n'
+            b'Content-Length: %d\r\n\r\n' % (codigo, MOTIVOS[codigo].encode('ascii'), len(dados))
+            + dados)
+        await escritor.drain()
+    
+    async def _gravar_insercoes(self):
+        """Grava juntos os cadastros que chegaram enquanto a gravação anterior acontecia."""
+        while True:
+            pedidos = [await self._fila_insercoes.get()]
+            while not self._fila_insercoes.empty():
+                pedidos.append(self._fila_insercoes.get_nowait())
+            
+            todas = [linha for linhas, futuro in pedidos for linha in linhas]
+            try:
+                gravadas = await self._no_executor(self.armazenamento.inserir, todas)
+            except Exception as erro:
+                for linhas, futuro in pedidos:
+                    futuro.set_exception(erro)
+                continue
+            
+            # Na ordem de chegada: num número disputado, o primeiro pedido vence
+            inicio = 0
+            for linhas, futuro in pedidos:
+                futuro.set_result(gravadas[inicio:inicio + len(linhas)])
+                inicio += len(linhas)
+    
+    async def status(self, parametros, dados):
+        return {'arquivo': self.rifa.arquivo_csv}
+    
+    async def obter(self, parametros, dados):
+        return {'registro': await self._no_executor(
+            self.armazenamento.obter, _inteiro(parametros, 'numero'))}
+    
+    async def listar(self, parametros, dados):
+        limite = parametros.get('limite')
+        ordem = parametros.get('ordem', 'numero')
+        if ordem not in ORDENS:
+            raise PedidoInvalido(f"Ordem desconhecida: {ordem}")
+        registros = await self._no_executor(
+            self.armazenamento.listar, _inteiro(parametros, 'offset', 0),
+            None if limite is None else _inteiro(parametros, 'limite'), ordem,
+            bool(_inteiro(parametros, 'decrescente', 0)))
+        return {'registros': registros}
+    
+    async def linhas_invalidas(self, parametros, dados):
+        return {'linhas': await self._no_executor(self.armazenamento.linhas_invalidas)}
+    
+    async def inserir(self, parametros, dados):
+        linhas = [_linha(valores) for valores in dados.get('linhas', [])]
+        futuro = asyncio.get_running_loop().create_future()
+        await self._fila_insercoes.put((linhas, futuro))
+        return {'gravadas': await futuro}
+    
+    async def reservar(self, parametros, dados):
+        linha = _linha([dados.get('inicio', 1), dados.get('nome', ''),
+                        dados.get('telefone', ''), dados.get('data_compra', '')])
+        return {'numero': await self._no_executor(self.armazenamento.reservar_proximo, *linha)}
+    
+    async def listar_intervalo(self, parametros, dados):
+        limite = parametros.get('limite')
+        registros = await self._no_executor(
+            self.armazenamento.listar_intervalo, _inteiro(parametros, 'inicio'),
+            _inteiro(parametros, 'fim'), _inteiro(parametros, 'offset', 0),
+            None if limite is None else _inteiro(parametros, 'limite'))
+        return {'registros': registros}
+    
+    async def contar_intervalo(self, parametros, dados):
+        return {'total': await self._no_executor(
+            self.armazenamento.contar_intervalo, _inteiro(parametros, 'inicio'),
+            _inteiro(parametros, 'fim'))}
+    
+    async def pesquisar_nome(self, parametros, dados):
+        limite = parametros.get('limite')
+        maximo = parametros.get('maximo')
+        total, registros = await self._no_executor(
+            self.armazenamento.pesquisar_nome, parametros.get('nome', ''),
+            _inteiro(parametros, 'offset', 0),
+            None if limite is None else _inteiro(parametros, 'limite'),
+            None if maximo is None else _inteiro(parametros, 'maximo'))
+        return {'total': total, 'registros': registros}
+    
+    async def mapa_numeros(self, parametros, dados):
+        inicio = _inteiro(parametros, 'inicio')
+        fim = _inteiro(parametros, 'fim')
+        if fim < inicio:
+            raise PedidoInvalido(f"Faixa inválida: {inicio}..{fim}")
+        
+        # Copiar os bits na thread do armazenamento, que é quem altera o mapa
+        bits = await self._no_executor(
+            lambda: bytes(self.armazenamento.mapa_numeros(inicio, fim).bits))
+        return {'bits': base64.b64encode(bits).decode('ascii')}
+    
+    async def compactar(self, parametros, dados):
+        return {'incorporados': await self._no_executor(self.armazenamento.compactar)}
+
+def main():
+    argumentos = sys.argv[1:]
+    opcoes = {'--host': HOST_PADRAO, '--porta': str(PORTA_PADRAO)}
+    arquivos = []
+    while argumentos:
+        argumento = argumentos.pop(0)
+        if argumento in opcoes and argumentos:
+            opcoes[argumento] = argumentos.pop(0)
+        else:
+            arquivos.append(argumento)
+    
+    servidor = ServidorRifas(arquivos[0] if arquivos else 'rifas.csv',
+                             opcoes['--host'], int(opcoes['--porta']))
+    try:
+        asyncio.run(servidor.executar_para_sempre())
+    except KeyboardInterrupt:
+        print("\nEncerrando o servidor...")
+    finally:
+        servidor.fechar()
+
+if __name__ == "__main__":
+    main()
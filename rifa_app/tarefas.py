@@ -0,0 +1,129 @@
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Intervalo (ms) entre as verificações de resultados feitas pela interface
+INTERVALO_VERIFICACAO = 50
+
+class TarefaCancelada(Exception):
+    """Indica que a tarefa foi cancelada pelo usuário."""
+
+class Tarefa:
+    """Operação executada em segundo plano, com progresso e cancelamento."""
+    
+    def __init__(self, descricao, cancelavel=False):
+        self.descricao = descricao
+        self.cancelavel = cancelavel
+        self.evento_cancelar = threading.Event()
+        
+        # Lidos pela thread da interface a cada verificação
+        self.feito = 0
+        self.total = 0
+    
+    def cancelar(self):
+        """Pede o cancelamento; a operação para no próximo ponto de verificação."""
+        self.evento_cancelar.set()
+    
+    @property
+    def cancelada(self):
+        return self.evento_cancelar.is_set()
+    
+    def informar_progresso(self, feito, total):
+        """Chamado pela operação (na thread de trabalho) para registrar o progresso."""
+        self.feito = feito
+        self.total = total
+
+class ExecutorTarefas:
+    """Executa as operações de arquivo fora da thread da interface Tkinter.
+    
+    Uma única thread de trabalho executa as tarefas na ordem em que foram
+    pedidas, então o RifaManager nunca é usado por duas threads ao mesmo tempo.
+    Os resultados voltam para a thread da interface por uma fila, verificada
+    periodicamente com root.after.
+    """
+    
+    def __init__(self, root, ao_atualizar_progresso=None):
+        # ao_atualizar_progresso(tarefa) é chamado na thread da interface com a
+        # tarefa em execução, ou None quando não há nenhuma
+        self.root = root
+        self.ao_atualizar_progresso = ao_atualizar_progresso
+        self.tarefa_atual = None
+        self._pendentes = []
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._fila = queue.Queue()
+        self._verificar()
+    
+    def executar(self, funcao, *args, descricao="", ao_concluir=None, ao_falhar=None,
+                 cancelavel=False, **kwargs):
+        """Agenda funcao(*args, **kwargs) na thread de trabalho.
+        
+        Tarefas canceláveis recebem o argumento 'tarefa', usado para informar
+        o progresso e verificar o cancelamento. ao_concluir(resultado) e
+        ao_falhar(erro) são chamados na thread da interface.
+        """
+        tarefa = Tarefa(descricao, cancelavel)
+        if cancelavel:
+            kwargs['tarefa'] = tarefa
+        self._pendentes.append(tarefa)
+        
+        def trabalho():
+            self._fila.put((self._iniciar, (tarefa,)))
+            try:
+                if tarefa.cancelavel and tarefa.cancelada:
+                    raise TarefaCancelada()
+                resultado = funcao(*args, **kwargs)
+            except Exception as erro:
+                if not isinstance(erro, TarefaCancelada):
+                    traceback.print_exc()
+                self._fila.put((self._finalizar, (tarefa, ao_falhar, erro)))
+            else:
+                self._fila.put((self._finalizar, (tarefa, ao_concluir, resultado)))
+        
+        self._executor.submit(trabalho)
+        return tarefa
+    
+    def na_thread_principal(self, funcao, *args):
+        """Agenda funcao(*args) para rodar na thread da interface (seguro de qualquer thread)."""
+        self._fila.put((funcao, args))
+    
+    def ocupado(self):
+        return bool(self._pendentes)
+    
+    def cancelar_todas(self):
+        """Cancela as tarefas canceláveis; as demais (ex: cadastros) ainda são executadas."""
+        for tarefa in self._pendentes:
+            tarefa.cancelar()
+    
+    def encerrar(self):
+        """Cancela o que for possível e espera as tarefas restantes terminarem."""
+        self.cancelar_todas()
+        self._executor.shutdown(wait=True)
+    
+    def _iniciar(self, tarefa):
+        self.tarefa_atual = tarefa
+        if self.ao_atualizar_progresso:
+            self.ao_atualizar_progresso(tarefa)
+    
+    def _finalizar(self, tarefa, callback, valor):
+        self._pendentes.remove(tarefa)
+        self.tarefa_atual = None
+        if self.ao_atualizar_progresso:
+            self.ao_atualizar_progresso(None)
+        if callback:
+            callback(valor)
+    
+    def _verificar(self):
+        while True:
+            try:
+                funcao, args = self._fila.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                funcao(*args)
+            except Exception:
+                traceback.print_exc()
+        
+        if self.tarefa_atual and self.ao_atualizar_progresso:
+            self.ao_atualizar_progresso(self.tarefa_atual)
+        self.root.after(INTERVALO_VERIFICACAO, self._verificar)
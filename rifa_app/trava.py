@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from metricas import metricas
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Extensão do arquivo de trava, criado ao lado do arquivo de dados (ex: rifas.csv.trava)
+EXTENSAO_TRAVA = '.trava'
+
+# Intervalo (s) entre as tentativas de obter a trava no Windows
+INTERVALO_TENTATIVA = 0.01
+
+_travas = {}
+_travas_lock = threading.Lock()
+
+def trava_do_arquivo(arquivo):
+    """Retorna a trava entre processos do arquivo de dados.
+    
+    Cada arquivo tem uma única trava por processo: travas do sistema
+    obtidas duas vezes pelo mesmo processo, em descritores diferentes,
+    bloqueariam uma à outra.
+    """
+    caminho = os.path.abspath(arquivo) + EXTENSAO_TRAVA
+    with _travas_lock:
+        trava = _travas.get(caminho)
+        if trava is None:
+            trava = _travas[caminho] = TravaArquivo(caminho)
+        return trava
+
+class TravaArquivo:
+    """Trava exclusiva entre processos, baseada num arquivo de trava.
+    
+    Usa fcntl.flock no Linux/macOS e msvcrt.locking no Windows; o sistema
+    libera a trava sozinho se o processo terminar. Dentro do processo, a trava
+    é reentrante e também exclui as outras threads.
+    """
+    
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.RLock()
+        self._descritor = None
+        self._profundidade = 0
+    
+    def __enter__(self):
+        # Tempo de espera pela trava (outras threads e outros processos)
+        inicio = time.perf_counter() if metricas.ativas else None
+        self._lock.acquire()
+        if self._profundidade == 0:
+            try:
+                self._travar()
+            except BaseException:
+                self._lock.release()
+                raise
+            if inicio is not None:
+                metricas.registrar_tempo('espera_trava', time.perf_counter() - inicio)
+        self._profundidade += 1
+        return self
+    
+    def __exit__(self, *exc):
+        self._profundidade -= 1
+        if self._profundidade == 0:
+            self._destravar()
+        self._lock.release()
+    
+    def _travar(self):
+        descritor = os.open(self.caminho, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if fcntl is not None:
+                fcntl.flock(descritor, fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        msvcrt.locking(descritor, msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(INTERVALO_TENTATIVA)
+        except BaseException:
+            os.close(descritor)
+            raise
+        self._descritor = descritor
+    
+    def _destravar(self):
+        descritor, self._descritor = self._descritor, None
+        try:
+            if fcntl is not None:
+                fcntl.flock(descritor, fcntl.LOCK_UN)
+            else:
+                os.lseek(descritor, 0, os.SEEK_SET)
+                msvcrt.locking(descritor, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(descritor)